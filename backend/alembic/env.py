@@ -0,0 +1,45 @@
+from alembic import context
+from sqlalchemy import create_engine
+from app.core.config import settings
+from app.core.database import Base
+import app.models  # noqa: F401 注册所有模型
+
+config = context.config
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    """只输出SQL，不连接数据库"""
+    context.configure(
+        url=settings.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """应用启动时会传入已有连接；命令行执行时自行创建连接"""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    engine = create_engine(settings.DATABASE_URL)
+    with engine.connect() as connection:
+        _run(connection)
+    engine.dispose()
+
+
+def _run(connection):
+    # SQLite不支持大部分ALTER TABLE，使用batch模式重建表
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
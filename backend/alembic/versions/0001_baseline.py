@@ -0,0 +1,97 @@
+"""初始表结构(引入迁移前由create_all创建的表)
+
+已有数据库由应用启动时自动标记为该版本，再依次执行后续迁移。
+
+Revision ID: 0001
+Revises:
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String()),
+        sa.Column("email", sa.String()),
+        sa.Column("hashed_password", sa.String()),
+        sa.Column("douyin_user_id", sa.String()),
+        sa.Column("douyin_access_token", sa.String()),
+        sa.Column("douyin_refresh_token", sa.String()),
+        sa.Column("douyin_token_expires_at", sa.DateTime()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime())
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+    op.create_index("ix_users_douyin_user_id", "users", ["douyin_user_id"], unique=True)
+
+    op.create_table(
+        "videos",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("douyin_video_id", sa.String()),
+        sa.Column("title", sa.String(255)),
+        sa.Column("description", sa.Text()),
+        sa.Column("file_path", sa.String(500)),
+        sa.Column("thumbnail_path", sa.String(500)),
+        sa.Column("duration", sa.Integer()),
+        sa.Column("file_size", sa.Integer()),
+        sa.Column("status", sa.String(50)),
+        sa.Column("publish_status", sa.String(50)),
+        sa.Column("douyin_url", sa.String(500)),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime())
+    )
+    op.create_index("ix_videos_id", "videos", ["id"])
+    op.create_index("ix_videos_douyin_video_id", "videos", ["douyin_video_id"], unique=True)
+
+    op.create_table(
+        "ai_generations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("video_id", sa.Integer(), sa.ForeignKey("videos.id")),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("generation_type", sa.String(50)),
+        sa.Column("model_name", sa.String(100)),
+        sa.Column("prompt", sa.Text()),
+        sa.Column("result", sa.Text()),
+        sa.Column("file_path", sa.String(500)),
+        sa.Column("generation_metadata", sa.JSON()),
+        sa.Column("status", sa.String(50)),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime())
+    )
+    op.create_index("ix_ai_generations_id", "ai_generations", ["id"])
+
+    op.create_table(
+        "publish_tasks",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("video_id", sa.Integer(), sa.ForeignKey("videos.id")),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("task_id", sa.String()),
+        sa.Column("status", sa.String(50)),
+        sa.Column("progress", sa.Integer()),
+        sa.Column("error_message", sa.Text()),
+        sa.Column("douyin_video_id", sa.String()),
+        sa.Column("douyin_url", sa.String(500)),
+        sa.Column("task_metadata", sa.JSON()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime())
+    )
+    op.create_index("ix_publish_tasks_id", "publish_tasks", ["id"])
+    op.create_index("ix_publish_tasks_task_id", "publish_tasks", ["task_id"], unique=True)
+
+
+def downgrade():
+    op.drop_table("publish_tasks")
+    op.drop_table("ai_generations")
+    op.drop_table("videos")
+    op.drop_table("users")
@@ -0,0 +1,24 @@
+"""发布任务幂等键(user-005)
+
+Revision ID: 0002
+Revises: 0001
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("publish_tasks") as batch_op:
+        batch_op.add_column(sa.Column("idempotency_key", sa.String(200)))
+        batch_op.create_index("ix_publish_tasks_idempotency_key", ["idempotency_key"], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table("publish_tasks") as batch_op:
+        batch_op.drop_index("ix_publish_tasks_idempotency_key")
+        batch_op.drop_column("idempotency_key")
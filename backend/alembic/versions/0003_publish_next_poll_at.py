@@ -0,0 +1,24 @@
+"""发布状态轮询时间(user-006)
+
+Revision ID: 0003
+Revises: 0002
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("publish_tasks") as batch_op:
+        batch_op.add_column(sa.Column("next_poll_at", sa.DateTime()))
+        batch_op.create_index("ix_publish_tasks_next_poll_at", ["next_poll_at"])
+
+
+def downgrade():
+    with op.batch_alter_table("publish_tasks") as batch_op:
+        batch_op.drop_index("ix_publish_tasks_next_poll_at")
+        batch_op.drop_column("next_poll_at")
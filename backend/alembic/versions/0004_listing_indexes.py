@@ -0,0 +1,24 @@
+"""视频列表和发布任务的复合索引(user-009)
+
+Revision ID: 0004
+Revises: 0003
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_videos_user_created", "videos", ["user_id", "created_at", "id"])
+    op.create_index("ix_videos_user_status", "videos", ["user_id", "status"])
+    op.create_index("ix_publish_tasks_user_status", "publish_tasks", ["user_id", "status"])
+
+
+def downgrade():
+    op.drop_index("ix_publish_tasks_user_status", "publish_tasks")
+    op.drop_index("ix_videos_user_status", "videos")
+    op.drop_index("ix_videos_user_created", "videos")
@@ -0,0 +1,24 @@
+"""AI生成结果的缓存键(user-013)
+
+Revision ID: 0005
+Revises: 0004
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("ai_generations") as batch_op:
+        batch_op.add_column(sa.Column("cache_key", sa.String(64)))
+        batch_op.create_index("ix_ai_generations_cache_key", ["cache_key"])
+
+
+def downgrade():
+    with op.batch_alter_table("ai_generations") as batch_op:
+        batch_op.drop_index("ix_ai_generations_cache_key")
+        batch_op.drop_column("cache_key")
@@ -0,0 +1,30 @@
+"""视频分辨率、编码和码率(user-017)
+
+已有视频可用 python backfill_video_metadata.py 补全。
+
+Revision ID: 0006
+Revises: 0005
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("videos") as batch_op:
+        batch_op.add_column(sa.Column("width", sa.Integer()))
+        batch_op.add_column(sa.Column("height", sa.Integer()))
+        batch_op.add_column(sa.Column("video_codec", sa.String(20)))
+        batch_op.add_column(sa.Column("bitrate", sa.Integer()))
+
+
+def downgrade():
+    with op.batch_alter_table("videos") as batch_op:
+        batch_op.drop_column("bitrate")
+        batch_op.drop_column("video_codec")
+        batch_op.drop_column("height")
+        batch_op.drop_column("width")
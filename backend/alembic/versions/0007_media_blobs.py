@@ -0,0 +1,41 @@
+"""按内容存储的上传文件(user-019)
+
+已有视频的blob_id为空，仍按file_path访问，删除时不涉及引用计数。
+
+Revision ID: 0007
+Revises: 0006
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "media_blobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("sha256", sa.String(64), nullable=False),
+        sa.Column("file_path", sa.String(500), nullable=False),
+        sa.Column("file_size", sa.Integer()),
+        sa.Column("ref_count", sa.Integer(), nullable=False),
+        sa.Column("media_metadata", sa.JSON()),
+        sa.Column("created_at", sa.DateTime())
+    )
+    op.create_index("ix_media_blobs_id", "media_blobs", ["id"])
+    op.create_index("ix_media_blobs_sha256", "media_blobs", ["sha256"], unique=True)
+    with op.batch_alter_table("videos") as batch_op:
+        batch_op.add_column(sa.Column("blob_id", sa.Integer()))
+        batch_op.create_foreign_key("fk_videos_blob_id_media_blobs", "media_blobs", ["blob_id"], ["id"])
+        batch_op.create_index("ix_videos_blob_id", ["blob_id"])
+
+
+def downgrade():
+    with op.batch_alter_table("videos") as batch_op:
+        batch_op.drop_index("ix_videos_blob_id")
+        batch_op.drop_constraint("fk_videos_blob_id_media_blobs", type_="foreignkey")
+        batch_op.drop_column("blob_id")
+    op.drop_table("media_blobs")
@@ -0,0 +1,45 @@
+"""抖音视频列表的本地镜像(user-020)
+
+Revision ID: 0008
+Revises: 0007
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "douyin_videos",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("douyin_video_id", sa.String(100), nullable=False),
+        sa.Column("title", sa.String(500)),
+        sa.Column("cover_url", sa.String(1000)),
+        sa.Column("share_url", sa.String(1000)),
+        sa.Column("status", sa.Integer()),
+        sa.Column("is_top", sa.Boolean()),
+        sa.Column("statistics", sa.JSON()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("synced_at", sa.DateTime())
+    )
+    op.create_index("ix_douyin_videos_id", "douyin_videos", ["id"])
+    op.create_index("ix_douyin_videos_douyin_video_id", "douyin_videos", ["douyin_video_id"], unique=True)
+    op.create_index("ix_douyin_videos_user_created", "douyin_videos", ["user_id", "created_at"])
+    op.create_table(
+        "douyin_sync_states",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("status", sa.String(50)),
+        sa.Column("last_synced_at", sa.DateTime()),
+        sa.Column("last_full_sync_at", sa.DateTime()),
+        sa.Column("error_message", sa.Text())
+    )
+
+
+def downgrade():
+    op.drop_table("douyin_sync_states")
+    op.drop_table("douyin_videos")
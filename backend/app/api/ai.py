@@ -1,45 +1,252 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from datetime import datetime
+import asyncio
+import json
+import os
+from app.core.config import settings
+from app.core.database import get_async_db, get_async_read_db, AsyncSessionLocal
 from app.models.user import User
-from app.api.auth import get_current_user
-from app.services.ai_service import AIService
+from app.models.video import Video
+from app.models.ai_generation import AIGeneration
+from app.api.auth import get_current_user, get_media_user_id, get_stream_user, sign_media_url
+from app.services.ai_service import AIService, extract_title, extract_description
+from app.services.image_pipeline import ORIGINAL_NAME, derivative_name, image_path
 
 router = APIRouter()
 ai_service = AIService()
 
 
+class BatchCopyItem(BaseModel):
+    video_id: Optional[int] = None
+    content: Optional[str] = None
+    title: Optional[str] = None
+
+
+class BatchCopyRequest(BaseModel):
+    items: List[BatchCopyItem] = Field(..., min_length=1, max_length=settings.AI_BATCH_MAX_ITEMS)
+    kinds: List[Literal["title", "description"]] = ["title", "description"]
+    apply: bool = False  # 是否将生成结果写回视频的标题和描述
+
+
+def _error_status(result: dict) -> int:
+    """AI提供方繁忙时返回503，其他失败返回400"""
+    return 503 if result.get("busy") else 400
+
+
+def build_generation(user_id: int, result: dict, generation_type: str = "text", video_id: Optional[int] = None) -> AIGeneration:
+    """根据生成结果构造AIGeneration记录（命中缓存时也记录，usage标记为缓存结果）"""
+    return AIGeneration(
+        video_id=video_id,
+        user_id=user_id,
+        generation_type=generation_type,
+        model_name=result.get("model"),
+        prompt=result.get("prompt"),
+        cache_key=result.get("cache_key"),
+        result=result.get("result"),
+        file_path=result.get("file_path"),
+        generation_metadata={"usage": result.get("usage"), "cached": result.get("cached", False)},
+        status="success"
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def record_generation(user_id: int, result: dict):
+    """在独立的短会话中保存生成记录，等待AI生成期间不占用数据库连接"""
+    async with AsyncSessionLocal() as db:
+        await save_generation(db, user_id, result)
+
+
+async def _stream_generation(events, user_id: int):
+    """将流式生成事件转为SSE消息，流结束时保存生成记录"""
+    async for event in events:
+        kind = event.pop("type")
+        if kind == "done":
+            await record_generation(user_id, event)
+        yield _sse(kind, event)
+
+
+def stream_response(events, user_id: int) -> StreamingResponse:
+    """以Server-Sent Events逐段返回生成内容"""
+    return StreamingResponse(
+        _stream_generation(events, user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def save_generation(db: AsyncSession, user_id: int, result: dict, generation_type: str = "text", video_id: Optional[int] = None):
+    """保存一条生成记录"""
+    db.add(build_generation(user_id, result, generation_type, video_id))
+    await db.commit()
+
+
 @router.post("/text", response_model=dict)
-async def generate_text(prompt: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """AI生成文本内容"""
+async def generate_text(prompt: str, stream: bool = False, current_user: User = Depends(get_stream_user)):
+    """AI生成文本内容，stream=true时以SSE逐段返回"""
+    if stream:
+        return stream_response(ai_service.stream_text(prompt), current_user.id)
     result = await ai_service.generate_text(prompt)
     if not result["success"]:
-        raise HTTPException(status_code=400, detail=result["error"])
+        raise HTTPException(status_code=_error_status(result), detail=result["error"])
+    await record_generation(current_user.id, result)
     return result
 
 
 @router.post("/title", response_model=dict)
-async def generate_title(content: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """AI生成视频标题"""
+async def generate_title(content: str, stream: bool = False, current_user: User = Depends(get_stream_user)):
+    """AI生成视频标题，stream=true时以SSE逐段返回"""
+    if stream:
+        return stream_response(ai_service.stream_video_title(content), current_user.id)
     result = await ai_service.generate_video_title(content)
     if not result["success"]:
-        raise HTTPException(status_code=400, detail=result["error"])
+        raise HTTPException(status_code=_error_status(result), detail=result["error"])
+    await record_generation(current_user.id, result)
     return result
 
 
 @router.post("/description", response_model=dict)
-async def generate_description(title: str, content: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """AI生成视频描述"""
+async def generate_description(title: str, content: str, stream: bool = False, current_user: User = Depends(get_stream_user)):
+    """AI生成视频描述，stream=true时以SSE逐段返回"""
+    if stream:
+        return stream_response(ai_service.stream_video_description(title, content), current_user.id)
     result = await ai_service.generate_video_description(title, content)
     if not result["success"]:
-        raise HTTPException(status_code=400, detail=result["error"])
+        raise HTTPException(status_code=_error_status(result), detail=result["error"])
+    await record_generation(current_user.id, result)
     return result
 
 
 @router.post("/image", response_model=dict)
-async def generate_image(prompt: str, model: str = "stable-diffusion", db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def generate_image(prompt: str, model: str = "stable-diffusion", db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     """AI生成图片"""
     result = await ai_service.generate_image(prompt, model=model)
     if not result["success"]:
-        raise HTTPException(status_code=400, detail=result["error"])
-    return result 
\ No newline at end of file
+        raise HTTPException(status_code=_error_status(result), detail=result["error"])
+    await save_generation(db, current_user.id, result, generation_type="image")
+    base_url = f"{settings.API_V1_STR}/ai/images/{result['content_hash']}"
+    # <img>无法携带Authorization头，返回短期签名链接
+    return {
+        **result,
+        "url": sign_media_url(f"{base_url}/original", current_user.id),
+        "thumbnails": {size: sign_media_url(f"{base_url}/{size}", current_user.id) for size in result["derivatives"]}
+    }
+
+
+@router.get("/images/{content_hash}/{size}")
+async def get_image(
+    content_hash: str = Path(..., pattern="^[0-9a-f]{64}$"),
+    size: str = Path(...),
+    db: AsyncSession = Depends(get_async_read_db),
+    user_id: int = Depends(get_media_user_id)
+):
+    """按尺寸返回生成图片，只有生成过该图片的用户可以访问；路径由内容哈希决定，内容不会变化，可长期缓存"""
+    if size == "original":
+        name = ORIGINAL_NAME
+    elif size.isdigit() and int(size) in settings.AI_IMAGE_SIZES:
+        name = derivative_name(int(size))
+    else:
+        raise HTTPException(status_code=404, detail="不支持的图片尺寸")
+    owned = await db.scalar(select(AIGeneration.id).where(
+        AIGeneration.user_id == user_id,
+        AIGeneration.file_path == image_path(content_hash, ORIGINAL_NAME)
+    ).limit(1))
+    # 响应发送期间不占用数据库连接
+    await db.close()
+    path = image_path(content_hash, name)
+    if not owned or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="图片不存在")
+    return FileResponse(path, headers={"Cache-Control": "private, max-age=31536000, immutable"})
+
+
+@router.post("/batch")
+async def generate_batch_copy(request: BatchCopyRequest, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    """批量生成视频标题/描述，每条结果完成后立即以NDJSON格式返回"""
+    video_ids = {item.video_id for item in request.items if item.video_id}
+    videos = {}
+    if video_ids:
+        result = await db.execute(select(Video).where(Video.id.in_(video_ids), Video.user_id == current_user.id))
+        videos = {video.id: video for video in result.scalars().all()}
+    # 生成结果在_run_batch中用独立会话保存，流式响应期间不占用请求的数据库连接
+    await db.close()
+    
+    # 展开为(序号, 视频ID, 类型, 内容, 标题)的生成任务
+    jobs = []
+    for index, item in enumerate(request.items):
+        video = videos.get(item.video_id)
+        if item.video_id and not video:
+            jobs.append((index, item.video_id, None, None, None))
+            continue
+        title = item.title or (video.title if video else None) or ""
+        content = item.content or (video.description if video else None) or title
+        for kind in dict.fromkeys(request.kinds):
+            jobs.append((index, item.video_id, kind, content, title))
+    
+    return StreamingResponse(
+        _run_batch(jobs, current_user.id, request.apply),
+        media_type="application/x-ndjson"
+    )
+
+
+async def _run_batch(jobs: list, user_id: int, apply: bool):
+    """并发执行批量生成，按完成顺序逐行输出结果，并分批保存生成记录"""
+    semaphore = asyncio.Semaphore(settings.AI_BATCH_CONCURRENCY)
+    
+    async def run(job):
+        index, video_id, kind, content, title = job
+        if kind is None:
+            return job, {"success": False, "error": "视频不存在"}
+        if not content:
+            return job, {"success": False, "error": "缺少视频内容"}
+        async with semaphore:
+            if kind == "title":
+                return job, await ai_service.generate_video_title(content)
+            return job, await ai_service.generate_video_description(title, content)
+    
+    tasks = [asyncio.ensure_future(run(job)) for job in jobs]
+    generations = []
+    video_updates = {}
+    
+    async def flush(db: AsyncSession):
+        # 生成记录和视频更新按批提交
+        if generations:
+            db.add_all(generations)
+        if video_updates:
+            now = datetime.utcnow()
+            await db.execute(
+                update(Video),
+                [{"id": video_id, **values, "updated_at": now} for video_id, values in video_updates.items()]
+            )
+        await db.commit()
+        generations.clear()
+        video_updates.clear()
+    
+    async with AsyncSessionLocal() as db:
+        try:
+            for future in asyncio.as_completed(tasks):
+                (index, video_id, kind, _, _), result = await future
+                line = {"index": index, "video_id": video_id, "kind": kind, "success": result["success"]}
+                if result["success"]:
+                    line.update(result=result["result"], cached=result.get("cached", False))
+                    generations.append(build_generation(user_id, result, video_id=video_id))
+                    if apply and video_id:
+                        field, value = ("title", extract_title(result["result"])) if kind == "title" \
+                            else ("description", extract_description(result["result"]))
+                        video_updates.setdefault(video_id, {})[field] = value
+                else:
+                    line["error"] = result["error"]
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+                if len(generations) >= settings.AI_BATCH_COMMIT_SIZE:
+                    await flush(db)
+            await flush(db)
+        finally:
+            # 客户端断开时取消尚未完成的生成
+            for task in tasks:
+                task.cancel()
@@ -1,20 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime, timedelta
 from typing import Optional
+from urllib.parse import urlencode
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
+import hashlib
+import hmac
+import time
 
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_async_db, AsyncSessionLocal
 from app.models.user import User
 from app.services.douyin_service import DouyinService
+from app.services.user_cache import get_cached_user, cache_user, invalidate_user
 
 router = APIRouter()
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 
 class Token(BaseModel):
@@ -52,11 +60,13 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(User).filter(User.username == username).first()
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    result = await db.execute(select(User).where(User.username == username))
+    user = result.scalar_one_or_none()
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # bcrypt校验耗CPU，放到线程池中避免阻塞事件循环
+    if not await run_in_threadpool(verify_password, password, user.hashed_password):
         return False
     return user
 
@@ -72,7 +82,45 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    return await user_from_token(token, db)
+
+
+async def get_stream_user(token: str = Depends(oauth2_scheme)):
+    """长连接(SSE)和需要等待AI生成的接口使用：认证完成即关闭会话，不在整个请求期间占用数据库连接"""
+    async with AsyncSessionLocal() as db:
+        return await user_from_token(token, db)
+
+
+def _media_signature(path: str, user_id: int, expires: int) -> str:
+    message = f"{path}\n{user_id}\n{expires}".encode()
+    return hmac.new(settings.SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+
+def sign_media_url(path: str, user_id: int) -> str:
+    """生成只对该路径有效的短期签名链接，链接出现在访问日志中也不会泄露登录令牌"""
+    expires = int(time.time()) + settings.MEDIA_URL_TTL
+    return f"{path}?{urlencode({'uid': user_id, 'exp': expires, 'sig': _media_signature(path, user_id, expires)})}"
+
+
+async def get_media_user_id(
+    request: Request,
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    uid: Optional[int] = Query(None),
+    exp: Optional[int] = Query(None),
+    sig: Optional[str] = Query(None)
+) -> int:
+    """媒体文件由<video>/<img>直接请求，无法携带Authorization头，通过sign_media_url生成的签名链接认证"""
+    if token:
+        return (await get_stream_user(token)).id
+    if uid is None or exp is None or not sig or exp < time.time():
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="媒体链接无效或已过期")
+    if not hmac.compare_digest(sig, _media_signature(request.scope["path"], uid, exp)):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="媒体链接无效或已过期")
+    return uid
+
+
+async def user_from_token(token: str, db: AsyncSession):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -86,43 +134,50 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == token_data.username).first()
+    # 常见情况下直接命中缓存，不查询数据库
+    user = await get_cached_user(token_data.username)
     if user is None:
+        result = await db.execute(select(User).where(User.username == token_data.username))
+        db_user = result.scalar_one_or_none()
+        if db_user is None:
+            raise credentials_exception
+        user = await cache_user(db_user)
+    if not user.is_active:
         raise credentials_exception
     return user
 
 
 @router.post("/register", response_model=UserResponse)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """用户注册"""
     # 检查用户名是否已存在
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
+    existing_user = await db.scalar(select(User.id).where(User.username == user_data.username))
     if existing_user:
         raise HTTPException(status_code=400, detail="用户名已存在")
     
     # 检查邮箱是否已存在
-    existing_email = db.query(User).filter(User.email == user_data.email).first()
+    existing_email = await db.scalar(select(User.id).where(User.email == user_data.email))
     if existing_email:
         raise HTTPException(status_code=400, detail="邮箱已存在")
     
     # 创建新用户
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await run_in_threadpool(get_password_hash, user_data.password)
     db_user = User(
         username=user_data.username,
         email=user_data.email,
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 
 @router.post("/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """用户登录获取令牌"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -151,24 +206,28 @@ async def get_douyin_auth_url():
 
 
 @router.get("/douyin/callback")
-async def douyin_auth_callback(code: str, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def douyin_auth_callback(code: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """抖音授权回调"""
     try:
         douyin_service = DouyinService()
         token_data = await douyin_service.exchange_code_for_token(code)
         
+        # current_user可能来自缓存，需要更新数据库中的用户记录
+        user = await db.get(User, current_user.id)
+        
         # 更新用户抖音信息
-        current_user.douyin_access_token = token_data["data"]["access_token"]
-        current_user.douyin_refresh_token = token_data["data"]["refresh_token"]
-        current_user.douyin_token_expires_at = datetime.utcnow() + timedelta(
+        user.douyin_access_token = token_data["data"]["access_token"]
+        user.douyin_refresh_token = token_data["data"]["refresh_token"]
+        user.douyin_token_expires_at = datetime.utcnow() + timedelta(
             seconds=token_data["data"]["expires_in"]
         )
         
         # 获取用户信息
         user_info = await douyin_service.get_user_info(token_data["data"]["access_token"])
-        current_user.douyin_user_id = user_info["data"]["open_id"]
+        user.douyin_user_id = user_info["data"]["open_id"]
         
-        db.commit()
+        await db.commit()
+        await invalidate_user(user.username)
         
         return {"message": "抖音授权成功", "user_info": user_info}
     except Exception as e:
@@ -1,71 +1,149 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.core.config import settings
+from app.core.database import get_async_db, get_async_read_db
 from app.models.user import User
 from app.models.video import Video
 from app.models.publish_task import PublishTask
-from app.api.auth import get_current_user
-from app.services.douyin_service import DouyinService
+from app.api.auth import get_current_user, get_stream_user
+from app.api.videos import get_user_video
+from app.services.publish_service import publish_task_to_dict
+from app.services.publish_events import stream_status_events
+from app.services.celery import publish_video_task, sync_douyin_videos_task
+from app.services.douyin_sync import SNAPSHOT_PAGE_SIZE, get_video_snapshot, claim_sync
 from datetime import datetime
+import logging
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
-douyin_service = DouyinService()
 
 
 @router.get("/videos", response_model=dict)
-async def get_douyin_videos(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """获取抖音平台上的视频列表"""
-    try:
-        access_token = await douyin_service.ensure_valid_token(db, current_user)
-        result = await douyin_service.get_video_list(access_token)
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+async def get_douyin_videos(
+    limit: int = Query(SNAPSHOT_PAGE_SIZE, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """分页获取抖音平台上的视频列表，从本地镜像读取；镜像过期时在后台同步，stale表示返回的数据已过期"""
+    if not current_user.douyin_user_id:
+        raise HTTPException(status_code=400, detail="用户未授权抖音账号")
+    snapshot = await get_video_snapshot(db, current_user.id, offset, limit)
+    
+    synced_at = datetime.fromisoformat(snapshot["synced_at"]) if snapshot["synced_at"] else None
+    age = (datetime.utcnow() - synced_at).total_seconds() if synced_at else None
+    stale = age is None or age > settings.DOUYIN_SYNC_INTERVAL
+    syncing = False
+    if stale and await claim_sync(current_user.id):
+        try:
+            await run_in_threadpool(sync_douyin_videos_task.delay, current_user.id)
+            syncing = True
+        except Exception as e:
+            logger.warning("提交抖音视频同步任务失败: %s", e)
+    return {**snapshot, "age_seconds": age, "stale": stale, "syncing": syncing}
 
 
 @router.post("/publish/{video_id}", response_model=dict)
-async def publish_video_to_douyin(video_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """将本地视频发布到抖音"""
-    video = db.query(Video).filter(Video.id == video_id, Video.user_id == current_user.id).first()
+async def publish_video_to_douyin(
+    video_id: int,
+    idempotency_key: Optional[str] = Header(None, max_length=128),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """提交发布任务，由后台worker将本地视频上传到抖音"""
+    video = await get_user_video(db, video_id, current_user.id)
     if not video:
         raise HTTPException(status_code=404, detail="视频不存在")
-    try:
-        access_token = await douyin_service.ensure_valid_token(db, current_user)
-        result = await douyin_service.upload_video(access_token, video.file_path, video.title, video.description)
-        # 创建发布任务记录
-        task_id = result["data"]["task_id"]
+    if not current_user.douyin_user_id:
+        raise HTTPException(status_code=400, detail="用户未授权抖音账号")
+    
+    # 相同幂等键的重复提交直接返回已有任务
+    scoped_key = f"{current_user.id}:{idempotency_key}" if idempotency_key else None
+    if scoped_key:
+        existing = await db.scalar(select(PublishTask).where(PublishTask.idempotency_key == scoped_key))
+        if existing:
+            return {"message": "发布任务已存在", **publish_task_to_dict(existing)}
+    
+    # 同一视频已有排队或上传中的任务时不再重复提交
+    active = await db.scalar(select(PublishTask).where(
+        PublishTask.video_id == video.id,
+        PublishTask.user_id == current_user.id,
+        PublishTask.status.in_(["queued", "uploading"])
+    ).limit(1))
+    if active:
+        return {"message": "发布任务已存在", **publish_task_to_dict(active)}
+    
+    # 上次上传中断时复用原任务，worker会从最后成功的分片继续
+    publish_task = await db.scalar(select(PublishTask).where(
+        PublishTask.video_id == video.id,
+        PublishTask.user_id == current_user.id,
+        PublishTask.task_id.is_(None),
+        PublishTask.status == "failed"
+    ).order_by(PublishTask.id.desc()).limit(1))
+    if not publish_task:
         publish_task = PublishTask(
             video_id=video.id,
             user_id=current_user.id,
-            task_id=task_id,
-            status="processing",
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
+            progress=0,
+            task_metadata={},
+            created_at=datetime.utcnow()
         )
         db.add(publish_task)
-        db.commit()
-        db.refresh(publish_task)
-        video.publish_status = "processing"
-        db.commit()
-        return {"message": "发布任务已创建", "task_id": task_id}
+    publish_task.status = "queued"
+    publish_task.error_message = None
+    publish_task.idempotency_key = scoped_key
+    publish_task.updated_at = datetime.utcnow()
+    video.publish_status = "processing"
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 相同幂等键的并发请求已先一步提交，返回那个任务
+        await db.rollback()
+        existing = await db.scalar(select(PublishTask).where(PublishTask.idempotency_key == scoped_key)) if scoped_key else None
+        if not existing:
+            raise
+        return {"message": "发布任务已存在", **publish_task_to_dict(existing)}
+    
+    try:
+        await run_in_threadpool(publish_video_task.delay, publish_task.id)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        publish_task.status = "failed"
+        publish_task.error_message = f"提交后台任务失败: {e}"
+        video.publish_status = "failed"
+        await db.commit()
+        raise HTTPException(status_code=503, detail="发布队列不可用，请稍后重试")
+    
+    return {"message": "发布任务已提交", **publish_task_to_dict(publish_task)}
+
+
+@router.get("/publish/tasks/{publish_task_id}", response_model=dict)
+async def get_publish_task(publish_task_id: int, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user)):
+    """查询发布任务的上传进度和状态"""
+    publish_task = await db.scalar(select(PublishTask).where(PublishTask.id == publish_task_id, PublishTask.user_id == current_user.id))
+    if not publish_task:
+        raise HTTPException(status_code=404, detail="发布任务不存在")
+    return publish_task_to_dict(publish_task)
 
 
 @router.get("/publish/status/{task_id}", response_model=dict)
-async def get_publish_status(task_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """查询抖音视频发布状态"""
-    publish_task = db.query(PublishTask).filter(PublishTask.task_id == task_id, PublishTask.user_id == current_user.id).first()
+async def get_publish_status(task_id: str, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user)):
+    """查询抖音视频发布状态（由后台轮询器更新，不直接请求抖音）"""
+    publish_task = await db.scalar(select(PublishTask).where(PublishTask.task_id == task_id, PublishTask.user_id == current_user.id))
     if not publish_task:
         raise HTTPException(status_code=404, detail="发布任务不存在")
-    try:
-        access_token = await douyin_service.ensure_valid_token(db, current_user)
-        result = await douyin_service.check_publish_status(access_token, task_id)
-        # 更新任务状态
-        status = result["data"].get("status")
-        publish_task.status = status
-        publish_task.updated_at = datetime.utcnow()
-        db.commit()
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
+    return publish_task_to_dict(publish_task)
+
+
+@router.get("/publish/events")
+async def publish_status_events(current_user: User = Depends(get_stream_user)):
+    """以Server-Sent Events推送当前用户发布任务的状态变化"""
+    return StreamingResponse(
+        stream_status_events(current_user.id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,73 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.core.config import settings
+from app.core.database import get_async_read_db
+from app.core.media import MediaFileResponse
+from app.models.user import User
+from app.models.video import Video
+from app.models.ai_generation import AIGeneration
+from app.api.auth import get_current_user, get_media_user_id, sign_media_url
+import os
+
+router = APIRouter()
+
+
+def serve_media(file_path: Optional[str]) -> Response:
+    """返回上传目录中的文件；配置了MEDIA_ACCEL_REDIRECT_PREFIX时交给nginx发送"""
+    if not file_path or not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="文件不存在")
+    upload_dir = os.path.realpath(settings.UPLOAD_DIR)
+    real_path = os.path.realpath(file_path)
+    if os.path.commonpath([upload_dir, real_path]) != upload_dir:
+        raise HTTPException(status_code=404, detail="文件不存在")
+    
+    if settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        relative_path = os.path.relpath(real_path, upload_dir).replace(os.sep, "/")
+        # Range、条件请求和sendfile由nginx处理，后端只负责鉴权
+        return Response(headers={"X-Accel-Redirect": settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip("/") + "/" + relative_path})
+    return MediaFileResponse(real_path)
+
+
+@router.get("/videos/{video_id}/url", response_model=dict)
+async def get_video_file_url(video_id: int, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user)):
+    """获取视频文件的短期签名链接，供<video>标签播放"""
+    exists = await db.scalar(select(Video.id).where(Video.id == video_id, Video.user_id == current_user.id))
+    if not exists:
+        raise HTTPException(status_code=404, detail="视频不存在")
+    return {"url": sign_media_url(f"{settings.API_V1_STR}/media/videos/{video_id}", current_user.id), "expires_in": settings.MEDIA_URL_TTL}
+
+
+@router.get("/generations/{generation_id}/url", response_model=dict)
+async def get_generation_file_url(generation_id: int, db: AsyncSession = Depends(get_async_read_db), current_user: User = Depends(get_current_user)):
+    """获取AI生成文件的短期签名链接"""
+    exists = await db.scalar(
+        select(AIGeneration.id).where(AIGeneration.id == generation_id, AIGeneration.user_id == current_user.id)
+    )
+    if not exists:
+        raise HTTPException(status_code=404, detail="生成记录不存在")
+    return {
+        "url": sign_media_url(f"{settings.API_V1_STR}/media/generations/{generation_id}", current_user.id),
+        "expires_in": settings.MEDIA_URL_TTL
+    }
+
+
+@router.api_route("/videos/{video_id}", methods=["GET", "HEAD"])
+async def get_video_file(video_id: int, db: AsyncSession = Depends(get_async_read_db), user_id: int = Depends(get_media_user_id)):
+    """播放或下载视频文件，支持Range拖动"""
+    file_path = await db.scalar(select(Video.file_path).where(Video.id == video_id, Video.user_id == user_id))
+    # 依赖的会话要到响应体发送完才会关闭，提前归还连接，播放和拖动期间不占用连接池
+    await db.close()
+    return serve_media(file_path)
+
+
+@router.api_route("/generations/{generation_id}", methods=["GET", "HEAD"])
+async def get_generation_file(generation_id: int, db: AsyncSession = Depends(get_async_read_db), user_id: int = Depends(get_media_user_id)):
+    """获取AI生成的文件"""
+    file_path = await db.scalar(
+        select(AIGeneration.file_path).where(AIGeneration.id == generation_id, AIGeneration.user_id == user_id)
+    )
+    await db.close()
+    return serve_media(file_path)
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+from typing import List
+from app.core.config import settings
+from app.core.profiling import list_profiles, token_matches
+import os
+import re
+
+router = APIRouter()
+
+PROFILE_NAME = re.compile(r"^[A-Za-z0-9_]+\.prof$")
+
+
+def require_profiling_token(x_profile_token: str = Header("")):
+    """分析结果只对持有PROFILING_TOKEN的管理员开放"""
+    if not settings.PROFILING_ENABLED or not settings.PROFILING_TOKEN:
+        raise HTTPException(status_code=404, detail="未开启性能分析")
+    if not token_matches(x_profile_token):
+        raise HTTPException(status_code=403, detail="无效的分析令牌")
+
+
+@router.get("/", response_model=List[dict], dependencies=[Depends(require_profiling_token)])
+async def get_profiles():
+    """列出最近的性能分析文件"""
+    return list_profiles()
+
+
+@router.get("/{name}", dependencies=[Depends(require_profiling_token)])
+async def download_profile(name: str):
+    """下载pstats文件，可用python -m pstats、snakeviz或flameprof查看"""
+    path = os.path.join(settings.PROFILING_DIR, name)
+    if not PROFILE_NAME.match(name) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="分析文件不存在")
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
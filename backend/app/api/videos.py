@@ -1,32 +1,104 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.core.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, Response
+from pydantic import BaseModel, Field
+from sqlalchemy import and_, or_, select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional, Tuple
+from app.core.config import settings
+from app.core.database import get_async_db, get_async_read_db
 from app.models.video import Video
 from app.models.user import User
+from app.models.publish_task import PublishTask
+from app.models.ai_generation import AIGeneration
 from app.api.auth import get_current_user
+from app.services.media_probe import MediaProbeError, probe_video, douyin_rejection, metadata_columns
+from app.services.media_storage import save_upload_to_temp, find_blob, acquire_blob, release_blobs, remove_files, file_extension
 from datetime import datetime
-import os
+import base64
+import json
 
 router = APIRouter()
 
 
+class VideoPatch(BaseModel):
+    title: Optional[str] = Field(None, max_length=255)
+    description: Optional[str] = None
+    status: Optional[Literal["draft", "published", "failed"]] = None
+
+
+class BulkVideoRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=settings.VIDEO_BULK_MAX_IDS)
+    action: Literal["update", "delete"]
+    patch: Optional[VideoPatch] = None
+
+# 列表接口只查询需要返回的列
+LIST_COLUMNS = (
+    Video.id,
+    Video.title,
+    Video.description,
+    Video.status,
+    Video.publish_status,
+    Video.douyin_url,
+    Video.duration,
+    Video.width,
+    Video.height,
+    Video.file_size,
+    Video.created_at,
+    Video.updated_at
+)
+
+
+def encode_cursor(created_at: datetime, video_id: int) -> str:
+    """将最后一条记录的排序键编码为不透明的分页游标"""
+    raw = json.dumps([created_at.isoformat(), video_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析分页游标"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, video_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(video_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+async def get_user_video(db: AsyncSession, video_id: int, user_id: int) -> Optional[Video]:
+    """查询属于指定用户的视频"""
+    result = await db.execute(select(Video).where(Video.id == video_id, Video.user_id == user_id))
+    return result.scalar_one_or_none()
+
+
 @router.get("/", response_model=List[dict])
-async def list_videos(skip: int = 0, limit: int = 20, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    """获取当前用户的视频列表"""
-    videos = db.query(Video).filter(Video.user_id == current_user.id).offset(skip).limit(limit).all()
-    return [
-        {
-            "id": v.id,
-            "title": v.title,
-            "description": v.description,
-            "status": v.status,
-            "publish_status": v.publish_status,
-            "douyin_url": v.douyin_url,
-            "created_at": v.created_at,
-            "updated_at": v.updated_at
-        } for v in videos
-    ]
+async def list_videos(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    min_duration: Optional[int] = Query(None, ge=0),
+    max_duration: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取当前用户的视频列表，按创建时间倒序，可按时长(秒)筛选；下一页游标通过X-Next-Cursor响应头返回"""
+    query = select(*LIST_COLUMNS).where(Video.user_id == current_user.id)
+    if min_duration is not None:
+        query = query.where(Video.duration >= min_duration)
+    if max_duration is not None:
+        query = query.where(Video.duration <= max_duration)
+    if cursor:
+        created_at, last_id = decode_cursor(cursor)
+        query = query.where(or_(
+            Video.created_at < created_at,
+            and_(Video.created_at == created_at, Video.id < last_id)
+        ))
+    result = await db.execute(query.order_by(Video.created_at.desc(), Video.id.desc()).limit(limit + 1))
+    rows = result.all()
+    
+    # 多取一条用于判断是否还有下一页
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return [dict(row._mapping) for row in rows]
 
 
 @router.post("/upload", response_model=dict)
@@ -34,35 +106,94 @@ async def upload_video(
     file: UploadFile = File(...),
     title: str = Form(...),
     description: str = Form(""),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    """上传视频文件"""
-    upload_dir = "uploads"
-    os.makedirs(upload_dir, exist_ok=True)
-    file_path = os.path.join(upload_dir, file.filename)
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+    """上传视频文件；文件按内容哈希存储，相同内容只保存一份"""
+    tmp_path, sha256, file_size = await save_upload_to_temp(file)
+    blob, created = None, False
+    try:
+        # 相同内容已上传过时直接复用解析结果，否则解析视频元数据，不满足抖音要求的文件直接拒绝
+        blob = await find_blob(db, sha256)
+        metadata = blob.media_metadata if blob else None
+        try:
+            if metadata is None:
+                metadata = await probe_video(tmp_path)
+            rejection = douyin_rejection(metadata)
+        except MediaProbeError as e:
+            rejection = str(e)
+        if rejection:
+            raise HTTPException(status_code=400, detail=rejection)
+        
+        blob, created = await acquire_blob(db, tmp_path, sha256, file_size, file_extension(file.filename), metadata)
+        video = Video(
+            user_id=current_user.id,
+            title=title,
+            description=description,
+            file_path=blob.file_path,
+            blob_id=blob.id,
+            **metadata_columns(metadata),
+            status="draft",
+            created_at=datetime.utcnow(),
+            updated_at=datetime.utcnow()
+        )
+        db.add(video)
+        await db.commit()
+    except BaseException:
+        # 登记或提交失败时删除本次新建的文件
+        if created:
+            remove_files([blob.file_path])
+        raise
+    finally:
+        # 临时文件成功登记后已被移走或丢弃，其余任何情况(包括解析出错、请求被取消)都在这里删除
+        remove_files([tmp_path])
+    return {"id": video.id, "title": video.title, "file_path": video.file_path, "duration": video.duration}
+
+
+@router.post("/bulk", response_model=dict)
+async def bulk_video_operation(request: BulkVideoRequest, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
+    """批量更新或删除视频，在一个事务内用一条UPDATE/DELETE完成"""
+    ids = list(dict.fromkeys(request.ids))
+    values = request.patch.model_dump(exclude_none=True) if request.patch else {}
+    if request.action == "update" and not values:
+        raise HTTPException(status_code=400, detail="缺少要更新的字段")
+    
+    result = await db.execute(select(Video.id, Video.blob_id).where(Video.id.in_(ids), Video.user_id == current_user.id))
+    rows = result.all()
+    owned = {row.id for row in rows}
+    
+    if owned:
+        scope = (Video.id.in_(owned), Video.user_id == current_user.id)
+        if request.action == "update":
+            values["updated_at"] = datetime.utcnow()
+            await db.execute(
+                update(Video).where(*scope).values(**values).execution_options(synchronize_session=False)
+            )
+        else:
+            # 与单个删除一致：关联的发布任务和AI生成记录保留，只解除与视频的关联
+            await db.execute(
+                update(PublishTask).where(PublishTask.video_id.in_(owned)).values(video_id=None)
+                .execution_options(synchronize_session=False)
+            )
+            await db.execute(
+                update(AIGeneration).where(AIGeneration.video_id.in_(owned)).values(video_id=None)
+                .execution_options(synchronize_session=False)
+            )
+            await db.execute(delete(Video).where(*scope).execution_options(synchronize_session=False))
+            orphan_paths = await release_blobs(db, [row.blob_id for row in rows])
+        await db.commit()
+        if request.action == "delete":
+            remove_files(orphan_paths)
     
-    video = Video(
-        user_id=current_user.id,
-        title=title,
-        description=description,
-        file_path=file_path,
-        status="draft",
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
-    )
-    db.add(video)
-    db.commit()
-    db.refresh(video)
-    return {"id": video.id, "title": video.title, "file_path": video.file_path}
+    outcome = "updated" if request.action == "update" else "deleted"
+    results = [{"id": video_id, "result": outcome if video_id in owned else "not_found"} for video_id in ids]
+    return {"action": request.action, "affected": len(owned), "results": results}
 
 
 @router.get("/{video_id}", response_model=dict)
-async def get_video(video_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_video(video_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     """获取单个视频详情"""
-    video = db.query(Video).filter(Video.id == video_id, Video.user_id == current_user.id).first()
+    video = await get_user_video(db, video_id, current_user.id)
     if not video:
         raise HTTPException(status_code=404, detail="视频不存在")
     return {
@@ -72,15 +203,21 @@ async def get_video(video_id: int, db: Session = Depends(get_db), current_user:
         "status": video.status,
         "publish_status": video.publish_status,
         "douyin_url": video.douyin_url,
+        "duration": video.duration,
+        "width": video.width,
+        "height": video.height,
+        "video_codec": video.video_codec,
+        "bitrate": video.bitrate,
+        "file_size": video.file_size,
         "created_at": video.created_at,
         "updated_at": video.updated_at
     }
 
 
 @router.put("/{video_id}", response_model=dict)
-async def update_video(video_id: int, title: Optional[str] = Form(None), description: Optional[str] = Form(None), db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def update_video(video_id: int, title: Optional[str] = Form(None), description: Optional[str] = Form(None), db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     """更新视频信息"""
-    video = db.query(Video).filter(Video.id == video_id, Video.user_id == current_user.id).first()
+    video = await get_user_video(db, video_id, current_user.id)
     if not video:
         raise HTTPException(status_code=404, detail="视频不存在")
     if title:
@@ -88,17 +225,18 @@ async def update_video(video_id: int, title: Optional[str] = Form(None), descrip
     if description:
         video.description = description
     video.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(video)
+    await db.commit()
     return {"id": video.id, "title": video.title, "description": video.description}
 
 
 @router.delete("/{video_id}", response_model=dict)
-async def delete_video(video_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def delete_video(video_id: int, db: AsyncSession = Depends(get_async_db), current_user: User = Depends(get_current_user)):
     """删除视频"""
-    video = db.query(Video).filter(Video.id == video_id, Video.user_id == current_user.id).first()
+    video = await get_user_video(db, video_id, current_user.id)
     if not video:
         raise HTTPException(status_code=404, detail="视频不存在")
-    db.delete(video)
-    db.commit()
+    await db.delete(video)
+    orphan_paths = await release_blobs(db, [video.blob_id])
+    await db.commit()
+    remove_files(orphan_paths)
     return {"message": "删除成功"} 
\ No newline at end of file
@@ -0,0 +1,226 @@
+import asyncio
+import ipaddress
+import logging
+import math
+import time
+import uuid
+from collections import deque
+from functools import lru_cache
+from typing import Optional, Tuple, Union
+from jose import JWTError, jwt
+from redis.exceptions import RedisError
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .cache import LRUCache
+from .config import settings
+from .redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# 滑动窗口日志：删除窗口外的记录，未超限时记录本次请求并返回0，否则返回最早记录过期前需要等待的毫秒数
+SLIDING_WINDOW_SCRIPT = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+if redis.call('ZCARD', KEYS[1]) < limit then
+  redis.call('ZADD', KEYS[1], now, ARGV[3])
+  redis.call('PEXPIRE', KEYS[1], window)
+  return 0
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return math.max(1, tonumber(oldest[2]) + window - now)
+"""
+
+
+class SlidingWindowLimiter:
+    """按用户和路由组计数的滑动窗口限额，Redis不可用时退化为进程内计数"""
+
+    def __init__(self, window: int):
+        self.window = window
+        self._script = None
+        self._local = LRUCache(maxsize=settings.USER_CACHE_MAXSIZE, ttl=window)
+
+    async def hit(self, key: str, limit: int) -> float:
+        """记录一次请求，未超限返回0，否则返回需要等待的秒数"""
+        try:
+            if self._script is None:
+                self._script = get_redis().register_script(SLIDING_WINDOW_SCRIPT)
+            wait_ms = await self._script(keys=[f"quota:{key}"], args=[limit, self.window * 1000, uuid.uuid4().hex])
+            return int(wait_ms) / 1000
+        except RedisError as e:
+            logger.warning("共享限额不可用，使用进程内计数: %s", e)
+            return self._hit_local(key, limit)
+
+    def _hit_local(self, key: str, limit: int) -> float:
+        now = time.monotonic()
+        hits = self._local.get(key)
+        if hits is None:
+            hits = deque()
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        wait = 0.0
+        if len(hits) < limit:
+            hits.append(now)
+        else:
+            wait = hits[0] + self.window - now
+        self._local.set(key, hits)
+        return wait
+
+
+class RouteGate:
+    """单个路由组在本进程内的并发上限、排队深度和延迟监控"""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self.latency = 0.0  # 首字节延迟的指数滑动平均(秒)
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def overloaded(self) -> bool:
+        """排队已满，或并发已满且近期延迟超过阈值时拒绝新请求"""
+        if self.waiting >= self.max_queue:
+            return True
+        return self.active >= self.concurrency and self.latency > settings.ADMISSION_LATENCY_THRESHOLD
+
+    async def acquire(self) -> bool:
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), settings.ADMISSION_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def observe(self, seconds: float):
+        self.latency = self.latency * 0.8 + seconds * 0.2
+
+
+def _too_many(detail: str, retry_after: float, status_code: int = 429) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
+
+
+@lru_cache(maxsize=1)
+def _trusted_networks() -> Tuple[Union[ipaddress.IPv4Network, ipaddress.IPv6Network], ...]:
+    return tuple(ipaddress.ip_network(item, strict=False) for item in settings.ADMISSION_TRUSTED_PROXIES)
+
+
+def _is_trusted_proxy(ip: str) -> bool:
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_networks())
+
+
+def client_ip(scope: Scope) -> str:
+    """请求的真实客户端IP
+
+    只有直连对端是受信任的反向代理时才读取X-Forwarded-For/X-Real-IP，否则这些请求头可以被客户端伪造。
+    X-Forwarded-For从右往左取第一个不受信任的地址，最左侧由客户端自己填写的部分不参与判断。
+    """
+    client = scope.get("client")
+    ip = client[0] if client else "unknown"
+    if not _is_trusted_proxy(ip):
+        return ip
+    headers = Headers(scope=scope)
+    forwarded = [item.strip() for item in headers.get("x-forwarded-for", "").split(",") if item.strip()]
+    for hop in reversed(forwarded):
+        if not _is_trusted_proxy(hop):
+            return hop
+    return headers.get("x-real-ip", "").strip() or (forwarded[0] if forwarded else ip)
+
+
+class AdmissionControlMiddleware:
+    """API准入控制：按用户和路由组限制请求频率，按路由组限制并发，过载时快速返回429/503
+
+    路由组：ai（AI生成，不含图片读取）、publish（提交发布任务）、default（其余API）。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.prefix = settings.API_V1_STR
+        self.limiter = SlidingWindowLimiter(settings.RATE_LIMIT_WINDOW)
+        self.limits = {
+            "ai": settings.RATE_LIMIT_AI,
+            "publish": settings.RATE_LIMIT_PUBLISH,
+            "default": settings.RATE_LIMIT_DEFAULT
+        }
+        self.gates = {
+            "ai": RouteGate("ai", settings.ADMISSION_AI_CONCURRENCY, settings.ADMISSION_MAX_QUEUE),
+            "publish": RouteGate("publish", settings.ADMISSION_PUBLISH_CONCURRENCY, settings.ADMISSION_MAX_QUEUE)
+        }
+
+    def route_group(self, method: str, path: str) -> Optional[str]:
+        if not path.startswith(self.prefix + "/"):
+            return None
+        path = path[len(self.prefix):]
+        if path.startswith("/ai/") and not path.startswith("/ai/images/"):
+            return "ai"
+        if method == "POST" and path.startswith("/douyin/publish/"):
+            return "publish"
+        return "default"
+
+    @staticmethod
+    def client_key(scope: Scope) -> str:
+        """已登录用户按用户名计数，否则按客户端IP计数；这里只解析令牌，不查询数据库"""
+        headers = Headers(scope=scope)
+        authorization = headers.get("authorization", "")
+        token = authorization[7:] if authorization.lower().startswith("bearer ") else None
+        if token:
+            try:
+                username = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]).get("sub")
+                if username:
+                    return f"user:{username}"
+            except JWTError:
+                pass
+        return f"ip:{client_ip(scope)}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not settings.ADMISSION_ENABLED or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        group = self.route_group(scope["method"], scope["path"])
+        if group is None:
+            await self.app(scope, receive, send)
+            return
+
+        wait = await self.limiter.hit(f"{group}:{self.client_key(scope)}", self.limits[group])
+        if wait > 0:
+            await _too_many("请求过于频繁，请稍后重试", wait)(scope, receive, send)
+            return
+
+        gate = self.gates.get(group)
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+        if gate.overloaded() or not await gate.acquire():
+            await _too_many("服务繁忙，请稍后重试", 1, status_code=503)(scope, receive, send)
+            return
+
+        started_at = time.monotonic()
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                gate.observe(time.monotonic() - started_at)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            gate.release()
@@ -0,0 +1,88 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from redis.exceptions import RedisError
+from .redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """进程内有容量上限和过期时间的LRU缓存"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+
+class TieredCache:
+    """进程内LRU + 可选Redis二级缓存，值需可JSON序列化"""
+
+    def __init__(self, namespace: str, maxsize: int, ttl: float, redis_ttl: Optional[float] = None, use_redis: bool = True):
+        self.namespace = namespace
+        self.local = LRUCache(maxsize, ttl)
+        self.redis_ttl = redis_ttl or ttl
+        self.use_redis = use_redis
+
+    def _redis_key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.local.get(key)
+        if value is not None or not self.use_redis:
+            return value
+        try:
+            raw = await get_redis().get(self._redis_key(key))
+        except RedisError as e:
+            logger.warning("读取Redis缓存失败: %s", e)
+            return None
+        if raw is None:
+            return None
+        value = json.loads(raw)
+        self.local.set(key, value)
+        return value
+
+    async def set(self, key: str, value: Any):
+        self.local.set(key, value)
+        if not self.use_redis:
+            return
+        try:
+            await get_redis().set(self._redis_key(key), json.dumps(value, default=str), ex=int(self.redis_ttl))
+        except RedisError as e:
+            logger.warning("写入Redis缓存失败: %s", e)
+
+    async def delete(self, key: str):
+        """删除本进程和Redis中的缓存项"""
+        self.local.delete(key)
+        if not self.use_redis:
+            return
+        try:
+            await get_redis().delete(self._redis_key(key))
+        except RedisError as e:
+            logger.warning("删除Redis缓存失败: %s", e)
@@ -15,25 +15,138 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # 已认证用户缓存配置
+    USER_CACHE_MAXSIZE: int = 10000  # 进程内缓存的用户数上限
+    USER_CACHE_TTL: int = 30  # 进程内缓存有效期(秒)，其他进程的失效最多延迟该时长生效
+    USER_CACHE_REDIS_ENABLED: bool = True  # 是否使用Redis二级缓存
+    USER_CACHE_REDIS_TTL: int = 300  # Redis缓存有效期(秒)
+    
+    # API准入控制
+    ADMISSION_ENABLED: bool = True
+    RATE_LIMIT_WINDOW: int = 60  # 请求限额的滑动窗口(秒)
+    RATE_LIMIT_DEFAULT: int = 300  # 每个用户每个窗口的普通API请求数
+    RATE_LIMIT_AI: int = 30  # 每个用户每个窗口的AI生成请求数
+    RATE_LIMIT_PUBLISH: int = 20  # 每个用户每个窗口的发布提交数
+    ADMISSION_AI_CONCURRENCY: int = 32  # 每个进程同时处理的AI请求数
+    ADMISSION_PUBLISH_CONCURRENCY: int = 16  # 每个进程同时处理的发布提交数
+    ADMISSION_MAX_QUEUE: int = 64  # 每个路由组最多排队的请求数，超出返回503
+    ADMISSION_QUEUE_TIMEOUT: float = 5.0  # 排队等待的最长时间(秒)
+    ADMISSION_LATENCY_THRESHOLD: float = 10.0  # 并发已满且平均首字节延迟超过该值(秒)时拒绝新请求
+    ADMISSION_TRUSTED_PROXIES: List[str] = ["127.0.0.1", "::1"]  # 受信任的反向代理IP/网段，只有来自这些地址的X-Forwarded-For才用于按IP限额
+    
+    # 监控配置
+    METRICS_ENABLED: bool = True
+    METRICS_STATE_TTL: float = 15.0  # /metrics中任务数、队列长度等需要查询的数据缓存时间(秒)
+    PROFILING_ENABLED: bool = False  # 关闭时不注册分析中间件，没有任何开销
+    PROFILING_TOKEN: Optional[str] = None  # 请求头X-Profile-Token需与之一致才能按需分析和下载结果
+    PROFILING_SAMPLE_RATE: float = 0.0  # 随机抽样分析的请求比例(0~1)
+    PROFILING_DIR: str = "profiles"  # 分析结果(pstats)保存目录
+    PROFILING_MAX_FILES: int = 200  # 最多保留的分析文件数，超出删除最旧的
+    
     # 数据库配置
     DATABASE_URL: str = "sqlite:///./douyin_manager.db"
+    DATABASE_READ_URL: Optional[str] = None  # 只读库(副本)地址，未配置时使用DATABASE_URL
+    DATABASE_PROFILE: str = "development"  # development / production，production启用SQLite WAL等调优
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # 等待连接的超时(秒)
+    DB_POOL_RECYCLE: int = 1800  # 连接最长复用时间(秒)
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # 写锁被占用时的等待时间(毫秒)
+    SQLITE_CACHE_SIZE_KB: int = 65536  # 每个连接的页缓存大小(KB)
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # 内存映射读取的大小(字节)
     
     # Redis配置
     REDIS_URL: str = "redis://localhost:6379"
     
+    # 后台任务配置
+    CELERY_BROKER_URL: Optional[str] = None  # 未配置时使用REDIS_URL
+    CELERY_RESULT_BACKEND: Optional[str] = None  # 未配置时使用REDIS_URL
+    CELERY_WORKER_CONCURRENCY: int = 4  # 每个worker进程池的并发数
+    PUBLISH_MAX_RETRIES: int = 5  # 发布任务最大重试次数
+    PUBLISH_RETRY_BACKOFF: int = 30  # 首次重试等待(秒)，之后指数增长
+    PUBLISH_RETRY_BACKOFF_MAX: int = 600  # 重试等待上限(秒)
+    PUBLISH_POLL_TICK: float = 5.0  # 发布状态轮询调度间隔(秒)
+    PUBLISH_POLL_BATCH_SIZE: int = 500  # 每轮最多轮询的任务数
+    PUBLISH_POLL_CONCURRENCY: int = 10  # 同时向抖音查询状态的请求数
+    PUBLISH_POLL_MIN_INTERVAL: int = 5  # 新任务的轮询间隔(秒)
+    PUBLISH_POLL_MAX_INTERVAL: int = 300  # 老任务的最大轮询间隔(秒)
+    PUBLISH_POLL_BACKOFF_FACTOR: float = 0.1  # 轮询间隔 = 任务存在时长 × 系数
+    
     # 抖音API配置
     DOUYIN_CLIENT_ID: Optional[str] = None
     DOUYIN_CLIENT_SECRET: Optional[str] = None
     DOUYIN_REDIRECT_URI: str = "http://localhost:3000/auth/callback"
     DOUYIN_API_BASE_URL: str = "https://open.douyin.com"
+    DOUYIN_UPLOAD_PART_SIZE: int = 5 * 1024 * 1024  # 分片上传每片大小(5MB)
+    DOUYIN_UPLOAD_CONCURRENCY: int = 4  # 同时上传的分片数
+    DOUYIN_UPLOAD_PART_RETRIES: int = 3  # 单个分片失败后的重试次数
+    DOUYIN_TOKEN_EXPIRY_SKEW: int = 60  # 请求时令牌剩余有效期不足该秒数即刷新
+    DOUYIN_TOKEN_REFRESH_MARGIN: int = 1800  # 后台提前刷新剩余有效期不足该秒数的令牌
+    DOUYIN_TOKEN_SWEEP_INTERVAL: int = 60  # 后台令牌刷新扫描间隔(秒)
+    DOUYIN_TOKEN_SWEEP_BATCH_SIZE: int = 200  # 每次扫描最多刷新的用户数
+    DOUYIN_SYNC_INTERVAL: int = 300  # 抖音视频列表镜像的刷新间隔(秒)，超过后视为过期并在后台同步
+    DOUYIN_SYNC_FULL_INTERVAL: int = 86400  # 完整同步(刷新所有视频的统计数据)间隔(秒)
+    DOUYIN_SYNC_PAGE_SIZE: int = 20  # 同步时每页拉取的视频数
+    DOUYIN_SYNC_MAX_PAGES: int = 500  # 单次同步最多拉取的页数
+    DOUYIN_SYNC_LOCK_TIMEOUT: int = 120  # 同步锁有效期(秒)，每拉取一页重置；需大于单页请求(含重试)的耗时
+    DOUYIN_VIDEO_CACHE_TTL: int = 60  # 视频列表快照的缓存时间(秒)
+    DOUYIN_MIN_DURATION: int = 1  # 允许发布的最短视频时长(秒)
+    DOUYIN_MAX_DURATION: int = 900  # 允许发布的最长视频时长(秒)
+    DOUYIN_VIDEO_CODECS: List[str] = ["h264", "hevc"]  # 允许发布的视频编码
+    
+    # 出站HTTP连接池配置
+    HTTP2_ENABLED: bool = False  # 需要安装h2
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # 空闲连接保留时间(秒)
+    HTTP_CONNECT_TIMEOUT: float = 5.0  # 建立连接超时(秒)
+    DOUYIN_API_TIMEOUT: float = 10.0  # 普通抖音接口超时(秒)
+    DOUYIN_UPLOAD_TIMEOUT: float = 120.0  # 分片上传超时(秒)
+    AI_HTTP_TIMEOUT: float = 120.0  # AI图像接口超时(秒)
+    
+    # 出站调用策略（限流在所有进程间通过Redis共享）
+    DOUYIN_RATE_LIMIT: float = 10.0  # 每秒允许的抖音API调用数
+    DOUYIN_RATE_BURST: int = 20  # 抖音API允许的突发调用数
+    OPENAI_RATE_LIMIT: float = 5.0
+    OPENAI_RATE_BURST: int = 10
+    STABILITY_RATE_LIMIT: float = 2.0
+    STABILITY_RATE_BURST: int = 4
+    DOUYIN_CALL_DEADLINE: float = 30.0  # 单次抖音API调用(含重试)的截止时间(秒)
+    AI_CALL_DEADLINE: float = 180.0  # 单次AI调用(含排队和重试)的截止时间(秒)
+    OUTBOUND_MAX_RETRIES: int = 3  # 可重试错误的最大重试次数
+    OUTBOUND_RETRY_BACKOFF: float = 0.5  # 首次重试的最大等待(秒)，之后指数增长并随机抖动
+    OUTBOUND_RETRY_BACKOFF_MAX: float = 10.0  # 单次重试等待上限(秒)
+    CIRCUIT_FAILURE_THRESHOLD: int = 5  # 连续失败多少次后熔断
+    CIRCUIT_RESET_TIMEOUT: float = 30.0  # 熔断后多久放行探测请求(秒)
     
     # AI生成配置
     OPENAI_API_KEY: Optional[str] = None
+    OPENAI_BASE_URL: Optional[str] = None  # 未配置时使用官方地址，压测时指向本地模拟服务
     STABILITY_API_KEY: Optional[str] = None
+    STABILITY_API_BASE_URL: str = "https://api.stability.ai"
+    AI_OPENAI_CONCURRENCY: int = 8  # 同时进行的OpenAI请求数
+    AI_STABILITY_CONCURRENCY: int = 4  # 同时进行的Stability请求数
+    AI_MAX_QUEUE_DEPTH: int = 32  # 每个提供方最多排队等待的请求数，超出直接返回繁忙
+    AI_CACHE_MAXSIZE: int = 1000  # 进程内缓存的文本生成结果数
+    AI_CACHE_TTL: int = 3600  # 进程内缓存有效期(秒)
+    AI_CACHE_REDIS_ENABLED: bool = True  # 是否使用Redis共享缓存
+    AI_CACHE_REDIS_TTL: int = 86400  # Redis缓存有效期(秒)
+    AI_BATCH_MAX_ITEMS: int = 500  # 批量文案生成单次最多条目数
+    AI_BATCH_CONCURRENCY: int = 8  # 批量生成时同时进行的生成数
+    AI_BATCH_COMMIT_SIZE: int = 50  # 批量生成结果每多少条提交一次数据库
+    AI_IMAGE_SIZES: List[int] = [256, 512]  # 生成图片的缩略图边长(像素)
+    AI_IMAGE_FORMAT: str = "webp"  # 缩略图格式：webp / jpeg
+    AI_IMAGE_QUALITY: int = 80  # 缩略图编码质量
+    AI_IMAGE_WORKERS: int = 2  # 图片处理进程数
     
     # 文件存储配置
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 100 * 1024 * 1024  # 100MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 上传时每次读写的块大小(1MB)
+    VIDEO_BULK_MAX_IDS: int = 500  # 批量操作单次最多处理的视频数
+    MEDIA_CHUNK_SIZE: int = 256 * 1024  # 媒体文件每次发送的块大小(字节)
+    MEDIA_URL_TTL: int = 1800  # 媒体签名链接有效期(秒)，覆盖一次播放中的拖动请求
+    MEDIA_ACCEL_REDIRECT_PREFIX: Optional[str] = None  # 配置后由nginx的internal location(如/protected-media/)发送文件
     
     # CORS配置
     BACKEND_CORS_ORIGINS: Union[List[str], str] = [
@@ -1,17 +1,88 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from .config import settings
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def get_async_database_url(url: str) -> str:
+    """将数据库URL转换为对应的异步驱动（SQLite使用aiosqlite，PostgreSQL使用asyncpg）"""
+    scheme, _, rest = url.partition("://")
+    if scheme == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if scheme in ("postgres", "postgresql", "postgresql+psycopg2"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+
+def is_production() -> bool:
+    return settings.DATABASE_PROFILE == "production"
+
+
+def _engine_options(url: str, async_driver: bool) -> dict:
+    """生产模式下使用显式配置的连接池"""
+    options = {}
+    if "sqlite" in url and not async_driver:
+        options["connect_args"] = {"check_same_thread": False}
+    if is_production() and ":memory:" not in url:
+        options.update(
+            poolclass=AsyncAdaptedQueuePool if async_driver else QueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_pre_ping=True
+        )
+    return options
+
+
+def _configure_sqlite(engine, read_only: bool = False):
+    """为每个新的SQLite连接设置PRAGMA：WAL、忙等待、页缓存和内存映射"""
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        if is_production():
+            # WAL模式下读不阻塞写、写不阻塞读
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+            cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            cursor.execute("PRAGMA query_only=1")
+        cursor.close()
+
 
 # 创建数据库引擎
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL, async_driver=False))
+_configure_sqlite(engine)
 
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步引擎和会话工厂，供API处理函数和后台任务使用
+_async_url = get_async_database_url(settings.DATABASE_URL)
+async_engine = create_async_engine(_async_url, **_engine_options(_async_url, async_driver=True))
+_configure_sqlite(async_engine.sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+# 只读引擎使用独立的连接池，列表和状态查询不会排在写请求后面
+if settings.DATABASE_READ_URL or is_production():
+    _read_url = get_async_database_url(settings.DATABASE_READ_URL or settings.DATABASE_URL)
+    async_read_engine = create_async_engine(_read_url, **_engine_options(_read_url, async_driver=True))
+    _configure_sqlite(async_read_engine.sync_engine, read_only=True)
+else:
+    async_read_engine = async_engine
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, expire_on_commit=False, autoflush=False)
+
 # 创建基础模型类
 Base = declarative_base()
 
@@ -25,13 +96,35 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """获取异步数据库会话"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_async_read_db():
+    """获取只读的异步数据库会话"""
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+# 引入迁移前由create_all创建的表结构对应的版本
+BASELINE_REVISION = "0001"
+
+
 def create_tables():
-    """创建所有数据表"""
-    # 导入所有模型以确保它们被注册
-    from app.models.user import User
-    from app.models.video import Video
-    from app.models.ai_generation import AIGeneration
-    from app.models.publish_task import PublishTask
-    
-    # 创建所有表
-    Base.metadata.create_all(bind=engine) 
\ No newline at end of file
+    """执行数据库迁移到最新版本
+
+    引入迁移前由create_all创建的数据库(有表但没有alembic_version)先标记为初始版本，再执行后续迁移。
+    """
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import inspect
+
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        inspector = inspect(connection)
+        if inspector.has_table("users") and not inspector.has_table("alembic_version"):
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, "head")
@@ -0,0 +1,56 @@
+import httpx
+from typing import Dict
+from .config import settings
+
+# 每个上游一个长连接客户端，复用TCP/TLS连接
+_clients: Dict[str, httpx.AsyncClient] = {}
+
+
+def _http2_available() -> bool:
+    """检查是否安装了HTTP/2支持(h2)"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def build_timeout(timeout: float) -> httpx.Timeout:
+    """构造单次操作的超时配置，连接超时单独限制"""
+    return httpx.Timeout(timeout, connect=settings.HTTP_CONNECT_TIMEOUT)
+
+
+def create_http_client(default_timeout: float) -> httpx.AsyncClient:
+    """创建带连接池和keep-alive的客户端"""
+    return httpx.AsyncClient(
+        http2=settings.HTTP2_ENABLED and _http2_available(),
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY
+        ),
+        timeout=build_timeout(default_timeout)
+    )
+
+
+def get_http_client(name: str) -> httpx.AsyncClient:
+    """获取指定上游的共享客户端，未初始化时按需创建"""
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        default_timeout = settings.AI_HTTP_TIMEOUT if name == "ai" else settings.DOUYIN_API_TIMEOUT
+        client = create_http_client(default_timeout)
+        _clients[name] = client
+    return client
+
+
+def init_http_clients():
+    """应用启动时创建各上游的共享客户端"""
+    get_http_client("douyin")
+    get_http_client("ai")
+
+
+async def close_http_clients():
+    """应用关闭时释放所有连接"""
+    for client in list(_clients.values()):
+        await client.aclose()
+    _clients.clear()
@@ -0,0 +1,141 @@
+import mimetypes
+import os
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple
+import aiofiles
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from .config import settings
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, file_size: int) -> Optional[Tuple[int, int]]:
+    """解析单段Range，返回[start, end]闭区间；格式不支持时返回None(按完整文件响应)，越界时抛出ValueError"""
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-N：最后N个字节
+        length = int(end)
+        if length == 0:
+            raise ValueError("unsatisfiable")
+        return max(file_size - length, 0), file_size - 1
+    start = int(start)
+    end = min(int(end), file_size - 1) if end else file_size - 1
+    if start >= file_size or start > end:
+        raise ValueError("unsatisfiable")
+    return start, end
+
+
+class MediaFileResponse(Response):
+    """支持Range(206)、ETag/Last-Modified条件请求(304)的文件响应
+
+    ASGI服务器支持http.response.zerocopy扩展时由服务器用sendfile直接发送文件，否则分块读取发送。
+    """
+
+    def __init__(self, path: str, media_type: Optional[str] = None, headers: Optional[dict] = None):
+        self.path = path
+        super().__init__(headers=headers, media_type=media_type or mimetypes.guess_type(path)[0] or "application/octet-stream")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await self._send_file(scope, send)
+        if self.background is not None:
+            await self.background()
+
+    async def _send_file(self, scope: Scope, send: Send):
+        stat = os.stat(self.path)
+        file_size = stat.st_size
+        etag = f'"{stat.st_mtime_ns:x}-{file_size:x}"'
+        last_modified = formatdate(stat.st_mtime, usegmt=True)
+        request_headers = Headers(scope=scope)
+        # 以raw_headers为基础，保留调用方设置的响应头；content-length按实际发送的范围重新计算
+        headers = {
+            key.decode("latin-1"): value.decode("latin-1")
+            for key, value in self.raw_headers if key != b"content-length"
+        }
+        headers.update({
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": last_modified,
+            "cache-control": "private, no-cache"
+        })
+
+        if self._not_modified(request_headers, etag, int(stat.st_mtime)):
+            await self._send_head(send, 304, headers)
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        start, end, status = 0, file_size - 1, 200
+        range_header = request_headers.get("range")
+        if range_header and file_size and self._if_range_matches(request_headers, etag, last_modified):
+            try:
+                byte_range = parse_range(range_header, file_size)
+            except ValueError:
+                headers["content-range"] = f"bytes */{file_size}"
+                headers["content-length"] = "0"
+                await self._send_head(send, 416, headers)
+                await send({"type": "http.response.body", "body": b""})
+                return
+            if byte_range:
+                start, end = byte_range
+                status = 206
+                headers["content-range"] = f"bytes {start}-{end}/{file_size}"
+
+        count = end - start + 1 if file_size else 0
+        headers["content-length"] = str(count)
+        await self._send_head(send, status, headers)
+        if scope["method"] == "HEAD" or count == 0:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if "http.response.zerocopy" in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send({"type": "http.response.zerocopy", "file": f, "offset": start, "count": count})
+            return
+
+        async with aiofiles.open(self.path, "rb") as f:
+            await f.seek(start)
+            remaining = count
+            while remaining > 0:
+                chunk = await f.read(min(settings.MEDIA_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # 文件在发送过程中被截断
+            await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    def _not_modified(request_headers: Headers, etag: str, mtime: int) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _if_range_matches(request_headers: Headers, etag: str, last_modified: str) -> bool:
+        """If-Range与当前文件不一致时忽略Range，返回完整文件"""
+        if_range = request_headers.get("if-range")
+        return not if_range or if_range in (etag, last_modified)
+
+    @staticmethod
+    async def _send_head(send: Send, status: int, headers: dict):
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(key.encode("latin-1"), value.encode("latin-1")) for key, value in headers.items()]
+        })
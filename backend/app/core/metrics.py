@@ -0,0 +1,225 @@
+import functools
+import logging
+import os
+import time
+from typing import Callable, Dict, Optional
+import redis
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+from sqlalchemy import event, func, select
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .config import settings
+from .database import engine, async_engine, async_read_engine, SessionLocal
+from app.models.publish_task import PublishTask
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "API请求耗时",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+OUTBOUND_DURATION = Histogram(
+    "outbound_request_duration_seconds",
+    "调用抖音/AI接口的耗时",
+    ["upstream", "operation", "outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+OUTBOUND_ERRORS = Counter(
+    "outbound_errors_total",
+    "调用抖音/AI接口失败次数",
+    ["upstream", "operation", "error"]
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "SQL语句执行耗时",
+    ["engine", "operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+)
+
+# 路由组外的请求统一记为一个标签值，避免扫描类请求产生大量时间序列
+UNMATCHED_ROUTE = "unmatched"
+SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK"}
+
+
+class MetricsMiddleware:
+    """按路由模板、方法和状态码记录请求耗时"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], getattr(route, "path", UNMATCHED_ROUTE), str(status)
+            ).observe(time.perf_counter() - started_at)
+
+
+def track_outbound(upstream: str, operation: Optional[str] = None) -> Callable:
+    """记录外部接口调用的耗时和失败；返回success=False的结果也计为失败"""
+    def decorator(func):
+        name = operation or func.__name__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started_at = time.perf_counter()
+            outcome = "success"
+            try:
+                result = await func(*args, **kwargs)
+                if isinstance(result, dict) and result.get("success") is False:
+                    outcome = "error"
+                    OUTBOUND_ERRORS.labels(upstream, name, "busy" if result.get("busy") else "failed").inc()
+                return result
+            except Exception as e:
+                outcome = "error"
+                OUTBOUND_ERRORS.labels(upstream, name, type(e).__name__).inc()
+                raise
+            finally:
+                OUTBOUND_DURATION.labels(upstream, name, outcome).observe(time.perf_counter() - started_at)
+        return wrapper
+    return decorator
+
+
+def observe_outbound(upstream: str, operation: str, started_at: float, error: Optional[str] = None):
+    """用于无法使用装饰器的调用(如流式响应)"""
+    if error:
+        OUTBOUND_ERRORS.labels(upstream, operation, error).inc()
+    OUTBOUND_DURATION.labels(upstream, operation, "error" if error else "success").observe(time.perf_counter() - started_at)
+
+
+def instrument_engine(engine, name: str):
+    """通过引擎事件记录每条SQL的执行耗时"""
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started_at"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        DB_QUERY_DURATION.labels(name, operation if operation in SQL_OPERATIONS else "OTHER").observe(
+            time.perf_counter() - started
+        )
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        # 出错的语句不会触发after_cursor_execute，清理计时栈
+        if context.connection is not None:
+            stack = context.connection.info.get("query_started_at")
+            if stack:
+                stack.pop()
+
+
+class AppStateCollector:
+    """抓取时采集连接池使用情况、任务队列长度和各状态的发布任务数；数据库和Redis查询结果缓存一段时间"""
+
+    def __init__(self):
+        self._cached_at = 0.0
+        self._queue_depth = None
+        self._task_counts = {}
+        self._broker: Optional[redis.Redis] = None
+
+    def _refresh(self):
+        if time.monotonic() - self._cached_at < settings.METRICS_STATE_TTL:
+            return
+        self._cached_at = time.monotonic()
+        try:
+            with SessionLocal() as db:
+                rows = db.execute(select(PublishTask.status, func.count()).group_by(PublishTask.status)).all()
+            self._task_counts = dict(rows)
+        except Exception as e:
+            logger.warning("采集发布任务数失败: %s", e)
+        try:
+            self._queue_depth = self._broker_queue_depth()
+        except Exception as e:
+            logger.warning("采集任务队列长度失败: %s", e)
+            self._queue_depth = None
+
+    def _broker_queue_depth(self) -> Optional[int]:
+        """Redis作为broker时，默认队列是broker库中与队列同名的列表；其他broker不采集"""
+        # 延迟导入，避免加载监控模块时引入Celery及任务模块
+        from app.services.celery import celery_app
+        if self._broker is None:
+            broker_url = celery_app.conf.broker_url
+            if not broker_url.startswith(("redis://", "rediss://", "unix://")):
+                return None
+            self._broker = redis.Redis.from_url(broker_url)
+        return self._broker.llen(celery_app.conf.task_default_queue)
+
+    @staticmethod
+    def _families() -> Dict[str, GaugeMetricFamily]:
+        return {
+            "pool_size": GaugeMetricFamily("db_pool_size", "连接池容量", labels=["engine"]),
+            "pool_checked_out": GaugeMetricFamily("db_pool_checked_out", "已借出的连接数", labels=["engine"]),
+            "pool_overflow": GaugeMetricFamily("db_pool_overflow", "超出容量的连接数", labels=["engine"]),
+            "tasks": GaugeMetricFamily("publish_tasks", "各状态的发布任务数", labels=["status"]),
+            "queue_depth": GaugeMetricFamily("job_queue_depth", "后台任务队列中等待的任务数", labels=[])
+        }
+
+    def describe(self):
+        """注册时只声明指标，不执行collect中的数据库和Redis查询"""
+        return list(self._families().values())
+
+    def collect(self):
+        families = self._families()
+        engines = {"sync": engine.pool, "async": async_engine.pool}
+        if async_read_engine is not async_engine:
+            engines["read"] = async_read_engine.pool
+        for name, pool in engines.items():
+            # 部分连接池(如SQLite使用的NullPool/StaticPool)没有容量统计
+            if hasattr(pool, "checkedout"):
+                families["pool_size"].add_metric([name], pool.size())
+                families["pool_checked_out"].add_metric([name], pool.checkedout())
+                families["pool_overflow"].add_metric([name], pool.overflow())
+        yield families["pool_size"]
+        yield families["pool_checked_out"]
+        yield families["pool_overflow"]
+
+        self._refresh()
+        for status, count in self._task_counts.items():
+            families["tasks"].add_metric([status or "unknown"], count)
+        yield families["tasks"]
+        if self._queue_depth is not None:
+            families["queue_depth"].add_metric([], self._queue_depth)
+            yield families["queue_depth"]
+
+
+_state_collector = AppStateCollector()
+
+
+def setup_metrics():
+    """为数据库引擎添加计时事件并注册状态采集器"""
+    instrument_engine(engine, "sync")
+    instrument_engine(async_engine.sync_engine, "async")
+    if async_read_engine is not async_engine:
+        instrument_engine(async_read_engine.sync_engine, "read")
+    REGISTRY.register(_state_collector)
+
+
+def render_metrics() -> bytes:
+    """输出Prometheus文本格式；多进程部署(设置PROMETHEUS_MULTIPROC_DIR)时合并各进程的数据"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        MultiProcessCollector(registry)
+        registry.register(_state_collector)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
@@ -0,0 +1,260 @@
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+import httpx
+from redis.exceptions import RedisError
+from .config import settings
+from .http_client import build_timeout
+from .redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# 上游繁忙或故障、重试可能成功的状态码
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# 令牌桶：按Redis服务器时间补充令牌，有令牌时扣减并返回0，否则返回需要等待的毫秒数
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local wait = 0
+if tokens >= 1 then
+  tokens = tokens - 1
+else
+  wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class UpstreamError(Exception):
+    """出站调用被本地策略拒绝"""
+
+
+class UpstreamUnavailable(UpstreamError):
+    """熔断器打开，上游暂时不可用"""
+
+
+class UpstreamRateLimited(UpstreamError):
+    """截止时间内拿不到调用配额"""
+
+
+class DeadlineExceeded(UpstreamError):
+    """调用超过截止时间"""
+
+
+class TokenBucket:
+    """跨进程共享的令牌桶，Redis不可用时退化为进程内令牌桶"""
+
+    def __init__(self, key: str, rate: float, burst: int):
+        self.key = key
+        self.rate = rate
+        self.burst = burst
+        self._script = None
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+
+    async def acquire(self, deadline: float):
+        """等待一个令牌，截止时间前拿不到时抛出UpstreamRateLimited"""
+        while True:
+            wait = await self._take()
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise UpstreamRateLimited(f"{self.key}调用频率超过限制")
+            await asyncio.sleep(wait)
+
+    async def _take(self) -> float:
+        try:
+            if self._script is None:
+                self._script = get_redis().register_script(TOKEN_BUCKET_SCRIPT)
+            return int(await self._script(keys=[self.key], args=[self.rate, self.burst])) / 1000
+        except RedisError as e:
+            logger.warning("共享限流不可用，使用进程内限流: %s", e)
+            return self._take_local()
+
+    def _take_local(self) -> float:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+
+class CircuitBreaker:
+    """连续失败达到阈值后打开，冷却期内直接拒绝；冷却结束后只放行一个探测请求，成功则关闭"""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    def before_call(self) -> bool:
+        """检查是否允许调用，返回本次调用是否为探测请求"""
+        if self.opened_at is None:
+            return False
+        if time.monotonic() - self.opened_at < self.reset_timeout or self._probing:
+            raise UpstreamUnavailable(f"{self.name}暂时不可用，请稍后重试")
+        self._probing = True
+        return True
+
+    def end_call(self, probe: bool):
+        """探测请求被取消等未得出结果时，允许下一个请求继续探测"""
+        if probe:
+            self._probing = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning("%s连续失败%s次，熔断%s秒", self.name, self.failures, self.reset_timeout)
+            self.opened_at = time.monotonic()
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return float(response.headers.get("Retry-After", 0))
+    except ValueError:
+        return 0
+
+
+class Upstream:
+    """一个上游的出站调用策略：共享限流、截止时间、带抖动的重试和熔断"""
+
+    def __init__(self, name: str, rate: float, burst: int, timeout: float, deadline: float, app_key: Optional[str] = None):
+        self.name = name
+        self.timeout = timeout
+        self.deadline = deadline
+        # 限流按上游和应用密钥区分，密钥只以哈希形式出现在Redis键中
+        key_hash = hashlib.sha256((app_key or "").encode()).hexdigest()[:12]
+        self.bucket = TokenBucket(f"ratelimit:{name}:{key_hash}", rate, burst)
+        self.breaker = CircuitBreaker(name, settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_TIMEOUT)
+
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        method: str,
+        url: str,
+        *,
+        idempotent: Optional[bool] = None,
+        timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """发送请求；幂等请求遇到网络错误或5xx时重试，429和连接失败(请求未发出)对所有请求重试
+
+        每次尝试的超时不超过剩余的截止时间，重试用尽后返回最后一次响应或抛出最后一次异常。
+        """
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+        if max_retries is None:
+            max_retries = settings.OUTBOUND_MAX_RETRIES
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        attempt = 0
+        while True:
+            probe = self.breaker.before_call()
+            try:
+                await self.bucket.acquire(deadline_at)
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded(f"{self.name}调用超过截止时间")
+                try:
+                    response = await client.request(
+                        method, url, timeout=build_timeout(min(timeout or self.timeout, remaining)), **kwargs
+                    )
+                except httpx.TransportError as e:
+                    self.breaker.record_failure()
+                    retryable = idempotent or isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                    if not retryable or not await self._backoff(attempt, max_retries, deadline_at):
+                        raise
+                else:
+                    if response.status_code >= 500:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                    # 429表示请求被限流、未被处理，可以安全重试
+                    retryable = response.status_code == 429 or (idempotent and response.status_code in RETRYABLE_STATUS)
+                    if not retryable or not await self._backoff(attempt, max_retries, deadline_at, _retry_after(response)):
+                        return response
+            finally:
+                self.breaker.end_call(probe)
+            attempt += 1
+
+    @asynccontextmanager
+    async def guard(self, deadline: Optional[float] = None):
+        """供SDK调用使用：只做限流和熔断，超时和重试由SDK处理"""
+        probe = self.breaker.before_call()
+        try:
+            await self.bucket.acquire(time.monotonic() + (deadline or self.deadline))
+            try:
+                yield
+            except Exception as e:
+                status = getattr(e, "status_code", None)
+                if status is None or status >= 500:
+                    self.breaker.record_failure()
+                raise
+            else:
+                self.breaker.record_success()
+        finally:
+            self.breaker.end_call(probe)
+
+    async def _backoff(self, attempt: int, max_retries: int, deadline_at: float, retry_after: float = 0) -> bool:
+        """等待后重试；重试次数用尽或等待会超过截止时间时返回False"""
+        if attempt >= max_retries:
+            return False
+        cap = min(settings.OUTBOUND_RETRY_BACKOFF_MAX, settings.OUTBOUND_RETRY_BACKOFF * (2 ** attempt))
+        delay = max(retry_after, random.uniform(0, cap))
+        if time.monotonic() + delay >= deadline_at:
+            return False
+        await asyncio.sleep(delay)
+        return True
+
+
+_upstreams: Dict[str, Upstream] = {}
+
+
+def get_upstream(name: str) -> Upstream:
+    """获取上游的调用策略（douyin / openai / stability），每个进程一份熔断状态"""
+    upstream = _upstreams.get(name)
+    if upstream is None:
+        if name == "douyin":
+            upstream = Upstream(
+                name, settings.DOUYIN_RATE_LIMIT, settings.DOUYIN_RATE_BURST,
+                settings.DOUYIN_API_TIMEOUT, settings.DOUYIN_CALL_DEADLINE, settings.DOUYIN_CLIENT_ID
+            )
+        elif name == "openai":
+            upstream = Upstream(
+                name, settings.OPENAI_RATE_LIMIT, settings.OPENAI_RATE_BURST,
+                settings.AI_HTTP_TIMEOUT, settings.AI_CALL_DEADLINE, settings.OPENAI_API_KEY
+            )
+        elif name == "stability":
+            upstream = Upstream(
+                name, settings.STABILITY_RATE_LIMIT, settings.STABILITY_RATE_BURST,
+                settings.AI_HTTP_TIMEOUT, settings.AI_CALL_DEADLINE, settings.STABILITY_API_KEY
+            )
+        else:
+            raise ValueError(f"未知的上游: {name}")
+        _upstreams[name] = upstream
+    return upstream
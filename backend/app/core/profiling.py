@@ -0,0 +1,93 @@
+import cProfile
+import os
+import random
+import re
+import secrets
+from datetime import datetime
+from typing import List, Dict
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .config import settings
+
+PROFILE_HEADER = "x-profile"
+TOKEN_HEADER = "x-profile-token"
+
+
+def token_matches(token: str) -> bool:
+    return bool(settings.PROFILING_TOKEN and token) and secrets.compare_digest(token, settings.PROFILING_TOKEN)
+
+
+def list_profiles() -> List[Dict]:
+    """最近的性能分析文件，新的在前"""
+    if not os.path.isdir(settings.PROFILING_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(settings.PROFILING_DIR):
+        if entry.is_file() and entry.name.endswith(".prof"):
+            stat = entry.stat()
+            profiles.append({
+                "name": entry.name,
+                "size": stat.st_size,
+                "created_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat()
+            })
+    return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+
+def _prune():
+    """只保留最近PROFILING_MAX_FILES个文件"""
+    for profile in list_profiles()[settings.PROFILING_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(settings.PROFILING_DIR, profile["name"]))
+        except FileNotFoundError:
+            pass
+
+
+def _save(profiler: cProfile.Profile, path: str):
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    profiler.dump_stats(path)
+    _prune()
+
+
+class ProfilingMiddleware:
+    """对单个请求做cProfile分析，结果以pstats格式写入PROFILING_DIR
+
+    请求携带X-Profile: 1和正确的X-Profile-Token，或按PROFILING_SAMPLE_RATE抽样时触发。
+    只在PROFILING_ENABLED时注册。cProfile只记录事件循环线程，线程池中的工作(如bcrypt)表现为等待时间；
+    同一时刻只分析一个请求，其间事件循环上其他请求的代码也会被计入。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._active = False
+
+    def _should_profile(self, scope: Scope) -> bool:
+        headers = Headers(scope=scope)
+        if headers.get(PROFILE_HEADER) == "1" and token_matches(headers.get(TOKEN_HEADER, "")):
+            return True
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or self._active or not self._should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        path_name = re.sub(r"[^A-Za-z0-9]+", "_", scope["path"]).strip("_")[:80] or "root"
+        # 响应头中的X-Profile-Id与保存的文件名一致，可直接用于下载
+        name = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}_{scope['method']}_{path_name}.prof"
+
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", name.encode())]
+            await send(message)
+
+        self._active = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.disable()
+            self._active = False
+            await run_in_threadpool(_save, profiler, os.path.join(settings.PROFILING_DIR, name))
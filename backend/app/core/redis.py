@@ -0,0 +1,31 @@
+import redis
+import redis.asyncio as aioredis
+from typing import Optional
+from .config import settings
+
+_async_client: Optional[aioredis.Redis] = None
+_sync_client: Optional[redis.Redis] = None
+
+
+def get_redis() -> aioredis.Redis:
+    """获取共享的异步Redis客户端"""
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _async_client
+
+
+def get_sync_redis() -> redis.Redis:
+    """获取共享的同步Redis客户端（用于无事件循环的场景）"""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _sync_client
+
+
+async def close_redis():
+    """关闭异步Redis连接池"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -0,0 +1,33 @@
+from starlette.types import ASGIApp, Receive, Scope, Send
+from starlette.responses import JSONResponse
+from .config import settings
+
+# multipart表单中除文件外的字段和分隔符所允许的额外字节数
+MULTIPART_OVERHEAD = 1024 * 1024
+
+
+class UploadSizeLimitMiddleware:
+    """在读取请求体之前根据Content-Length拒绝超大的上传请求"""
+
+    def __init__(self, app: ASGIApp, paths: tuple = ("/videos/upload",)):
+        self.app = app
+        self.paths = paths
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"].endswith(self.paths):
+            content_length = dict(scope["headers"]).get(b"content-length")
+            if content_length is not None:
+                try:
+                    length = int(content_length)
+                except ValueError:
+                    response = JSONResponse({"detail": "无效的Content-Length"}, status_code=400)
+                    await response(scope, receive, send)
+                    return
+                if length > settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+                    response = JSONResponse(
+                        {"detail": f"文件大小超过限制({settings.MAX_FILE_SIZE}字节)"},
+                        status_code=413
+                    )
+                    await response(scope, receive, send)
+                    return
+        await self.app(scope, receive, send)
@@ -2,5 +2,8 @@ from .user import User
 from .video import Video
 from .ai_generation import AIGeneration
 from .publish_task import PublishTask
+from .media_blob import MediaBlob
+from .douyin_video import DouyinVideo
+from .douyin_sync_state import DouyinSyncState
 
-__all__ = ["User", "Video", "AIGeneration", "PublishTask"] 
\ No newline at end of file
+__all__ = ["User", "Video", "AIGeneration", "PublishTask", "MediaBlob", "DouyinVideo", "DouyinSyncState"] 
\ No newline at end of file
@@ -13,6 +13,7 @@ class AIGeneration(Base):
     generation_type = Column(String(50))  # text, image, video
     model_name = Column(String(100))  # gpt-4, stable-diffusion, etc.
     prompt = Column(Text)
+    cache_key = Column(String(64), index=True)  # 文本生成结果的内容哈希
     result = Column(Text)  # 生成结果
     file_path = Column(String(500))  # 生成文件路径
     generation_metadata = Column(JSON)  # 额外元数据
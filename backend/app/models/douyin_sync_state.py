@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from app.core.database import Base
+
+
+class DouyinSyncState(Base):
+    """每个用户的抖音视频镜像同步状态"""
+    __tablename__ = "douyin_sync_states"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    status = Column(String(50), default="idle")  # idle, success, failed
+    last_synced_at = Column(DateTime)  # 最近一次成功同步时间
+    last_full_sync_at = Column(DateTime)  # 最近一次遍历全部分页的时间
+    error_message = Column(Text)
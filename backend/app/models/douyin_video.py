@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, JSON, Index
+from app.core.database import Base
+from datetime import datetime
+
+
+class DouyinVideo(Base):
+    """抖音平台视频列表的本地镜像"""
+    __tablename__ = "douyin_videos"
+    __table_args__ = (
+        Index("ix_douyin_videos_user_created", "user_id", "created_at"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    douyin_video_id = Column(String(100), unique=True, index=True, nullable=False)  # 抖音的item_id
+    title = Column(String(500))
+    cover_url = Column(String(1000))
+    share_url = Column(String(1000))
+    status = Column(Integer)  # 抖音的video_status
+    is_top = Column(Boolean, default=False)  # 是否置顶
+    statistics = Column(JSON)  # 播放、点赞、评论等统计
+    created_at = Column(DateTime)  # 在抖音上的发布时间
+    synced_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON
+from app.core.database import Base
+from datetime import datetime
+
+
+class MediaBlob(Base):
+    """按内容(SHA-256)存储的上传文件，多个视频引用同一文件时只存一份"""
+    __tablename__ = "media_blobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sha256 = Column(String(64), unique=True, index=True, nullable=False)
+    file_path = Column(String(500), nullable=False)
+    file_size = Column(Integer)  # 文件大小(字节)
+    ref_count = Column(Integer, default=1, nullable=False)  # 引用该文件的视频数，为0时删除
+    media_metadata = Column(JSON)  # 解析出的视频元数据，重复上传时直接复用
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from datetime import datetime
@@ -6,17 +6,22 @@ from datetime import datetime
 
 class PublishTask(Base):
     __tablename__ = "publish_tasks"
+    __table_args__ = (
+        Index("ix_publish_tasks_user_status", "user_id", "status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     video_id = Column(Integer, ForeignKey("videos.id"))
     user_id = Column(Integer, ForeignKey("users.id"))
     task_id = Column(String, unique=True, index=True)  # 抖音任务ID
-    status = Column(String(50), default="pending")  # pending, processing, success, failed
+    idempotency_key = Column(String(200), unique=True, index=True)  # 用户ID:客户端提交的幂等键
+    status = Column(String(50), default="queued")  # queued, uploading, processing, success, failed
     progress = Column(Integer, default=0)  # 进度百分比
     error_message = Column(Text)
     douyin_video_id = Column(String)  # 发布后的抖音视频ID
     douyin_url = Column(String(500))  # 发布后的抖音链接
     task_metadata = Column(JSON)  # 发布相关元数据
+    next_poll_at = Column(DateTime, index=True)  # 下次向抖音查询状态的时间
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
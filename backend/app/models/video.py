@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 from datetime import datetime
@@ -6,6 +6,11 @@ from datetime import datetime
 
 class Video(Base):
     __tablename__ = "videos"
+    __table_args__ = (
+        # 列表页按(user_id, created_at, id)做游标分页
+        Index("ix_videos_user_created", "user_id", "created_at", "id"),
+        Index("ix_videos_user_status", "user_id", "status"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -13,9 +18,14 @@ class Video(Base):
     title = Column(String(255))
     description = Column(Text)
     file_path = Column(String(500))
+    blob_id = Column(Integer, ForeignKey("media_blobs.id"), index=True)  # 内容寻址存储的文件
     thumbnail_path = Column(String(500))
     duration = Column(Integer)  # 视频时长(秒)
     file_size = Column(Integer)  # 文件大小(字节)
+    width = Column(Integer)  # 视频宽度(像素)
+    height = Column(Integer)  # 视频高度(像素)
+    video_codec = Column(String(20))  # 视频编码，如h264、hevc
+    bitrate = Column(Integer)  # 平均码率(bit/s)
     status = Column(String(50), default="draft")  # draft, published, failed
     publish_status = Column(String(50), default="pending")  # pending, success, failed
     douyin_url = Column(String(500))
@@ -25,4 +35,5 @@ class Video(Base):
     # 关系
     user = relationship("User", back_populates="videos")
     ai_generations = relationship("AIGeneration", back_populates="video")
-    publish_tasks = relationship("PublishTask", back_populates="video") 
\ No newline at end of file
+    publish_tasks = relationship("PublishTask", back_populates="video")
+    blob = relationship("MediaBlob") 
\ No newline at end of file
@@ -1,49 +1,227 @@
+import asyncio
+import base64
+import hashlib
 import openai
 import httpx
 import json
-import os
-from typing import Dict, List, Optional
-from datetime import datetime
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+from app.core.cache import TieredCache
 from app.core.config import settings
-from PIL import Image
-import io
+from app.core.http_client import get_http_client
+from app.core.metrics import observe_outbound, track_outbound
+from app.core.outbound import UpstreamError, get_upstream
+from app.services.image_pipeline import process_image
+
+
+SYSTEM_PROMPT = "你是一个专业的短视频内容创作者，擅长创作吸引人的视频标题和描述。"
+TEXT_TEMPERATURE = 0.7
+
+
+def make_cache_key(template: str, prompt: str, model: str, max_tokens: int, temperature: float) -> str:
+    """文本生成结果的缓存键；prompt为模板渲染后的内容，模板或输入变化都会改变缓存键"""
+    payload = json.dumps(
+        {"template": template, "prompt": prompt, "model": model, "max_tokens": max_tokens, "temperature": temperature},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def extract_title(text: str) -> str:
+    """从标题生成结果中取第一个标题"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    for line in lines:
+        match = re.match(r"^1\s*[.、．]\s*(.+)$", line)
+        if match:
+            return match.group(1).strip("[]【】 ")[:255]
+    return (lines[0] if lines else "")[:255]
+
+
+def extract_description(text: str) -> str:
+    """从描述生成结果中取描述和话题标签"""
+    match = re.search(r"描述[:：]\s*(.+?)\s*(?:话题标签[:：]\s*(.+))?$", text, re.S)
+    if not match:
+        return text.strip()
+    description = match.group(1).strip("[]【】 \n")
+    tags = (match.group(2) or "").strip("[]【】 \n")
+    return f"{description} {tags}".strip()
+
+
+def _usage_dict(usage) -> Optional[Dict]:
+    """流式响应的usage可能是模型对象或原始字典"""
+    if usage is None:
+        return None
+    return usage.model_dump() if hasattr(usage, "model_dump") else dict(usage)
+
+
+def video_title_prompt(content: str) -> str:
+    """视频标题生成的提示词"""
+    return f"""
+    请为以下视频内容生成5个吸引人的抖音标题：
+    
+    视频内容：{content}
+    
+    要求：
+    1. 标题要吸引人
+    2. 适合抖音平台
+    3. 包含热门话题标签
+    4. 长度适中（15-30字）
+    5. 有情感共鸣
+    
+    请按以下格式输出：
+    1. [标题1]
+    2. [标题2]
+    3. [标题3]
+    4. [标题4]
+    5. [标题5]
+    """
+
+
+def video_description_prompt(title: str, content: str) -> str:
+    """视频描述生成的提示词"""
+    return f"""
+    请为以下视频生成抖音描述：
+    
+    标题：{title}
+    内容：{content}
+    
+    要求：
+    1. 描述要吸引人
+    2. 包含相关话题标签
+    3. 引导用户互动
+    4. 长度适中（100-200字）
+    5. 符合抖音平台规范
+    
+    请按以下格式输出：
+    描述：[视频描述]
+    话题标签：[#话题1 #话题2 #话题3]
+    """
+
+
+class AIServiceBusy(Exception):
+    """AI提供方排队已满"""
+
+
+class ProviderLimiter:
+    """单个AI提供方的并发数与排队深度限制"""
+    
+    def __init__(self, name: str, concurrency: int, max_queue: int):
+        self.name = name
+        self.max_queue = max_queue
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+    
+    @asynccontextmanager
+    async def slot(self):
+        """占用一个并发名额，排队已满时立即拒绝而不是无限等待"""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise AIServiceBusy(f"{self.name}请求过多，请稍后重试")
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            yield
+        finally:
+            self._semaphore.release()
 
 
 class AIService:
     """AI生成服务"""
     
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         # 只有在有API密钥时才初始化客户端
         if settings.OPENAI_API_KEY:
-            self.openai_client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+            self.openai_client = openai.AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL or None,  # 空字符串视为未配置
+                timeout=settings.AI_HTTP_TIMEOUT,
+                max_retries=settings.OUTBOUND_MAX_RETRIES
+            )
         else:
             self.openai_client = None
         self.stability_api_key = settings.STABILITY_API_KEY
+        self._http_client = http_client
+        self.openai_limiter = ProviderLimiter("OpenAI", settings.AI_OPENAI_CONCURRENCY, settings.AI_MAX_QUEUE_DEPTH)
+        self.stability_limiter = ProviderLimiter("Stability", settings.AI_STABILITY_CONCURRENCY, settings.AI_MAX_QUEUE_DEPTH)
+        # OpenAI SDK自带超时和带抖动的重试，这里只加共享限流和熔断
+        self.openai_upstream = get_upstream("openai")
+        self.stability_upstream = get_upstream("stability")
+        self.text_cache = TieredCache(
+            "ai_text",
+            maxsize=settings.AI_CACHE_MAXSIZE,
+            ttl=settings.AI_CACHE_TTL,
+            redis_ttl=settings.AI_CACHE_REDIS_TTL,
+            use_redis=settings.AI_CACHE_REDIS_ENABLED
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}
+    
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """注入的客户端，未注入时使用共享连接池"""
+        return self._http_client or get_http_client("ai")
     
-    async def generate_text(self, prompt: str, model: str = "gpt-4", max_tokens: int = 500) -> Dict:
-        """生成文本内容"""
+    async def generate_text(self, prompt: str, model: str = "gpt-4", max_tokens: int = 500, template: str = "text") -> Dict:
+        """生成文本内容，相同请求命中缓存，并发的相同请求只调用一次API"""
         if not self.openai_client:
             return {
                 "success": False,
                 "error": "OpenAI API密钥未配置"
             }
         
+        key = make_cache_key(template, prompt, model, max_tokens, TEXT_TEMPERATURE)
+        cached = await self.text_cache.get(key)
+        if cached is not None:
+            return {**cached, "cache_key": key, "cached": True}
+        
+        task = self._inflight.get(key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(self._complete_and_cache(key, prompt, model, max_tokens))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield：某个请求被取消时不影响等待同一结果的其他请求
+        result = await asyncio.shield(task)
+        return {**result, "cache_key": key, "cached": shared}
+    
+    async def _complete_and_cache(self, key: str, prompt: str, model: str, max_tokens: int) -> Dict:
+        result = await self._complete(prompt, model, max_tokens)
+        if result["success"]:
+            await self.text_cache.set(key, result)
+        return result
+    
+    @track_outbound("openai", "chat_completion")
+    async def _complete(self, prompt: str, model: str, max_tokens: int) -> Dict:
+        """调用OpenAI生成文本"""
         try:
-            response = self.openai_client.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的短视频内容创作者，擅长创作吸引人的视频标题和描述。"},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=max_tokens,
-                temperature=0.7
-            )
+            async with self.openai_limiter.slot():
+                async with self.openai_upstream.guard():
+                    response = await self.openai_client.chat.completions.create(
+                        model=model,
+                        messages=[
+                            {"role": "system", "content": SYSTEM_PROMPT},
+                            {"role": "user", "content": prompt}
+                        ],
+                        max_tokens=max_tokens,
+                        temperature=TEXT_TEMPERATURE
+                    )
             
             return {
                 "success": True,
                 "result": response.choices[0].message.content,
                 "model": model,
-                "usage": response.usage.dict()
+                "prompt": prompt,
+                "usage": response.usage.model_dump()
+            }
+        except (AIServiceBusy, UpstreamError) as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "busy": True
             }
         except Exception as e:
             return {
@@ -51,6 +229,97 @@ class AIService:
                 "error": str(e)
             }
     
+    async def stream_text(self, prompt: str, model: str = "gpt-4", max_tokens: int = 500, template: str = "text") -> AsyncIterator[Dict]:
+        """流式生成文本：逐段产出{"type": "delta"}，结束时产出{"type": "done"}或{"type": "error"}
+        
+        命中缓存或已有相同请求在执行时，完整结果作为一段产出；否则本次请求登记为进行中，
+        流正常结束后结果写入缓存并交给等待同一结果的请求。
+        """
+        if not self.openai_client:
+            yield {"type": "error", "success": False, "error": "OpenAI API密钥未配置"}
+            return
+        
+        key = make_cache_key(template, prompt, model, max_tokens, TEXT_TEMPERATURE)
+        cached = await self.text_cache.get(key)
+        task = self._inflight.get(key)
+        if cached is None and task is not None:
+            cached = await asyncio.shield(task)
+            if not cached["success"]:
+                yield {"type": "error", **cached}
+                return
+        if cached is not None:
+            yield {"type": "delta", "content": cached["result"]}
+            yield {"type": "done", **cached, "cache_key": key, "cached": True}
+            return
+        
+        # 登记为进行中的请求，并发的相同请求(流式或非流式)等待本次结果而不再调用API
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # 流被提前关闭(客户端断开)时，等待者得到可重试的错误
+        outcome = {"success": False, "error": "相同的生成请求已中断，请重试", "busy": True}
+        try:
+            async for event in self._stream_completion(prompt, model, max_tokens):
+                if event["type"] == "delta":
+                    yield event
+                    continue
+                outcome = {k: v for k, v in event.items() if k != "type"}
+                if outcome["success"]:
+                    await self.text_cache.set(key, outcome)
+                    yield {**event, "cache_key": key, "cached": False}
+                else:
+                    yield event
+        finally:
+            if not future.done():
+                future.set_result(outcome)
+    
+    async def _stream_completion(self, prompt: str, model: str, max_tokens: int) -> AsyncIterator[Dict]:
+        """调用OpenAI流式接口，产出delta事件，最后产出done或error事件"""
+        parts = []
+        usage = None
+        started_at = time.perf_counter()
+        try:
+            async with self.openai_limiter.slot():
+                async with self.openai_upstream.guard():
+                    stream = await self.openai_client.chat.completions.create(
+                        model=model,
+                        messages=[
+                            {"role": "system", "content": SYSTEM_PROMPT},
+                            {"role": "user", "content": prompt}
+                        ],
+                        max_tokens=max_tokens,
+                        temperature=TEXT_TEMPERATURE,
+                        stream=True,
+                        # 最后一个分片携带本次调用的token用量
+                        extra_body={"stream_options": {"include_usage": True}}
+                    )
+                    async for chunk in stream:
+                        usage = getattr(chunk, "usage", None) or usage
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta.content
+                        if delta:
+                            parts.append(delta)
+                            yield {"type": "delta", "content": delta}
+        except (AIServiceBusy, UpstreamError) as e:
+            observe_outbound("openai", "chat_completion_stream", started_at, "busy")
+            yield {"type": "error", "success": False, "error": str(e), "busy": True}
+            return
+        except Exception as e:
+            observe_outbound("openai", "chat_completion_stream", started_at, type(e).__name__)
+            yield {"type": "error", "success": False, "error": str(e)}
+            return
+        observe_outbound("openai", "chat_completion_stream", started_at)
+        
+        yield {
+            "type": "done",
+            "success": True,
+            "result": "".join(parts),
+            "model": model,
+            "prompt": prompt,
+            "usage": _usage_dict(usage)
+        }
+    
     async def generate_image(self, prompt: str, model: str = "stable-diffusion", size: str = "1024x1024") -> Dict:
         """生成图像内容"""
         if model == "stable-diffusion":
@@ -60,6 +329,7 @@ class AIService:
         else:
             return {"success": False, "error": f"不支持的模型: {model}"}
     
+    @track_outbound("stability", "text_to_image")
     async def _generate_stable_diffusion_image(self, prompt: str, size: str) -> Dict:
         """使用Stable Diffusion生成图像"""
         if not self.stability_api_key:
@@ -70,7 +340,7 @@ class AIService:
         
         try:
             # 这里使用Stability AI的API
-            url = "https://api.stability.ai/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image"
+            url = f"{settings.STABILITY_API_BASE_URL}/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image"
             
             headers = {
                 "Authorization": f"Bearer {self.stability_api_key}",
@@ -86,42 +356,42 @@ class AIService:
                 "steps": 30
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(url, headers=headers, json=data)
+            async with self.stability_limiter.slot():
+                response = await self.stability_upstream.request(self.http_client, "POST", url, headers=headers, json=data)
+            
+            if response.status_code == 200:
+                result = response.json()
+                # 保存图像文件
+                image_bytes = base64.b64decode(result["artifacts"][0]["base64"])
                 
-                if response.status_code == 200:
-                    result = response.json()
-                    # 保存图像文件
-                    image_data = result["artifacts"][0]["base64"]
-                    image_bytes = bytes(image_data, "utf-8")
-                    
-                    # 生成文件名
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    filename = f"ai_generated_{timestamp}.png"
-                    file_path = os.path.join(settings.UPLOAD_DIR, filename)
-                    
-                    # 保存图像
-                    with open(file_path, "wb") as f:
-                        f.write(image_bytes)
-                    
-                    return {
-                        "success": True,
-                        "result": "图像生成成功",
-                        "file_path": file_path,
-                        "model": "stable-diffusion",
-                        "prompt": prompt
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "error": f"Stable Diffusion API错误: {response.text}"
-                    }
+                # 保存原图并生成缩略图
+                image = await process_image(image_bytes)
+                
+                return {
+                    "success": True,
+                    "result": "图像生成成功",
+                    **image,
+                    "model": "stable-diffusion",
+                    "prompt": prompt
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": f"Stable Diffusion API错误: {response.text}"
+                }
+        except (AIServiceBusy, UpstreamError) as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "busy": True
+            }
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e)
             }
     
+    @track_outbound("openai", "image_generation")
     async def _generate_dalle_image(self, prompt: str, size: str) -> Dict:
         """使用DALL-E生成图像"""
         if not self.openai_client:
@@ -131,41 +401,42 @@ class AIService:
             }
         
         try:
-            response = self.openai_client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size=size,
-                quality="standard",
-                n=1
-            )
+            async with self.openai_limiter.slot():
+                async with self.openai_upstream.guard():
+                    response = await self.openai_client.images.generate(
+                        model="dall-e-3",
+                        prompt=prompt,
+                        size=size,
+                        quality="standard",
+                        n=1
+                    )
             
             # 下载图像
             image_url = response.data[0].url
-            async with httpx.AsyncClient() as client:
-                image_response = await client.get(image_url)
+            image_response = await self.http_client.get(image_url)
+            
+            if image_response.status_code == 200:
+                # 保存原图并生成缩略图
+                image = await process_image(image_response.content)
                 
-                if image_response.status_code == 200:
-                    # 生成文件名
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    filename = f"ai_generated_{timestamp}.png"
-                    file_path = os.path.join(settings.UPLOAD_DIR, filename)
-                    
-                    # 保存图像
-                    with open(file_path, "wb") as f:
-                        f.write(image_response.content)
-                    
-                    return {
-                        "success": True,
-                        "result": "图像生成成功",
-                        "file_path": file_path,
-                        "model": "dall-e",
-                        "prompt": prompt
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "error": "下载生成的图像失败"
-                    }
+                return {
+                    "success": True,
+                    "result": "图像生成成功",
+                    **image,
+                    "model": "dall-e",
+                    "prompt": prompt
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": "下载生成的图像失败"
+                }
+        except (AIServiceBusy, UpstreamError) as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "busy": True
+            }
         except Exception as e:
             return {
                 "success": False,
@@ -192,50 +463,20 @@ class AIService:
         [详细的分镜头脚本]
         """
         
-        return await self.generate_text(prompt, max_tokens=1000)
+        return await self.generate_text(prompt, max_tokens=1000, template="video_script")
     
     async def generate_video_title(self, content: str) -> Dict:
         """生成视频标题"""
-        prompt = f"""
-        请为以下视频内容生成5个吸引人的抖音标题：
-        
-        视频内容：{content}
-        
-        要求：
-        1. 标题要吸引人
-        2. 适合抖音平台
-        3. 包含热门话题标签
-        4. 长度适中（15-30字）
-        5. 有情感共鸣
-        
-        请按以下格式输出：
-        1. [标题1]
-        2. [标题2]
-        3. [标题3]
-        4. [标题4]
-        5. [标题5]
-        """
-        
-        return await self.generate_text(prompt, max_tokens=300)
+        return await self.generate_text(video_title_prompt(content), max_tokens=300, template="video_title")
+    
+    def stream_video_title(self, content: str) -> AsyncIterator[Dict]:
+        """流式生成视频标题"""
+        return self.stream_text(video_title_prompt(content), max_tokens=300, template="video_title")
     
     async def generate_video_description(self, title: str, content: str) -> Dict:
         """生成视频描述"""
-        prompt = f"""
-        请为以下视频生成抖音描述：
-        
-        标题：{title}
-        内容：{content}
-        
-        要求：
-        1. 描述要吸引人
-        2. 包含相关话题标签
-        3. 引导用户互动
-        4. 长度适中（100-200字）
-        5. 符合抖音平台规范
-        
-        请按以下格式输出：
-        描述：[视频描述]
-        话题标签：[#话题1 #话题2 #话题3]
-        """
-        
-        return await self.generate_text(prompt, max_tokens=400) 
\ No newline at end of file
+        return await self.generate_text(video_description_prompt(title, content), max_tokens=400, template="video_description")
+    
+    def stream_video_description(self, title: str, content: str) -> AsyncIterator[Dict]:
+        """流式生成视频描述"""
+        return self.stream_text(video_description_prompt(title, content), max_tokens=400, template="video_description")
\ No newline at end of file
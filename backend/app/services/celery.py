@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import random
+from celery import Celery
+from redis.exceptions import LockError
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.redis import get_redis, get_sync_redis
+from app.services.douyin_service import DouyinService
+from app.services.douyin_sync import DouyinVideoSync
+from app.services.publish_service import PublishService
+from app.services.status_poller import PublishStatusPoller
+
+logger = logging.getLogger(__name__)
+
+celery_app = Celery(
+    "douyin_manager",
+    broker=settings.CELERY_BROKER_URL or settings.REDIS_URL,
+    backend=settings.CELERY_RESULT_BACKEND or settings.REDIS_URL
+)
+
+celery_app.conf.update(
+    task_serializer="json",
+    accept_content=["json"],
+    result_serializer="json",
+    timezone="UTC",
+    enable_utc=True,
+    worker_concurrency=settings.CELERY_WORKER_CONCURRENCY,
+    # 发布任务耗时较长，每个进程只预取一个任务，执行完成后才确认，worker异常退出时任务会重新投递
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    task_ignore_result=True,
+    beat_schedule={
+        "poll-publish-status": {
+            "task": "publish.poll_status",
+            "schedule": settings.PUBLISH_POLL_TICK
+        },
+        "refresh-expiring-douyin-tokens": {
+            "task": "auth.refresh_expiring_tokens",
+            "schedule": settings.DOUYIN_TOKEN_SWEEP_INTERVAL
+        }
+    }
+)
+
+# 每个worker进程复用同一个事件循环，使共享HTTP客户端的连接可以跨任务保持
+_loop = None
+
+
+def run_async(coro):
+    """在worker进程的事件循环中执行协程"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop.run_until_complete(coro)
+
+
+def retry_countdown(retries: int) -> float:
+    """指数退避并加入随机抖动，避免大量任务同时重试"""
+    backoff = min(settings.PUBLISH_RETRY_BACKOFF * (2 ** retries), settings.PUBLISH_RETRY_BACKOFF_MAX)
+    return backoff / 2 + random.uniform(0, backoff / 2)
+
+
+@celery_app.task(bind=True, name="publish.publish_video", max_retries=settings.PUBLISH_MAX_RETRIES)
+def publish_video_task(self, publish_task_id: int):
+    """将视频分片上传到抖音并更新发布任务状态"""
+    final_attempt = self.request.retries >= self.max_retries
+
+    async def publish():
+        async with AsyncSessionLocal() as db:
+            await PublishService().run(db, publish_task_id, final_attempt=final_attempt)
+
+    try:
+        run_async(publish())
+    except Exception as e:
+        if final_attempt:
+            raise
+        raise self.retry(exc=e, countdown=retry_countdown(self.request.retries))
+
+
+@celery_app.task(name="publish.poll_status", ignore_result=True)
+def poll_publish_status_task():
+    """批量轮询处理中的发布任务，同一时刻只允许一个轮询在执行"""
+    lock = get_sync_redis().lock("lock:publish.poll_status", timeout=settings.PUBLISH_POLL_MAX_INTERVAL)
+    if not lock.acquire(blocking=False):
+        return
+
+    async def poll():
+        async with AsyncSessionLocal() as db:
+            await PublishStatusPoller().poll_due(db)
+
+    try:
+        run_async(poll())
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            # 轮询超过锁的有效期时锁已自动释放，本轮结果已提交，不应把任务标记为失败
+            logger.warning("发布状态轮询锁已过期")
+
+
+@celery_app.task(name="auth.refresh_expiring_tokens", ignore_result=True)
+def refresh_expiring_tokens_task():
+    """在令牌过期前提前刷新，用户请求无需等待刷新"""
+    async def refresh():
+        async with AsyncSessionLocal() as db:
+            await DouyinService().refresh_expiring_tokens(db)
+
+    run_async(refresh())
+
+
+@celery_app.task(name="douyin.sync_videos", ignore_result=True)
+def sync_douyin_videos_task(user_id: int):
+    """同步用户的抖音视频列表到本地镜像，同一用户同时只执行一个同步"""
+    async def sync():
+        # 完整同步可能远超锁的有效期，每拉取一页前重置有效期，超时只在worker异常退出时生效
+        lock = get_redis().lock(f"lock:douyin.sync_videos:{user_id}", timeout=settings.DOUYIN_SYNC_LOCK_TIMEOUT)
+        if not await lock.acquire(blocking=False):
+            return
+        try:
+            async with AsyncSessionLocal() as db:
+                await DouyinVideoSync().sync_user(db, user_id, on_page=lock.reacquire)
+        finally:
+            try:
+                await lock.release()
+            except LockError:
+                logger.warning("用户%s的抖音同步锁已过期", user_id)
+
+    run_async(sync())
@@ -1,20 +1,42 @@
+import asyncio
 import httpx
 import json
-from typing import Optional, Dict, List
+import logging
+import math
+import os
+import weakref
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, List, Callable, Awaitable
 from datetime import datetime, timedelta
+from redis.exceptions import RedisError
 from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.core.metrics import track_outbound
+from app.core.outbound import get_upstream
+from app.core.redis import get_redis
 from app.models.user import User
-from sqlalchemy.orm import Session
+from app.services.user_cache import invalidate_user
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
 
 
 class DouyinService:
     """抖音API服务"""
     
-    def __init__(self):
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
         self.base_url = settings.DOUYIN_API_BASE_URL
         self.client_id = settings.DOUYIN_CLIENT_ID
         self.client_secret = settings.DOUYIN_CLIENT_SECRET
         self.redirect_uri = settings.DOUYIN_REDIRECT_URI
+        self._client = client
+        self.upstream = get_upstream("douyin")
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """注入的客户端，未注入时使用共享连接池"""
+        return self._client or get_http_client("douyin")
     
     def get_authorization_url(self) -> str:
         """获取抖音授权URL"""
@@ -30,115 +52,119 @@ class DouyinService:
         query_string = "&".join([f"{k}={v}" for k, v in params.items()])
         return f"{auth_url}?{query_string}"
     
+    @track_outbound("douyin")
     async def exchange_code_for_token(self, code: str) -> Dict:
         """使用授权码换取访问令牌"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/oauth/access_token/",
-                data={
-                    "client_key": self.client_id,
-                    "client_secret": self.client_secret,
-                    "code": code,
-                    "grant_type": "authorization_code"
-                }
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise Exception(f"获取访问令牌失败: {response.text}")
+        response = await self.upstream.request(
+            self.client,
+            "POST",
+            f"{self.base_url}/oauth/access_token/",
+            data={
+                "client_key": self.client_id,
+                "client_secret": self.client_secret,
+                "code": code,
+                "grant_type": "authorization_code"
+            }
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(f"获取访问令牌失败: {response.text}")
     
+    @track_outbound("douyin")
     async def refresh_access_token(self, refresh_token: str) -> Dict:
         """刷新访问令牌"""
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/oauth/refresh_token/",
-                data={
-                    "client_key": self.client_id,
-                    "client_secret": self.client_secret,
-                    "refresh_token": refresh_token,
-                    "grant_type": "refresh_token"
-                }
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise Exception(f"刷新访问令牌失败: {response.text}")
+        response = await self.upstream.request(
+            self.client,
+            "POST",
+            f"{self.base_url}/oauth/refresh_token/",
+            data={
+                "client_key": self.client_id,
+                "client_secret": self.client_secret,
+                "refresh_token": refresh_token,
+                "grant_type": "refresh_token"
+            }
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(f"刷新访问令牌失败: {response.text}")
     
+    @track_outbound("douyin")
     async def get_user_info(self, access_token: str) -> Dict:
         """获取用户信息"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/oauth/userinfo/",
-                params={"access_token": access_token}
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise Exception(f"获取用户信息失败: {response.text}")
+        response = await self.upstream.request(
+            self.client,
+            "GET",
+            f"{self.base_url}/oauth/userinfo/",
+            params={"access_token": access_token}
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(f"获取用户信息失败: {response.text}")
     
+    @track_outbound("douyin")
     async def get_video_list(self, access_token: str, cursor: int = 0, count: int = 20) -> Dict:
         """获取用户视频列表"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/video/list/",
-                params={
-                    "access_token": access_token,
-                    "cursor": cursor,
-                    "count": count
-                }
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise Exception(f"获取视频列表失败: {response.text}")
+        response = await self.upstream.request(
+            self.client,
+            "GET",
+            f"{self.base_url}/video/list/",
+            params={
+                "access_token": access_token,
+                "cursor": cursor,
+                "count": count
+            }
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(f"获取视频列表失败: {response.text}")
     
-    async def upload_video(self, access_token: str, video_file_path: str, title: str, description: str = "") -> Dict:
-        """上传视频到抖音"""
-        # 第一步：创建上传任务
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.base_url}/video/upload/",
-                params={"access_token": access_token},
-                data={
-                    "title": title,
-                    "description": description
-                }
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"创建上传任务失败: {response.text}")
-            
-            upload_data = response.json()
-            upload_id = upload_data.get("data", {}).get("upload_id")
-            
-            if not upload_id:
-                raise Exception("未获取到上传ID")
-        
-        # 第二步：上传视频文件
-        with open(video_file_path, "rb") as f:
-            files = {"video": f}
-            response = await client.post(
-                f"{self.base_url}/video/part/upload/",
-                params={
-                    "access_token": access_token,
-                    "upload_id": upload_id,
-                    "part_number": 1
-                },
-                files=files
-            )
-            
-            if response.status_code != 200:
-                raise Exception(f"上传视频文件失败: {response.text}")
+    @track_outbound("douyin")
+    async def upload_video(
+        self,
+        access_token: str,
+        video_file_path: str,
+        title: str,
+        description: str = "",
+        resume_state: Optional[Dict] = None,
+        on_progress: Optional[Callable[[Dict], Awaitable[None]]] = None
+    ) -> Dict:
+        """分片上传视频到抖音，支持从上次成功的分片处继续"""
+        file_size = os.path.getsize(video_file_path)
+        state = dict(resume_state or {})
+        
+        # 第一步：创建上传任务（文件变化或没有可恢复的上传时重新创建）
+        if not state.get("upload_id") or state.get("file_size") != file_size:
+            part_size = settings.DOUYIN_UPLOAD_PART_SIZE
+            state = {
+                "upload_id": await self._create_upload(access_token, title, description),
+                "file_size": file_size,
+                "part_size": part_size,
+                "total_parts": max(1, math.ceil(file_size / part_size)),
+                "completed_parts": []
+            }
+            if on_progress:
+                await on_progress(dict(state))
+        
+        # 第二步：并发上传尚未完成的分片
+        await self._upload_parts(access_token, video_file_path, state, on_progress)
         
         # 第三步：完成上传
-        response = await client.post(
+        response = await self.upstream.request(
+            self.client,
+            "POST",
             f"{self.base_url}/video/complete/",
             params={"access_token": access_token},
-            data={"upload_id": upload_id}
+            data={"upload_id": state["upload_id"]},
+            timeout=settings.DOUYIN_UPLOAD_TIMEOUT,
+            deadline=settings.DOUYIN_UPLOAD_TIMEOUT
         )
         
         if response.status_code == 200:
@@ -146,41 +172,201 @@ class DouyinService:
         else:
             raise Exception(f"完成视频上传失败: {response.text}")
     
+    async def _create_upload(self, access_token: str, title: str, description: str) -> str:
+        """创建上传任务，返回upload_id"""
+        response = await self.upstream.request(
+            self.client,
+            "POST",
+            f"{self.base_url}/video/upload/",
+            params={"access_token": access_token},
+            data={
+                "title": title,
+                "description": description
+            }
+        )
+        
+        if response.status_code != 200:
+            raise Exception(f"创建上传任务失败: {response.text}")
+        
+        upload_id = response.json().get("data", {}).get("upload_id")
+        if not upload_id:
+            raise Exception("未获取到上传ID")
+        return upload_id
+    
+    async def _upload_parts(
+        self,
+        access_token: str,
+        video_file_path: str,
+        state: Dict,
+        on_progress: Optional[Callable[[Dict], Awaitable[None]]] = None
+    ):
+        """按固定大小切分文件并以有限并发上传，仅重试失败的分片"""
+        completed = set(state["completed_parts"])
+        pending = [n for n in range(1, state["total_parts"] + 1) if n not in completed]
+        if not pending:
+            return
+        
+        semaphore = asyncio.Semaphore(settings.DOUYIN_UPLOAD_CONCURRENCY)
+        progress_lock = asyncio.Lock()
+        loop = asyncio.get_running_loop()
+        fd = os.open(video_file_path, os.O_RDONLY)
+        
+        async def upload_part(part_number: int):
+            offset = (part_number - 1) * state["part_size"]
+            length = min(state["part_size"], state["file_size"] - offset)
+            async with semaphore:
+                # 按偏移量读取分片，同一时刻内存中最多只有并发数个分片
+                data = await loop.run_in_executor(None, os.pread, fd, length, offset)
+                # 重复上传同一分片会覆盖之前的内容，按幂等请求重试
+                try:
+                    response = await self.upstream.request(
+                        self.client,
+                        "POST",
+                        f"{self.base_url}/video/part/upload/",
+                        params={
+                            "access_token": access_token,
+                            "upload_id": state["upload_id"],
+                            "part_number": part_number
+                        },
+                        files={"video": (os.path.basename(video_file_path), data, "video/mp4")},
+                        idempotent=True,
+                        timeout=settings.DOUYIN_UPLOAD_TIMEOUT,
+                        deadline=settings.DOUYIN_UPLOAD_TIMEOUT * (settings.DOUYIN_UPLOAD_PART_RETRIES + 1),
+                        max_retries=settings.DOUYIN_UPLOAD_PART_RETRIES
+                    )
+                except httpx.HTTPError as e:
+                    raise Exception(f"上传分片{part_number}失败: {e}")
+                if response.status_code != 200:
+                    raise Exception(f"上传分片{part_number}失败: {response.text}")
+            
+            async with progress_lock:
+                completed.add(part_number)
+                state["completed_parts"] = sorted(completed)
+                if on_progress:
+                    await on_progress(dict(state))
+        
+        try:
+            results = await asyncio.gather(
+                *(upload_part(n) for n in pending),
+                return_exceptions=True
+            )
+        finally:
+            os.close(fd)
+        
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            raise Exception(f"{len(errors)}个分片上传失败，已完成{len(completed)}/{state['total_parts']}: {errors[0]}")
+    
+    @track_outbound("douyin")
     async def check_publish_status(self, access_token: str, task_id: str) -> Dict:
         """检查发布状态"""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/video/query/",
-                params={
-                    "access_token": access_token,
-                    "task_id": task_id
-                }
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                raise Exception(f"查询发布状态失败: {response.text}")
+        response = await self.upstream.request(
+            self.client,
+            "GET",
+            f"{self.base_url}/video/query/",
+            params={
+                "access_token": access_token,
+                "task_id": task_id
+            }
+        )
+        
+        if response.status_code == 200:
+            return response.json()
+        else:
+            raise Exception(f"查询发布状态失败: {response.text}")
     
-    def is_token_expired(self, expires_at: datetime) -> bool:
-        """检查令牌是否过期"""
-        return datetime.utcnow() >= expires_at
+    def is_token_expired(self, expires_at: datetime, margin: int = 0) -> bool:
+        """检查令牌是否过期（或将在margin秒内过期）"""
+        if expires_at is None:
+            return True
+        return datetime.utcnow() + timedelta(seconds=margin) >= expires_at
     
-    async def ensure_valid_token(self, db: Session, user: User) -> str:
-        """确保用户有有效的访问令牌"""
+    async def ensure_valid_token(self, db: AsyncSession, user: User, margin: Optional[int] = None) -> str:
+        """确保用户有有效的访问令牌，同一用户的并发刷新只会请求一次抖音"""
+        if not user.douyin_access_token and user.id is not None:
+            # 缓存的用户快照不含令牌，从数据库读取
+            user = await db.get(User, user.id) or user
         if not user.douyin_access_token:
             raise Exception("用户未授权抖音账号")
         
-        if self.is_token_expired(user.douyin_token_expires_at):
-            # 刷新令牌
-            refresh_result = await self.refresh_access_token(user.douyin_refresh_token)
-            
-            user.douyin_access_token = refresh_result["data"]["access_token"]
-            user.douyin_refresh_token = refresh_result["data"]["refresh_token"]
-            user.douyin_token_expires_at = datetime.utcnow() + timedelta(
-                seconds=refresh_result["data"]["expires_in"]
-            )
-            
-            db.commit()
+        if margin is None:
+            margin = settings.DOUYIN_TOKEN_EXPIRY_SKEW
+        if not self.is_token_expired(user.douyin_token_expires_at, margin):
+            return user.douyin_access_token
+        
+        stale_token = user.douyin_access_token
+        lock = _refresh_locks.get(user.id)
+        if lock is None:
+            lock = _refresh_locks[user.id] = asyncio.Lock()
+        async with lock:
+            async with _distributed_refresh_lock(user.id):
+                # 重新读取用户，其他请求或进程可能已经完成了刷新
+                result = await db.execute(
+                    select(User).where(User.id == user.id).execution_options(populate_existing=True)
+                )
+                fresh = result.scalar_one_or_none()
+                if fresh is None:
+                    raise Exception("用户不存在")
+                if fresh.douyin_access_token == stale_token and self.is_token_expired(fresh.douyin_token_expires_at, margin):
+                    refresh_result = await self.refresh_access_token(fresh.douyin_refresh_token)
+                    
+                    fresh.douyin_access_token = refresh_result["data"]["access_token"]
+                    fresh.douyin_refresh_token = refresh_result["data"]["refresh_token"]
+                    fresh.douyin_token_expires_at = datetime.utcnow() + timedelta(
+                        seconds=refresh_result["data"]["expires_in"]
+                    )
+                    await db.commit()
+                    await invalidate_user(fresh.username)
+        
+        if fresh is not user:
+            user.douyin_access_token = fresh.douyin_access_token
+            user.douyin_refresh_token = fresh.douyin_refresh_token
+            user.douyin_token_expires_at = fresh.douyin_token_expires_at
+        return fresh.douyin_access_token
+    
+    async def refresh_expiring_tokens(self, db: AsyncSession) -> int:
+        """提前刷新即将过期的令牌，返回刷新的用户数"""
+        deadline = datetime.utcnow() + timedelta(seconds=settings.DOUYIN_TOKEN_REFRESH_MARGIN)
+        result = await db.execute(select(User).where(
+            User.is_active.is_(True),
+            User.douyin_refresh_token.isnot(None),
+            User.douyin_token_expires_at <= deadline
+        ).order_by(User.douyin_token_expires_at).limit(settings.DOUYIN_TOKEN_SWEEP_BATCH_SIZE))
+        users = result.scalars().all()
         
-        return user.douyin_access_token 
\ No newline at end of file
+        refreshed = 0
+        for user in users:
+            try:
+                await self.ensure_valid_token(db, user, margin=settings.DOUYIN_TOKEN_REFRESH_MARGIN)
+                refreshed += 1
+            except Exception as e:
+                await db.rollback()
+                logger.warning("用户%s刷新抖音令牌失败: %s", user.id, e)
+        return refreshed
+
+
+# 进程内每个用户一把锁，同一进程的并发请求等待同一次刷新
+_refresh_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+@asynccontextmanager
+async def _distributed_refresh_lock(user_id: int):
+    """跨进程的刷新锁(Redis)，Redis不可用时退化为仅进程内加锁"""
+    lock = get_redis().lock(
+        f"lock:douyin_refresh:{user_id}",
+        timeout=settings.DOUYIN_API_TIMEOUT * 3,
+        blocking_timeout=settings.DOUYIN_API_TIMEOUT * 3
+    )
+    try:
+        acquired = await lock.acquire()
+    except RedisError as e:
+        logger.warning("获取令牌刷新锁失败，仅使用进程内锁: %s", e)
+        acquired = False
+    try:
+        yield
+    finally:
+        if acquired:
+            try:
+                await lock.release()
+            except RedisError:
+                pass
@@ -0,0 +1,218 @@
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from redis.exceptions import RedisError
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TieredCache
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.models.user import User
+from app.models.douyin_video import DouyinVideo
+from app.models.douyin_sync_state import DouyinSyncState
+from app.services.douyin_service import DouyinService
+
+logger = logging.getLogger(__name__)
+
+# 视频列表默认每页条数
+SNAPSHOT_PAGE_SIZE = 20
+
+# 每个用户视频列表第一页的快照，同步完成后失效
+_snapshot_cache = TieredCache(
+    "douyin_videos",
+    maxsize=settings.USER_CACHE_MAXSIZE,
+    ttl=settings.DOUYIN_VIDEO_CACHE_TTL
+)
+
+
+def douyin_video_to_dict(video: DouyinVideo) -> Dict:
+    """镜像视频的对外表示"""
+    return {
+        "id": video.id,
+        "douyin_video_id": video.douyin_video_id,
+        "title": video.title,
+        "cover_url": video.cover_url,
+        "share_url": video.share_url,
+        "status": video.status,
+        "is_top": video.is_top,
+        "statistics": video.statistics,
+        "created_at": video.created_at.isoformat() if video.created_at else None
+    }
+
+
+async def get_video_snapshot(db: AsyncSession, user_id: int, offset: int = 0, limit: int = SNAPSHOT_PAGE_SIZE) -> Dict:
+    """从本地镜像分页读取视频列表（置顶在前，按发布时间倒序）；默认的第一页缓存到下次同步完成"""
+    cacheable = offset == 0 and limit == SNAPSHOT_PAGE_SIZE
+    if cacheable:
+        snapshot = await _snapshot_cache.get(str(user_id))
+        if snapshot is not None:
+            return snapshot
+    
+    # 多取一条用于判断是否还有下一页
+    result = await db.execute(
+        select(DouyinVideo).where(DouyinVideo.user_id == user_id)
+        .order_by(DouyinVideo.is_top.desc(), DouyinVideo.created_at.desc(), DouyinVideo.id.desc())
+        .offset(offset).limit(limit + 1)
+    )
+    videos = result.scalars().all()
+    state = await db.get(DouyinSyncState, user_id)
+    snapshot = {
+        "list": [douyin_video_to_dict(video) for video in videos[:limit]],
+        "offset": offset,
+        "has_more": len(videos) > limit,
+        "synced_at": state.last_synced_at.isoformat() if state and state.last_synced_at else None,
+        "sync_status": state.status if state else None,
+        "sync_error": state.error_message if state else None
+    }
+    if cacheable:
+        await _snapshot_cache.set(str(user_id), snapshot)
+    return snapshot
+
+
+async def claim_sync(user_id: int) -> bool:
+    """每个用户每个同步间隔只允许触发一次后台同步"""
+    try:
+        return bool(await get_redis().set(f"douyin_sync_queued:{user_id}", 1, nx=True, ex=settings.DOUYIN_SYNC_INTERVAL))
+    except RedisError as e:
+        logger.warning("检查抖音同步状态失败: %s", e)
+        return False
+
+
+class DouyinVideoSync:
+    """将抖音视频列表增量同步到本地镜像"""
+    
+    def __init__(self, douyin_service: DouyinService = None):
+        self.douyin_service = douyin_service or DouyinService()
+    
+    async def sync_user(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        full: Optional[bool] = None,
+        on_page: Optional[Callable[[], Awaitable[None]]] = None
+    ) -> int:
+        """同步一个用户的视频，返回拉取的视频数
+
+        默认增量同步：按发布时间倒序翻页，遇到第一个已同步过的(非置顶)视频即停止。
+        首次同步、上次同步失败或距上次完整同步超过DOUYIN_SYNC_FULL_INTERVAL时遍历全部分页，刷新统计数据，
+        并删除抖音上已不存在的视频。每拉取一页前调用on_page(如延长同步锁)。
+        """
+        user = await db.get(User, user_id)
+        if not user or not user.douyin_access_token:
+            return 0
+        state = await db.get(DouyinSyncState, user_id)
+        if state is None:
+            state = DouyinSyncState(user_id=user_id)
+            db.add(state)
+        
+        started_at = datetime.utcnow()
+        if full is None:
+            full = (
+                state.status != "success"
+                or not state.last_full_sync_at
+                or (started_at - state.last_full_sync_at).total_seconds() >= settings.DOUYIN_SYNC_FULL_INTERVAL
+            )
+        
+        try:
+            access_token = await self.douyin_service.ensure_valid_token(db, user)
+            count, complete = await self._walk(db, user_id, access_token, full, on_page)
+            if full and complete:
+                # 完整遍历中出现的视频synced_at都不早于started_at，其余的已在抖音删除或隐藏
+                await db.execute(
+                    delete(DouyinVideo).where(DouyinVideo.user_id == user_id, DouyinVideo.synced_at < started_at)
+                    .execution_options(synchronize_session=False)
+                )
+        except Exception as e:
+            # 已写入的分页保留，下次同步因状态为failed会完整遍历
+            await db.rollback()
+            state = await db.get(DouyinSyncState, user_id)
+            if state is None:
+                state = DouyinSyncState(user_id=user_id)
+                db.add(state)
+            state.status = "failed"
+            state.error_message = str(e)
+            await db.commit()
+            await _snapshot_cache.delete(str(user_id))
+            raise
+        
+        state.status = "success"
+        state.error_message = None
+        state.last_synced_at = started_at
+        if full and complete:
+            state.last_full_sync_at = started_at
+        await db.commit()
+        await _snapshot_cache.delete(str(user_id))
+        return count
+    
+    async def _walk(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        access_token: str,
+        full: bool,
+        on_page: Optional[Callable[[], Awaitable[None]]] = None
+    ) -> Tuple[int, bool]:
+        """逐页拉取并写入镜像，返回(拉取数量, 是否遍历到最后一页)"""
+        cursor = 0
+        count = 0
+        for _ in range(settings.DOUYIN_SYNC_MAX_PAGES):
+            if on_page:
+                await on_page()
+            response = await self.douyin_service.get_video_list(access_token, cursor, settings.DOUYIN_SYNC_PAGE_SIZE)
+            page = response.get("data") or {}
+            if page.get("error_code"):
+                raise Exception(f"获取视频列表失败: {page.get('description') or page.get('error_code')}")
+            items = [item for item in page.get("list") or [] if item.get("item_id")]
+            seen = await self._upsert(db, user_id, items)
+            await db.commit()
+            count += len(items)
+            
+            # 置顶视频不按时间排序，不能作为增量同步的停止点
+            if not full and any(item["item_id"] in seen and not item.get("is_top") for item in items):
+                return count, False
+            if not page.get("has_more") or not items:
+                return count, True
+            cursor = page.get("cursor") or 0
+        return count, False
+    
+    async def _upsert(self, db: AsyncSession, user_id: int, items: List[Dict]) -> Set[str]:
+        """批量写入一页视频，返回其中已存在的douyin_video_id"""
+        if not items:
+            return set()
+        # 置顶视频可能在同一页中按发布时间再出现一次，同一视频只写入一次(保留第一次出现，即带置顶标记的)
+        unique = {}
+        for item in items:
+            unique.setdefault(item["item_id"], item)
+        items = list(unique.values())
+        result = await db.execute(
+            select(DouyinVideo.douyin_video_id, DouyinVideo.id)
+            .where(DouyinVideo.douyin_video_id.in_([item["item_id"] for item in items]))
+        )
+        existing = dict(result.all())
+        now = datetime.utcnow()
+        
+        updates = []
+        for item in items:
+            values = self._values(item, user_id, now)
+            if item["item_id"] in existing:
+                updates.append({"id": existing[item["item_id"]], **values})
+            else:
+                db.add(DouyinVideo(douyin_video_id=item["item_id"], **values))
+        if updates:
+            await db.execute(update(DouyinVideo), updates)
+        return set(existing)
+    
+    @staticmethod
+    def _values(item: Dict, user_id: int, now: datetime) -> Dict:
+        create_time = item.get("create_time")
+        return {
+            "user_id": user_id,
+            "title": item.get("title"),
+            "cover_url": item.get("cover"),
+            "share_url": item.get("share_url"),
+            "status": item.get("video_status"),
+            "is_top": bool(item.get("is_top")),
+            "statistics": item.get("statistics"),
+            "created_at": datetime.utcfromtimestamp(create_time) if create_time else None,
+            "synced_at": now
+        }
@@ -0,0 +1,79 @@
+import asyncio
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+from PIL import Image
+from app.core.config import settings
+
+IMAGE_DIR = os.path.join(settings.UPLOAD_DIR, "images")
+ORIGINAL_NAME = "original.png"
+FORMAT_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.AI_IMAGE_WORKERS)
+    return _executor
+
+
+def shutdown_image_pool():
+    """关闭图片处理进程池"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def derivative_name(size: int) -> str:
+    return f"{size}.{FORMAT_EXTENSIONS[settings.AI_IMAGE_FORMAT]}"
+
+
+def image_path(content_hash: str, name: str) -> str:
+    return os.path.join(IMAGE_DIR, content_hash, name)
+
+
+def _render(data: bytes, out_dir: str, sizes: list, image_format: str, quality: int):
+    """在子进程中解码图片，保存原图(PNG)并生成各尺寸缩略图；先写临时文件再改名，避免读到半个文件"""
+    os.makedirs(out_dir, exist_ok=True)
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    def save(img, name, **options):
+        path = os.path.join(out_dir, name)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        img.save(tmp_path, **options)
+        os.replace(tmp_path, path)
+
+    save(image, ORIGINAL_NAME, format="PNG", optimize=True)
+    extension = FORMAT_EXTENSIONS[image_format]
+    for size in sizes:
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size), Image.LANCZOS)
+        if image_format == "jpeg" and thumbnail.mode == "RGBA":
+            thumbnail = thumbnail.convert("RGB")
+        save(thumbnail, f"{size}.{extension}", format=image_format.upper(), quality=quality)
+
+
+async def process_image(data: bytes) -> Dict:
+    """按内容哈希缓存原图和缩略图，已处理过的图片直接复用；图片编码在进程池中执行，不阻塞事件循环"""
+    content_hash = hashlib.sha256(data).hexdigest()
+    out_dir = os.path.join(IMAGE_DIR, content_hash)
+    sizes = list(settings.AI_IMAGE_SIZES)
+    names = [ORIGINAL_NAME] + [derivative_name(size) for size in sizes]
+    if not all(os.path.exists(os.path.join(out_dir, name)) for name in names):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            _get_executor(), _render, data, out_dir, sizes, settings.AI_IMAGE_FORMAT, settings.AI_IMAGE_QUALITY
+        )
+    return {
+        "content_hash": content_hash,
+        "file_path": image_path(content_hash, ORIGINAL_NAME),
+        "derivatives": {str(size): image_path(content_hash, derivative_name(size)) for size in sizes}
+    }
@@ -0,0 +1,145 @@
+import mmap
+import os
+import struct
+from typing import Dict, Iterator, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+
+# 需要递归查找子box的容器类型
+CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+# stsd中的编码标识
+CODECS = {
+    b"avc1": "h264", b"avc3": "h264",
+    b"hvc1": "hevc", b"hev1": "hevc",
+    b"av01": "av1", b"vp09": "vp9", b"mp4v": "mpeg4",
+    b"mp4a": "aac", b"ac-3": "ac3", b"ec-3": "eac3", b"Opus": "opus"
+}
+
+
+class MediaProbeError(Exception):
+    """文件不是可解析的MP4/MOV视频"""
+
+
+def _boxes(buf, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """遍历[start, end)范围内的box，返回(类型, 内容起点, 终点)"""
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                raise MediaProbeError("box头不完整")
+            size = struct.unpack_from(">Q", buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise MediaProbeError(f"{box_type!r} box长度无效")
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _find(buf, start: int, end: int, box_type: bytes) -> Optional[Tuple[int, int]]:
+    for found, body, box_end in _boxes(buf, start, end):
+        if found == box_type:
+            return body, box_end
+    return None
+
+
+def _parse_mvhd(buf, body: int) -> Tuple[int, int]:
+    """返回(timescale, duration)"""
+    if buf[body] == 1:
+        return struct.unpack_from(">IQ", buf, body + 20)
+    return struct.unpack_from(">II", buf, body + 12)
+
+
+def _parse_tkhd(buf, body: int) -> Tuple[int, int]:
+    """返回(width, height)，tkhd中为16.16定点数"""
+    offset = 88 if buf[body] == 1 else 76
+    width, height = struct.unpack_from(">II", buf, body + offset)
+    return width >> 16, height >> 16
+
+
+def _parse_track(buf, body: int, end: int) -> Dict:
+    track = {}
+    tkhd = _find(buf, body, end, b"tkhd")
+    if tkhd:
+        track["width"], track["height"] = _parse_tkhd(buf, tkhd[0])
+    mdia = _find(buf, body, end, b"mdia")
+    if not mdia:
+        return track
+    hdlr = _find(buf, *mdia, b"hdlr")
+    if hdlr:
+        track["handler"] = bytes(buf[hdlr[0] + 8:hdlr[0] + 12])
+    minf = _find(buf, *mdia, b"minf")
+    stbl = minf and _find(buf, *minf, b"stbl")
+    stsd = stbl and _find(buf, *stbl, b"stsd")
+    if stsd and stsd[0] + 16 <= stsd[1]:
+        fourcc = bytes(buf[stsd[0] + 12:stsd[0] + 16])
+        track["codec"] = CODECS.get(fourcc, fourcc.decode("latin-1").strip())
+    return track
+
+
+def probe_mp4(path: str) -> Dict:
+    """通过mmap只读取moov中的mvhd/tkhd/hdlr/stsd，不读取媒体数据，返回时长、分辨率、编码和码率"""
+    file_size = os.path.getsize(path)
+    if file_size < 8:
+        raise MediaProbeError("文件过小")
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        try:
+            moov = _find(buf, 0, file_size, b"moov")
+            if not moov:
+                raise MediaProbeError("缺少moov，不是有效的MP4/MOV文件")
+            mvhd = _find(buf, *moov, b"mvhd")
+            if not mvhd:
+                raise MediaProbeError("缺少mvhd")
+            timescale, duration = _parse_mvhd(buf, mvhd[0])
+            tracks = [_parse_track(buf, body, end) for box_type, body, end in _boxes(buf, *moov) if box_type == b"trak"]
+        except (struct.error, IndexError):
+            raise MediaProbeError("文件结构损坏")
+    
+    if not timescale:
+        raise MediaProbeError("时长信息无效")
+    seconds = duration / timescale
+    video = next((t for t in tracks if t.get("handler") == b"vide"), None)
+    audio = next((t for t in tracks if t.get("handler") == b"soun"), None)
+    return {
+        "duration": seconds,
+        "width": video.get("width") if video else None,
+        "height": video.get("height") if video else None,
+        "video_codec": video.get("codec") if video else None,
+        "audio_codec": audio.get("codec") if audio else None,
+        "bitrate": int(file_size * 8 / seconds) if seconds else None,
+        "file_size": file_size
+    }
+
+
+async def probe_video(path: str) -> Dict:
+    """在线程池中解析视频元数据"""
+    return await run_in_threadpool(probe_mp4, path)
+
+
+def douyin_rejection(metadata: Dict) -> Optional[str]:
+    """检查视频是否满足抖音的上传限制，不满足时返回原因"""
+    if not metadata.get("video_codec"):
+        return "文件中没有视频轨道"
+    if metadata["video_codec"] not in settings.DOUYIN_VIDEO_CODECS:
+        return f"不支持的视频编码: {metadata['video_codec']}"
+    if metadata["duration"] < settings.DOUYIN_MIN_DURATION:
+        return f"视频时长不能少于{settings.DOUYIN_MIN_DURATION}秒"
+    if metadata["duration"] > settings.DOUYIN_MAX_DURATION:
+        return f"视频时长不能超过{settings.DOUYIN_MAX_DURATION}秒"
+    return None
+
+
+def metadata_columns(metadata: Dict) -> Dict:
+    """转换为Video表的列"""
+    return {
+        "duration": round(metadata["duration"]),
+        "width": metadata["width"],
+        "height": metadata["height"],
+        "video_codec": metadata["video_codec"],
+        "bitrate": metadata["bitrate"],
+        "file_size": metadata["file_size"]
+    }
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import re
+import uuid
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+import aiofiles
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.media_blob import MediaBlob
+
+BLOB_DIR = os.path.join(settings.UPLOAD_DIR, "blobs")
+TMP_DIR = os.path.join(settings.UPLOAD_DIR, "tmp")
+
+
+def blob_path(sha256: str, extension: str) -> str:
+    """按哈希前两位分目录，避免单个目录文件过多；加随机后缀，同一内容释放后重新上传不会与待删除的旧文件同名"""
+    return os.path.join(BLOB_DIR, sha256[:2], f"{sha256}-{uuid.uuid4().hex[:8]}{extension}")
+
+
+def file_extension(filename: Optional[str]) -> str:
+    extension = os.path.splitext(os.path.basename(filename or ""))[1].lower()
+    return extension if re.fullmatch(r"\.[a-z0-9]{1,10}", extension) else ""
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_files(paths: Iterable[str]):
+    """删除release_blobs返回的文件，需在事务提交成功后调用"""
+    for path in paths:
+        _remove(path)
+
+
+async def save_upload_to_temp(file: UploadFile) -> Tuple[str, str, int]:
+    """分块写入临时文件并同时计算SHA-256，超过大小限制时中止并删除已写入的部分；返回(临时路径, 哈希, 大小)"""
+    os.makedirs(TMP_DIR, exist_ok=True)
+    tmp_path = os.path.join(TMP_DIR, uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    file_size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as f:
+            while True:
+                chunk = await file.read(settings.UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                file_size += len(chunk)
+                if file_size > settings.MAX_FILE_SIZE:
+                    raise HTTPException(status_code=413, detail=f"文件大小超过限制({settings.MAX_FILE_SIZE}字节)")
+                digest.update(chunk)
+                await f.write(chunk)
+    except BaseException:
+        _remove(tmp_path)
+        raise
+    finally:
+        await file.close()
+    return tmp_path, digest.hexdigest(), file_size
+
+
+async def find_blob(db: AsyncSession, sha256: str) -> Optional[MediaBlob]:
+    return await db.scalar(select(MediaBlob).where(MediaBlob.sha256 == sha256))
+
+
+async def acquire_blob(
+    db: AsyncSession,
+    tmp_path: str,
+    sha256: str,
+    file_size: int,
+    extension: str = "",
+    media_metadata: Optional[dict] = None
+) -> Tuple[MediaBlob, bool]:
+    """为一次上传获取文件引用：内容已存在时只增加引用计数并丢弃临时文件，否则将临时文件移入内容寻址路径
+
+    返回(blob, 是否新建)；新建时若调用方的事务最终未提交，需删除blob.file_path。
+    """
+    for _ in range(2):
+        blob = await find_blob(db, sha256)
+        if blob:
+            result = await db.execute(
+                update(MediaBlob).where(MediaBlob.id == blob.id).values(ref_count=MediaBlob.ref_count + 1)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount:
+                if os.path.exists(blob.file_path):
+                    _remove(tmp_path)
+                else:
+                    # 文件在释放过程中已被删除，用本次上传的内容恢复
+                    os.makedirs(os.path.dirname(blob.file_path), exist_ok=True)
+                    os.replace(tmp_path, blob.file_path)
+                return blob, False
+        
+        # 另一个请求同时上传了相同内容时不插入，改为引用对方的记录；不使用SAVEPOINT，
+        # SQLite在事务开始前执行SAVEPOINT时，释放它会直接提交，调用方之后失败也无法回滚这条记录
+        insert = postgresql.insert if db.bind.dialect.name == "postgresql" else sqlite.insert
+        result = await db.execute(
+            insert(MediaBlob).values(
+                sha256=sha256,
+                file_path=blob_path(sha256, extension),
+                file_size=file_size,
+                ref_count=1,
+                media_metadata=media_metadata
+            ).on_conflict_do_nothing(index_elements=[MediaBlob.sha256])
+        )
+        if not result.rowcount:
+            continue
+        blob = await find_blob(db, sha256)
+        os.makedirs(os.path.dirname(blob.file_path), exist_ok=True)
+        os.replace(tmp_path, blob.file_path)
+        return blob, True
+    raise RuntimeError(f"无法登记文件 {sha256}")
+
+
+async def release_blobs(db: AsyncSession, blob_ids: Iterable[Optional[int]]) -> List[str]:
+    """减少引用计数并删除不再被引用的记录，由调用方提交事务
+
+    返回不再被引用的文件路径，调用方提交成功后用remove_files删除；提交失败时记录和文件都保留。
+    """
+    counts = Counter(blob_id for blob_id in blob_ids if blob_id)
+    if not counts:
+        return []
+    # 按减少的数量分组，通常所有文件都只减1，只需一条UPDATE
+    by_count = {}
+    for blob_id, count in counts.items():
+        by_count.setdefault(count, []).append(blob_id)
+    for count, ids in by_count.items():
+        await db.execute(
+            update(MediaBlob).where(MediaBlob.id.in_(ids)).values(ref_count=MediaBlob.ref_count - count)
+            .execution_options(synchronize_session=False)
+        )
+    result = await db.execute(
+        select(MediaBlob.id, MediaBlob.file_path).where(MediaBlob.id.in_(counts), MediaBlob.ref_count <= 0)
+    )
+    orphans = result.all()
+    if orphans:
+        await db.execute(
+            delete(MediaBlob).where(MediaBlob.id.in_([row.id for row in orphans]))
+            .execution_options(synchronize_session=False)
+        )
+    return [row.file_path for row in orphans]
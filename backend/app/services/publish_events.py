@@ -0,0 +1,38 @@
+import json
+import logging
+from typing import AsyncIterator, Dict
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# SSE连接空闲时发送心跳的间隔(秒)，防止被nginx等代理断开
+HEARTBEAT_INTERVAL = 15
+
+
+def _channel(user_id: int) -> str:
+    return f"publish_status:{user_id}"
+
+
+async def publish_status_event(user_id: int, payload: Dict):
+    """通过Redis发布任务状态变化，推送失败不影响主流程"""
+    try:
+        await get_redis().publish(_channel(user_id), json.dumps(payload, default=str))
+    except Exception as e:
+        logger.warning("推送发布状态失败: %s", e)
+
+
+async def stream_status_events(user_id: int) -> AsyncIterator[str]:
+    """订阅当前用户的发布状态变化，逐条生成SSE消息"""
+    pubsub = get_redis().pubsub()
+    await pubsub.subscribe(_channel(user_id))
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=HEARTBEAT_INTERVAL)
+            if message is None:
+                yield ": heartbeat\n\n"
+                continue
+            yield f"event: publish_status\ndata: {message['data']}\n\n"
+    finally:
+        await pubsub.unsubscribe(_channel(user_id))
+        await pubsub.aclose()
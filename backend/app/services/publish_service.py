@@ -0,0 +1,122 @@
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.user import User
+from app.models.video import Video
+from app.models.publish_task import PublishTask
+from app.services.douyin_service import DouyinService
+from app.services.media_probe import MediaProbeError, probe_video, douyin_rejection, metadata_columns
+from app.services.publish_events import publish_status_event
+
+# 不再需要后台处理的任务状态
+TERMINAL_STATUSES = ("success", "failed")
+
+
+def publish_task_to_dict(publish_task: PublishTask) -> Dict:
+    """发布任务的对外表示"""
+    return {
+        "id": publish_task.id,
+        "video_id": publish_task.video_id,
+        "task_id": publish_task.task_id,
+        "status": publish_task.status,
+        "progress": publish_task.progress,
+        "error_message": publish_task.error_message,
+        "douyin_video_id": publish_task.douyin_video_id,
+        "douyin_url": publish_task.douyin_url,
+        "created_at": publish_task.created_at,
+        "updated_at": publish_task.updated_at
+    }
+
+
+class PublishService:
+    """在后台执行视频发布（分片上传到抖音）"""
+
+    def __init__(self, douyin_service: DouyinService = None):
+        self.douyin_service = douyin_service or DouyinService()
+
+    async def run(self, db: AsyncSession, publish_task_id: int, final_attempt: bool = True):
+        """执行一次发布尝试，失败时抛出异常由调用方决定是否重试"""
+        publish_task = await db.get(PublishTask, publish_task_id)
+        # 任务已被删除、已完成或已进入抖音处理阶段时直接返回，保证重复投递是幂等的
+        if not publish_task or publish_task.task_id or publish_task.status in TERMINAL_STATUSES:
+            return
+        video = await db.get(Video, publish_task.video_id)
+        user = await db.get(User, publish_task.user_id)
+        if not video or not user:
+            await self._mark_failed(db, publish_task, video, "视频或用户不存在")
+            return
+
+        # 上传前在本地校验视频，不满足抖音要求时直接失败，不再重试
+        rejection = await self._check_video(video)
+        if rejection:
+            await self._mark_failed(db, publish_task, video, rejection)
+            return
+
+        publish_task.status = "uploading"
+        publish_task.error_message = None
+        publish_task.updated_at = datetime.utcnow()
+        await db.commit()
+        await self._notify(publish_task)
+
+        async def save_progress(state: dict):
+            # 上传分片占总进度的90%，剩余部分留给完成上传
+            publish_task.task_metadata = state
+            publish_task.progress = int(len(state["completed_parts"]) * 90 / state["total_parts"])
+            publish_task.updated_at = datetime.utcnow()
+            await db.commit()
+            await self._notify(publish_task)
+
+        try:
+            access_token = await self.douyin_service.ensure_valid_token(db, user)
+            result = await self.douyin_service.upload_video(
+                access_token,
+                video.file_path,
+                video.title,
+                video.description,
+                resume_state=publish_task.task_metadata,
+                on_progress=save_progress
+            )
+        except Exception as e:
+            if final_attempt:
+                await self._mark_failed(db, publish_task, video, str(e))
+            else:
+                # 保留已上传的分片信息，等待重试
+                publish_task.status = "queued"
+                publish_task.error_message = str(e)
+                publish_task.updated_at = datetime.utcnow()
+                await db.commit()
+                await self._notify(publish_task)
+            raise
+
+        publish_task.task_id = result["data"]["task_id"]
+        publish_task.status = "processing"
+        publish_task.progress = 100
+        # 交给状态轮询器尽快查询抖音处理结果
+        publish_task.next_poll_at = datetime.utcnow()
+        publish_task.updated_at = datetime.utcnow()
+        await db.commit()
+        await self._notify(publish_task)
+
+    async def _check_video(self, video: Video) -> Optional[str]:
+        """重新解析视频文件(只读moov，毫秒级)并补全元数据，返回不能发布的原因"""
+        try:
+            metadata = await probe_video(video.file_path)
+        except (MediaProbeError, OSError) as e:
+            return f"视频文件无效: {e}"
+        for column, value in metadata_columns(metadata).items():
+            setattr(video, column, value)
+        return douyin_rejection(metadata)
+
+    async def _notify(self, publish_task: PublishTask):
+        """推送任务状态变化给前端"""
+        await publish_status_event(publish_task.user_id, publish_task_to_dict(publish_task))
+
+    async def _mark_failed(self, db: AsyncSession, publish_task: PublishTask, video: Video, error: str):
+        """将发布任务和视频标记为失败"""
+        publish_task.status = "failed"
+        publish_task.error_message = error
+        publish_task.updated_at = datetime.utcnow()
+        if video:
+            video.publish_status = "failed"
+        await db.commit()
+        await self._notify(publish_task)
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.user import User
+from app.models.video import Video
+from app.models.publish_task import PublishTask
+from app.services.douyin_service import DouyinService
+from app.services.publish_events import publish_status_event
+from app.services.publish_service import publish_task_to_dict
+
+logger = logging.getLogger(__name__)
+
+# 抖音返回的状态到本地任务状态的映射，未列出的状态视为仍在处理中
+DOUYIN_STATUS_MAP = {
+    "success": "success",
+    "published": "success",
+    "failed": "failed",
+    "fail": "failed",
+    "error": "failed"
+}
+
+
+def next_poll_interval(created_at: datetime, now: datetime) -> timedelta:
+    """新任务频繁轮询，随任务存在时间增长逐步放慢"""
+    age = (now - (created_at or now)).total_seconds()
+    seconds = age * settings.PUBLISH_POLL_BACKOFF_FACTOR
+    seconds = max(settings.PUBLISH_POLL_MIN_INTERVAL, min(settings.PUBLISH_POLL_MAX_INTERVAL, seconds))
+    return timedelta(seconds=seconds)
+
+
+class PublishStatusPoller:
+    """批量查询处理中的发布任务状态，并批量写回数据库"""
+
+    def __init__(self, douyin_service: DouyinService = None):
+        self.douyin_service = douyin_service or DouyinService()
+
+    async def poll_due(self, db: AsyncSession) -> int:
+        """轮询所有到期的任务，返回状态发生变化的任务数"""
+        now = datetime.utcnow()
+        result = await db.execute(select(PublishTask).where(
+            PublishTask.status == "processing",
+            PublishTask.task_id.isnot(None),
+            or_(PublishTask.next_poll_at.is_(None), PublishTask.next_poll_at <= now)
+        ).order_by(PublishTask.next_poll_at).limit(settings.PUBLISH_POLL_BATCH_SIZE))
+        tasks = result.scalars().all()
+        if not tasks:
+            return 0
+
+        # 每个用户只获取一次访问令牌
+        user_ids = {t.user_id for t in tasks}
+        users = (await db.execute(select(User).where(User.id.in_(user_ids)))).scalars().all()
+        tokens: Dict[int, Optional[str]] = {}
+        for user in users:
+            try:
+                tokens[user.id] = await self.douyin_service.ensure_valid_token(db, user)
+            except Exception as e:
+                logger.warning("用户%s获取抖音令牌失败: %s", user.id, e)
+                tokens[user.id] = None
+
+        semaphore = asyncio.Semaphore(settings.PUBLISH_POLL_CONCURRENCY)
+
+        async def check(task: PublishTask) -> Optional[Dict]:
+            access_token = tokens.get(task.user_id)
+            if not access_token:
+                return None
+            async with semaphore:
+                try:
+                    return await self.douyin_service.check_publish_status(access_token, task.task_id)
+                except Exception as e:
+                    logger.warning("查询发布任务%s状态失败: %s", task.task_id, e)
+                    return None
+
+        results = await asyncio.gather(*(check(t) for t in tasks))
+
+        now = datetime.utcnow()
+        task_updates: List[Dict] = []
+        video_updates: List[Dict] = []
+        events: List = []
+        for task, result in zip(tasks, results):
+            values = {"id": task.id, "next_poll_at": now + next_poll_interval(task.created_at, now)}
+            data = (result or {}).get("data") or {}
+            status = DOUYIN_STATUS_MAP.get(str(data.get("status", "")).lower(), "processing")
+            if result is not None and status != task.status:
+                values.update(
+                    status=status,
+                    douyin_video_id=data.get("item_id") or task.douyin_video_id,
+                    douyin_url=data.get("share_url") or task.douyin_url,
+                    updated_at=now
+                )
+                # 视频已被删除时外键为空，只更新任务
+                if task.video_id is not None:
+                    video_updates.append({
+                        "id": task.video_id,
+                        "publish_status": status,
+                        "status": "published" if status == "success" else "failed",
+                        "douyin_url": values["douyin_url"],
+                        "updated_at": now
+                    })
+                events.append((task.user_id, {**publish_task_to_dict(task), **values}))
+            task_updates.append(values)
+
+        # 按主键批量更新，整批只提交一次
+        await db.execute(update(PublishTask), task_updates)
+        if video_updates:
+            await db.execute(update(Video), video_updates)
+        await db.commit()
+
+        for user_id, payload in events:
+            payload.pop("next_poll_at", None)
+            await publish_status_event(user_id, payload)
+        return len(events)
@@ -0,0 +1,54 @@
+from datetime import datetime
+from typing import Dict, Optional
+from app.core.cache import TieredCache
+from app.core.config import settings
+from app.models.user import User
+
+# 缓存的用户字段：不包含密码哈希和抖音令牌，凭据只保存在数据库中，需要时由ensure_valid_token读取
+_CACHED_FIELDS = (
+    "id", "username", "email", "douyin_user_id", "douyin_token_expires_at", "is_active", "created_at", "updated_at"
+)
+_DATETIME_FIELDS = ("douyin_token_expires_at", "created_at", "updated_at")
+
+_user_cache = TieredCache(
+    "user",
+    maxsize=settings.USER_CACHE_MAXSIZE,
+    ttl=settings.USER_CACHE_TTL,
+    redis_ttl=settings.USER_CACHE_REDIS_TTL,
+    use_redis=settings.USER_CACHE_REDIS_ENABLED
+)
+
+
+def _to_snapshot(user: User) -> Dict:
+    data = {field: getattr(user, field) for field in _CACHED_FIELDS}
+    for field in _DATETIME_FIELDS:
+        if data[field] is not None:
+            data[field] = data[field].isoformat()
+    return data
+
+
+def _from_snapshot(data: Dict) -> User:
+    """由缓存数据构造未绑定会话的User对象，修改它不会写回数据库"""
+    values = {field: data.get(field) for field in _CACHED_FIELDS}
+    for field in _DATETIME_FIELDS:
+        if values.get(field):
+            values[field] = datetime.fromisoformat(values[field])
+    return User(**values)
+
+
+async def get_cached_user(username: str) -> Optional[User]:
+    """按令牌中的用户名读取缓存的用户"""
+    data = await _user_cache.get(username)
+    return _from_snapshot(data) if data is not None else None
+
+
+async def cache_user(user: User) -> User:
+    """缓存用户并返回对应的快照对象"""
+    data = _to_snapshot(user)
+    await _user_cache.set(user.username, data)
+    return _from_snapshot(data)
+
+
+async def invalidate_user(username: str):
+    """用户数据变化（令牌刷新、抖音授权、禁用等）时清除缓存"""
+    await _user_cache.delete(username)
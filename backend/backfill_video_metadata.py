@@ -0,0 +1,63 @@
+"""为已有视频补全时长、分辨率、编码和码率
+
+用法: python backfill_video_metadata.py [--batch-size 200] [--all]
+默认只处理duration为空的视频；--all时重新解析全部视频。
+"""
+import argparse
+import asyncio
+from sqlalchemy import select, update
+from app.core.database import AsyncSessionLocal
+from app.models.video import Video
+from app.services.media_probe import MediaProbeError, probe_video, douyin_rejection, metadata_columns
+
+
+async def backfill(batch_size: int, reprobe_all: bool):
+    updated = 0
+    invalid = []
+    last_id = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            query = select(Video.id, Video.file_path).where(Video.id > last_id)
+            if not reprobe_all:
+                query = query.where(Video.duration.is_(None))
+            rows = (await db.execute(query.order_by(Video.id).limit(batch_size))).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            
+            results = await asyncio.gather(
+                *(probe_video(row.file_path) for row in rows),
+                return_exceptions=True
+            )
+            values = []
+            for row, result in zip(rows, results):
+                if isinstance(result, (MediaProbeError, OSError)):
+                    invalid.append((row.id, str(result)))
+                    continue
+                if isinstance(result, BaseException):
+                    raise result
+                rejection = douyin_rejection(result)
+                if rejection:
+                    invalid.append((row.id, rejection))
+                values.append({"id": row.id, **metadata_columns(result)})
+            if values:
+                await db.execute(update(Video), values)
+                await db.commit()
+                updated += len(values)
+            print(f"已处理到视频 {last_id}，累计更新 {updated} 条")
+    
+    for video_id, reason in invalid:
+        print(f"视频 {video_id} 无法发布: {reason}")
+    print(f"完成：更新 {updated} 条，无法发布 {len(invalid)} 条")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="补全已有视频的元数据")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--all", action="store_true", help="重新解析全部视频")
+    args = parser.parse_args()
+    asyncio.run(backfill(args.batch_size, args.all))
+
+
+if __name__ == "__main__":
+    main()
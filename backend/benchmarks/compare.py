@@ -0,0 +1,46 @@
+"""对比两次压测结果
+
+用法: python -m benchmarks.compare baseline.json candidate.json
+按并发级别输出req/s、p50/p95/p99延迟和峰值RSS的变化。
+"""
+import argparse
+import json
+from typing import Optional
+
+
+def change(old: Optional[float], new: Optional[float]) -> str:
+    if old is None or new is None:
+        return "n/a"
+    if not old:
+        return f"{new}"
+    return f"{old} -> {new} ({(new - old) / old * 100:+.1f}%)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比两次压测结果")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    print(f"baseline:  {baseline.get('commit')}{' (dirty)' if baseline.get('dirty') else ''}")
+    print(f"candidate: {candidate.get('commit')}{' (dirty)' if candidate.get('dirty') else ''}")
+
+    old_levels = {level["concurrency"]: level for level in baseline["levels"]}
+    for level in candidate["levels"]:
+        old = old_levels.get(level["concurrency"])
+        if not old:
+            continue
+        print(f"\n并发 {level['concurrency']}")
+        print(f"  req/s     {change(old['rps'], level['rps'])}")
+        for pct in ("p50", "p95", "p99"):
+            print(f"  {pct} ms    {change(old['latency_ms'][pct], level['latency_ms'][pct])}")
+        print(f"  errors    {change(old['errors'], level['errors'])}")
+        print(f"  rss KB    {change(old.get('api_peak_rss_kb'), level.get('api_peak_rss_kb'))}")
+
+
+if __name__ == "__main__":
+    main()
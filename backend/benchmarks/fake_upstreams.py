@@ -0,0 +1,193 @@
+"""压测用的本地抖音开放平台、OpenAI和Stability模拟服务
+
+所有接口按以下环境变量注入延迟和错误：
+    BENCH_UPSTREAM_LATENCY_MS   每个请求的固定延迟(毫秒)
+    BENCH_UPSTREAM_JITTER_MS    在固定延迟上叠加的随机延迟上限(毫秒)
+    BENCH_UPSTREAM_ERROR_RATE   返回503的请求比例(0~1)
+    BENCH_PUBLISH_PROCESSING_SECONDS  完成上传后多久查询状态返回发布成功
+
+用法: uvicorn benchmarks.fake_upstreams:app --port 9100
+"""
+import asyncio
+import base64
+import json
+import os
+import random
+import struct
+import time
+import uuid
+import zlib
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+LATENCY = float(os.getenv("BENCH_UPSTREAM_LATENCY_MS", "50")) / 1000
+JITTER = float(os.getenv("BENCH_UPSTREAM_JITTER_MS", "20")) / 1000
+ERROR_RATE = float(os.getenv("BENCH_UPSTREAM_ERROR_RATE", "0"))
+PROCESSING_SECONDS = float(os.getenv("BENCH_PUBLISH_PROCESSING_SECONDS", "2"))
+
+app = FastAPI(title="benchmark upstreams")
+
+# upload_id -> 完成时间；task_id -> 完成时间
+_uploads = {}
+_tasks = {}
+
+
+def _png(width: int = 64, height: int = 64) -> bytes:
+    """生成一张灰度PNG，供图片生成接口返回"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+    rows = b"".join(b"\x00" + bytes((x * 4) % 256 for x in range(width)) for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+PNG = _png()
+
+
+@app.middleware("http")
+async def inject_faults(request: Request, call_next):
+    if request.url.path == "/health":
+        return await call_next(request)
+    await asyncio.sleep(LATENCY + random.uniform(0, JITTER))
+    if random.random() < ERROR_RATE:
+        return JSONResponse({"error": "injected failure"}, status_code=503)
+    return await call_next(request)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "healthy"}
+
+
+# ---- 抖音开放平台 ----
+
+def _token_data() -> dict:
+    return {"data": {
+        "access_token": f"act.{uuid.uuid4().hex}",
+        "refresh_token": f"rft.{uuid.uuid4().hex}",
+        "expires_in": 86400,
+        "open_id": uuid.uuid4().hex,
+        "error_code": 0
+    }}
+
+
+@app.post("/oauth/access_token/")
+async def access_token():
+    return _token_data()
+
+
+@app.post("/oauth/refresh_token/")
+async def refresh_token():
+    return _token_data()
+
+
+@app.get("/oauth/userinfo/")
+async def userinfo():
+    return {"data": {"open_id": uuid.uuid4().hex, "nickname": "bench", "error_code": 0}}
+
+
+@app.get("/video/list/")
+async def video_list(cursor: int = 0, count: int = 20):
+    now = int(time.time())
+    items = [{
+        "item_id": f"item-{cursor + i}",
+        "title": f"视频{cursor + i}",
+        "cover": "",
+        "share_url": f"https://www.douyin.com/video/{cursor + i}",
+        "video_status": 1,
+        "is_top": False,
+        "create_time": now - (cursor + i) * 60,
+        "statistics": {"play_count": 100, "digg_count": 10}
+    } for i in range(count)]
+    return {"data": {"list": items, "cursor": cursor + count, "has_more": cursor + count < 100, "error_code": 0}}
+
+
+@app.post("/video/upload/")
+async def create_upload():
+    upload_id = uuid.uuid4().hex
+    _uploads[upload_id] = None
+    return {"data": {"upload_id": upload_id, "error_code": 0}}
+
+
+@app.post("/video/part/upload/")
+async def upload_part(request: Request):
+    # 读完请求体，模拟真实的上传开销
+    async for _ in request.stream():
+        pass
+    return {"data": {"error_code": 0}}
+
+
+@app.post("/video/complete/")
+async def complete_upload():
+    task_id = uuid.uuid4().hex
+    _tasks[task_id] = time.monotonic()
+    return {"data": {"task_id": task_id, "error_code": 0}}
+
+
+@app.get("/video/query/")
+async def query_task(task_id: str):
+    started = _tasks.get(task_id)
+    if started is not None and time.monotonic() - started >= PROCESSING_SECONDS:
+        return {"data": {
+            "status": "success",
+            "item_id": f"item-{task_id[:12]}",
+            "share_url": f"https://www.douyin.com/video/{task_id[:12]}",
+            "error_code": 0
+        }}
+    return {"data": {"status": "processing", "error_code": 0}}
+
+
+# ---- OpenAI ----
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    prompt = body["messages"][-1]["content"]
+    content = f"标题：模拟生成的标题 {abs(hash(prompt)) % 10000}\n描述：这是压测用的模拟描述。"
+    usage = {"prompt_tokens": len(prompt), "completion_tokens": len(content), "total_tokens": len(prompt) + len(content)}
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    created = int(time.time())
+    model = body.get("model", "gpt-3.5-turbo")
+
+    if not body.get("stream"):
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": usage
+        }
+
+    async def events():
+        base = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model}
+        for i in range(0, len(content), 8):
+            delta = {"index": 0, "delta": {"content": content[i:i + 8]}, "finish_reason": None}
+            yield f"data: {json.dumps({**base, 'choices': [delta]})}\n\n"
+            await asyncio.sleep(0.005)
+        yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})}\n\n"
+        yield f"data: {json.dumps({**base, 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.post("/v1/images/generations")
+async def image_generations(request: Request):
+    return {"created": int(time.time()), "data": [{"url": f"{str(request.base_url).rstrip('/')}/files/image.png"}]}
+
+
+@app.get("/files/image.png")
+async def image_file():
+    return Response(PNG, media_type="image/png")
+
+
+# ---- Stability ----
+
+@app.post("/v1/generation/{engine}/text-to-image")
+async def text_to_image(engine: str):
+    return {"artifacts": [{"base64": base64.b64encode(PNG).decode(), "seed": 0, "finishReason": "SUCCESS"}]}
@@ -0,0 +1,207 @@
+"""端到端压测：启动本地模拟上游、API服务和celery worker，按设定并发发送混合流量
+
+用法: python -m benchmarks.run --concurrency 1 8 32 --duration 30 --output bench.json
+需要可用的Redis(--redis-url)。结果为JSON，包含每个并发级别的req/s、p50/p95/p99延迟和API进程的峰值RSS，
+可用 python -m benchmarks.compare old.json new.json 对比两次提交。
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+import httpx
+from benchmarks.workload import Workload, parse_mix, prepare_users
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def peak_rss_kb(pid: int) -> Optional[int]:
+    """进程生命周期内的峰值RSS(VmHWM)，非Linux返回None"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def git_revision() -> Dict:
+    def git(*args) -> str:
+        return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def start(args: List[str], env: Dict, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    return subprocess.Popen([sys.executable, "-m", *args], cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"进程启动失败: {' '.join(process.args)}")
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"等待 {url} 超时")
+
+
+def service_env(args, workdir: str, upstream_url: str) -> Dict:
+    """API和worker的配置：使用临时数据库和上传目录，外部服务全部指向模拟上游"""
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "DATABASE_PROFILE": args.database_profile,
+        "UPLOAD_DIR": os.path.join(workdir, "uploads"),
+        "REDIS_URL": args.redis_url,
+        "DOUYIN_API_BASE_URL": upstream_url,
+        "DOUYIN_CLIENT_ID": "bench",
+        "DOUYIN_CLIENT_SECRET": "bench",
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"{upstream_url}/v1",
+        "STABILITY_API_KEY": "bench",
+        "STABILITY_API_BASE_URL": upstream_url,
+        "PUBLISH_POLL_TICK": "1",
+        "PUBLISH_POLL_MIN_INTERVAL": "1",
+        "PROFILING_ENABLED": "false"
+    })
+    if not args.keep_quotas:
+        # 压测用户很少，默认放开按用户限额，只保留并发和排队控制
+        env.update({"RATE_LIMIT_DEFAULT": "1000000", "RATE_LIMIT_AI": "1000000", "RATE_LIMIT_PUBLISH": "1000000"})
+    return env
+
+
+async def benchmark(args) -> Dict:
+    mix = parse_mix(args.mix)
+    workdir = tempfile.mkdtemp(prefix="douyin-bench-")
+    upstream_port, api_port = free_port(), free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    api_url = f"http://127.0.0.1:{api_port}"
+
+    upstream_env = dict(os.environ, **{
+        "BENCH_UPSTREAM_LATENCY_MS": str(args.upstream_latency_ms),
+        "BENCH_UPSTREAM_JITTER_MS": str(args.upstream_jitter_ms),
+        "BENCH_UPSTREAM_ERROR_RATE": str(args.upstream_error_rate),
+        "BENCH_PUBLISH_PROCESSING_SECONDS": str(args.publish_processing_seconds)
+    })
+    env = service_env(args, workdir, upstream_url)
+    processes = []
+    try:
+        upstream = start(
+            ["uvicorn", "benchmarks.fake_upstreams:app", "--port", str(upstream_port), "--log-level", "warning"],
+            upstream_env, os.path.join(workdir, "upstream.log")
+        )
+        processes.append(upstream)
+        api = start(
+            ["uvicorn", "main:app", "--port", str(api_port), "--log-level", "warning", "--no-access-log"],
+            env, os.path.join(workdir, "api.log")
+        )
+        processes.append(api)
+        await wait_ready(f"{upstream_url}/health", upstream)
+        await wait_ready(f"{api_url}/health", api)
+        if not args.no_worker:
+            processes.append(start(
+                ["celery", "-A", "app.services.celery", "worker", "--beat", "--loglevel", "warning",
+                 "--schedule", os.path.join(workdir, "celerybeat-schedule")],
+                env, os.path.join(workdir, "worker.log")
+            ))
+
+        limits = httpx.Limits(max_connections=max(args.concurrency) + 10, max_keepalive_connections=max(args.concurrency) + 10)
+        async with httpx.AsyncClient(base_url=f"{api_url}/api/v1", timeout=args.timeout, limits=limits) as client:
+            users = await prepare_users(client, args.users, args.seed_videos, args.upload_size)
+            workload = Workload(client, users, mix, args.upload_size)
+            levels = []
+            for concurrency in args.concurrency:
+                result = await workload.run(concurrency, args.duration, args.warmup)
+                result["api_peak_rss_kb"] = peak_rss_kb(api.pid)
+                levels.append(result)
+                print(
+                    f"并发 {concurrency}: {result['rps']} req/s, p50 {result['latency_ms']['p50']}ms, "
+                    f"p95 {result['latency_ms']['p95']}ms, p99 {result['latency_ms']['p99']}ms, "
+                    f"错误 {result['errors']}, 拒绝 {result['rejected']}",
+                    file=sys.stderr
+                )
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+        for process in processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    return {
+        **git_revision(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "mix": mix,
+            "users": args.users,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "upload_size": args.upload_size,
+            "upstream_latency_ms": args.upstream_latency_ms,
+            "upstream_jitter_ms": args.upstream_jitter_ms,
+            "upstream_error_rate": args.upstream_error_rate,
+            "database_profile": args.database_profile,
+            "worker": not args.no_worker,
+            "keep_quotas": args.keep_quotas
+        },
+        "workdir": workdir,
+        "levels": levels
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端压测")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="依次压测的并发数")
+    parser.add_argument("--duration", type=float, default=30.0, help="每个并发级别的统计时长(秒)")
+    parser.add_argument("--warmup", type=float, default=5.0, help="每个并发级别开始时不计入结果的预热时长(秒)")
+    parser.add_argument("--mix", default="", help="流量比例，如 login=1,list=4,upload=1,publish=1,status=3,ai=1")
+    parser.add_argument("--users", type=int, default=8, help="压测用户数")
+    parser.add_argument("--seed-videos", type=int, default=2, help="每个用户预先上传的视频数")
+    parser.add_argument("--upload-size", type=int, default=256 * 1024, help="上传视频的大小(字节)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单个请求的超时(秒)")
+    parser.add_argument("--upstream-latency-ms", type=float, default=50.0, help="模拟上游的固定延迟")
+    parser.add_argument("--upstream-jitter-ms", type=float, default=20.0, help="模拟上游的随机延迟上限")
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0, help="模拟上游返回503的比例")
+    parser.add_argument("--publish-processing-seconds", type=float, default=2.0, help="抖音处理发布所需时间")
+    parser.add_argument("--database-profile", default="development", help="DATABASE_PROFILE，production启用连接池和WAL")
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--no-worker", action="store_true", help="不启动celery worker，发布任务只排队不执行")
+    parser.add_argument("--keep-quotas", action="store_true", help="保留默认的按用户请求限额")
+    parser.add_argument("--output", help="结果JSON文件，默认输出到stdout")
+    args = parser.parse_args()
+
+    result = asyncio.run(benchmark(args))
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""压测流量：按权重混合登录、上传、列表、发布、状态查询和AI文案请求"""
+import asyncio
+import math
+import os
+import random
+import struct
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import httpx
+
+PASSWORD = "bench-password"
+
+# 默认流量比例
+DEFAULT_MIX = {"login": 1, "list": 4, "upload": 1, "publish": 1, "status": 3, "ai": 1}
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", len(payload) + 8, box_type) + payload
+
+
+def make_mp4(duration: float = 10.0, width: int = 720, height: int = 1280, payload_size: int = 256 * 1024) -> bytes:
+    """构造能通过上传校验的最小MP4：moov中只有解析需要的box，mdat为随机内容使每个文件哈希不同"""
+    timescale = 1000
+    mvhd = _box(b"mvhd", struct.pack(">B3xIIII", 0, 0, 0, timescale, int(duration * timescale)) + bytes(80))
+    tkhd = _box(b"tkhd", struct.pack(">B3x", 0) + bytes(72) + struct.pack(">II", width << 16, height << 16))
+    hdlr = _box(b"hdlr", struct.pack(">B3xI4s", 0, 0, b"vide") + bytes(12) + b"video\x00")
+    stsd = _box(b"stsd", struct.pack(">B3xI", 0, 1) + _box(b"avc1", bytes(78)))
+    trak = _box(b"trak", tkhd + _box(b"mdia", hdlr + _box(b"minf", _box(b"stbl", stsd))))
+    ftyp = _box(b"ftyp", b"isom" + struct.pack(">I", 512) + b"isomavc1")
+    return ftyp + _box(b"moov", mvhd + trak) + _box(b"mdat", os.urandom(payload_size))
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """最近秩百分位数"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float]) -> Dict:
+    values = sorted(latencies)
+    return {
+        "p50": _ms(percentile(values, 50)),
+        "p95": _ms(percentile(values, 95)),
+        "p99": _ms(percentile(values, 99)),
+        "max": _ms(values[-1] if values else None)
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 2) if seconds is not None else None
+
+
+@dataclass
+class BenchUser:
+    username: str
+    token: str = ""
+    video_ids: List[int] = field(default_factory=list)
+    publish_task_ids: List[int] = field(default_factory=list)
+
+
+@dataclass
+class OperationStats:
+    latencies: List[float] = field(default_factory=list)
+    ok: int = 0
+    rejected: int = 0  # 429/503：被准入控制或熔断拒绝
+    errors: int = 0
+
+    def record(self, latency: float, status: Optional[int]):
+        self.latencies.append(latency)
+        if status is not None and status < 400:
+            self.ok += 1
+        elif status in (429, 503):
+            self.rejected += 1
+        else:
+            self.errors += 1
+
+
+class Workload:
+    """对运行中的API执行压测流量"""
+
+    def __init__(self, client: httpx.AsyncClient, users: List[BenchUser], mix: Dict[str, int], upload_size: int):
+        self.client = client
+        self.users = users
+        self.operations = [name for name, weight in mix.items() if weight > 0]
+        self.weights = [mix[name] for name in self.operations]
+        self.upload_size = upload_size
+
+    def _auth(self, user: BenchUser) -> Dict:
+        return {"Authorization": f"Bearer {user.token}"}
+
+    async def login(self, user: BenchUser) -> httpx.Response:
+        response = await self.client.post("/auth/token", data={"username": user.username, "password": PASSWORD})
+        if response.status_code == 200:
+            user.token = response.json()["access_token"]
+        return response
+
+    async def list(self, user: BenchUser) -> httpx.Response:
+        return await self.client.get("/videos/", params={"limit": 20}, headers=self._auth(user))
+
+    async def upload(self, user: BenchUser) -> httpx.Response:
+        files = {"file": ("bench.mp4", make_mp4(payload_size=self.upload_size), "video/mp4")}
+        response = await self.client.post(
+            "/videos/upload", files=files, data={"title": f"压测视频 {uuid.uuid4().hex[:8]}"}, headers=self._auth(user)
+        )
+        if response.status_code == 200:
+            user.video_ids.append(response.json()["id"])
+        return response
+
+    async def publish(self, user: BenchUser) -> httpx.Response:
+        if not user.video_ids:
+            return await self.upload(user)
+        headers = {**self._auth(user), "Idempotency-Key": uuid.uuid4().hex}
+        response = await self.client.post(f"/douyin/publish/{random.choice(user.video_ids)}", headers=headers)
+        if response.status_code == 200:
+            user.publish_task_ids.append(response.json()["id"])
+        return response
+
+    async def status(self, user: BenchUser) -> httpx.Response:
+        if not user.publish_task_ids:
+            return await self.list(user)
+        task_id = random.choice(user.publish_task_ids[-20:])
+        return await self.client.get(f"/douyin/publish/tasks/{task_id}", headers=self._auth(user))
+
+    async def ai(self, user: BenchUser) -> httpx.Response:
+        # 每次内容不同，避免命中生成结果缓存
+        return await self.client.post(
+            "/ai/title", params={"content": f"压测视频内容 {uuid.uuid4().hex}"}, headers=self._auth(user)
+        )
+
+    async def run(self, concurrency: int, duration: float, warmup: float) -> Dict:
+        """以固定并发持续发送请求，丢弃预热阶段的数据"""
+        stats: Dict[str, OperationStats] = {name: OperationStats() for name in self.operations}
+        started = time.monotonic()
+        measure_from = started + warmup
+        stop_at = measure_from + duration
+
+        async def virtual_user():
+            while time.monotonic() < stop_at:
+                name = random.choices(self.operations, self.weights)[0]
+                user = random.choice(self.users)
+                request_started = time.monotonic()
+                try:
+                    status = (await getattr(self, name)(user)).status_code
+                except httpx.HTTPError:
+                    status = None
+                finished = time.monotonic()
+                if request_started >= measure_from and finished <= stop_at:
+                    stats[name].record(finished - request_started, status)
+
+        await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+
+        all_latencies = [latency for s in stats.values() for latency in s.latencies]
+        total = len(all_latencies)
+        return {
+            "concurrency": concurrency,
+            "duration": duration,
+            "requests": total,
+            "rps": round(total / duration, 2),
+            "ok": sum(s.ok for s in stats.values()),
+            "rejected": sum(s.rejected for s in stats.values()),
+            "errors": sum(s.errors for s in stats.values()),
+            "latency_ms": summarize(all_latencies),
+            "operations": {
+                name: {
+                    "requests": len(s.latencies),
+                    "rps": round(len(s.latencies) / duration, 2),
+                    "ok": s.ok,
+                    "rejected": s.rejected,
+                    "errors": s.errors,
+                    "latency_ms": summarize(s.latencies)
+                } for name, s in stats.items()
+            }
+        }
+
+
+async def prepare_users(client: httpx.AsyncClient, count: int, videos_per_user: int, upload_size: int) -> List[BenchUser]:
+    """注册用户、登录、绑定抖音账号(由模拟服务返回令牌)并预先上传视频，不计入结果"""
+    prefix = f"bench{uuid.uuid4().hex[:6]}"
+    users = [BenchUser(username=f"{prefix}_{i}") for i in range(count)]
+    workload = Workload(client, users, DEFAULT_MIX, upload_size)
+    for user in users:
+        response = await client.post("/auth/register", json={
+            "username": user.username, "email": f"{user.username}@bench.local", "password": PASSWORD
+        })
+        response.raise_for_status()
+        (await workload.login(user)).raise_for_status()
+        response = await client.get("/auth/douyin/callback", params={"code": uuid.uuid4().hex}, headers=workload._auth(user))
+        response.raise_for_status()
+        for _ in range(videos_per_user):
+            (await workload.upload(user)).raise_for_status()
+    return users
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    """解析形如 login=1,list=4,upload=1 的流量比例"""
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, value.split(",")):
+        name, _, weight = part.partition("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"未知的操作: {name}，可选 {', '.join(DEFAULT_MIX)}")
+        mix[name] = int(weight)
+    return mix
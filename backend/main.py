@@ -1,16 +1,48 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.core.database import create_tables
+from app.core.http_client import init_http_clients, close_http_clients
+from app.core.redis import close_redis
+from app.core.upload_limit import UploadSizeLimitMiddleware
+from app.core.admission import AdmissionControlMiddleware
+from app.core.metrics import CONTENT_TYPE_LATEST, MetricsMiddleware, setup_metrics, render_metrics
+from app.core.profiling import ProfilingMiddleware
+from app.services.image_pipeline import shutdown_image_pool
 from app.api import api_router
+from starlette.concurrency import run_in_threadpool
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时执行数据库迁移并创建共享HTTP客户端，关闭时释放连接"""
+    create_tables()
+    init_http_clients()
+    yield
+    await close_http_clients()
+    await close_redis()
+    shutdown_image_pool()
+
 
 # 创建FastAPI应用
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
+# 上传大小限制（在读取请求体之前检查Content-Length）
+app.add_middleware(UploadSizeLimitMiddleware)
+
+# 按需对单个请求做性能分析（未开启时不注册）
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# 按用户限额、按路由组限并发，过载时返回429/503
+app.add_middleware(AdmissionControlMiddleware)
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -18,8 +50,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After"],
 )
 
+# 请求耗时统计（最外层，包含被准入控制拒绝的请求）
+if settings.METRICS_ENABLED:
+    setup_metrics()
+    app.add_middleware(MetricsMiddleware)
+
 # 根路径路由
 @app.get("/")
 async def root():
@@ -34,14 +72,17 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus指标"""
+    if not settings.METRICS_ENABLED:
+        return Response(status_code=404)
+    return Response(await run_in_threadpool(render_metrics), media_type=CONTENT_TYPE_LATEST)
+
 # 包含API路由
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
-# 启动时创建数据表
-@app.on_event("startup")
-async def startup_event():
-    create_tables()
-
 
 if __name__ == "__main__":
     import uvicorn
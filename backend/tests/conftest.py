@@ -0,0 +1,215 @@
+import os
+import shutil
+import tempfile
+
+# 在导入应用模块前指定临时数据库和上传目录，测试不会读写开发环境的数据
+_TMP_DIR = tempfile.mkdtemp(prefix="douyin-manager-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}",
+    "DATABASE_PROFILE": "development",
+    "UPLOAD_DIR": os.path.join(_TMP_DIR, "uploads"),
+    "ADMISSION_ENABLED": "false",
+    "METRICS_ENABLED": "false",
+    "PROFILING_ENABLED": "false",
+    "OPENAI_API_KEY": "",
+    "STABILITY_API_KEY": ""
+})
+
+import asyncio
+import struct
+import fakeredis
+import fakeredis.aioredis
+import httpx
+import pytest
+from sqlalchemy import event
+from app.core import outbound, redis as redis_module
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, Base, async_engine, engine
+from app.models.user import User
+from app.services.user_cache import _user_cache
+
+
+class FakeClock:
+    """替换模块中的time，只提供monotonic，由测试手动推进"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    """只替换被测模块的time，不影响事件循环使用的时钟"""
+    def install(module) -> FakeClock:
+        clock = FakeClock()
+        monkeypatch.setattr(module, "time", clock)
+        return clock
+    return install
+
+
+def _box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", len(payload) + 8, box_type) + payload
+
+
+def _track(handler: bytes, codec: bytes, width: int = 0, height: int = 0) -> bytes:
+    tkhd = _box(b"tkhd", struct.pack(">B3x", 0) + bytes(72) + struct.pack(">II", width << 16, height << 16))
+    hdlr = _box(b"hdlr", struct.pack(">B3xI4s", 0, 0, handler) + bytes(12) + b"\x00")
+    stsd = _box(b"stsd", struct.pack(">B3xI", 0, 1) + _box(codec, bytes(78)))
+    return _box(b"trak", tkhd + _box(b"mdia", hdlr + _box(b"minf", _box(b"stbl", stsd))))
+
+
+def build_mp4(
+    duration: float = 10.0,
+    width: int = 720,
+    height: int = 1280,
+    video_codec: bytes = b"avc1",
+    audio_codec: bytes = None,
+    payload: bytes = b"\x00" * 1024
+) -> bytes:
+    """构造只含解析所需box的最小MP4；payload作为mdat内容，不同内容得到不同的文件哈希"""
+    timescale = 1000
+    mvhd = _box(b"mvhd", struct.pack(">B3xIIII", 0, 0, 0, timescale, int(duration * timescale)) + bytes(80))
+    tracks = _track(b"vide", video_codec, width, height) if video_codec else b""
+    if audio_codec:
+        tracks += _track(b"soun", audio_codec)
+    ftyp = _box(b"ftyp", b"isom" + struct.pack(">I", 512) + b"isomavc1")
+    return ftyp + _box(b"moov", mvhd + tracks) + _box(b"mdat", payload)
+
+
+@pytest.fixture
+def make_mp4():
+    return build_mp4
+
+
+@pytest.fixture(autouse=True)
+def fake_redis(monkeypatch):
+    """每个测试使用独立的内存Redis；限流脚本绑定了Redis客户端，同时重置各上游的调用策略"""
+    server = fakeredis.FakeServer()
+    client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(redis_module, "_async_client", client)
+    monkeypatch.setattr(redis_module, "_sync_client", fakeredis.FakeRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(outbound, "_upstreams", {})
+    _user_cache.local.clear()
+    return client
+
+
+@pytest.fixture
+def upload_dir():
+    """每个测试使用空的上传目录"""
+    shutil.rmtree(settings.UPLOAD_DIR, ignore_errors=True)
+    os.makedirs(settings.UPLOAD_DIR)
+    return settings.UPLOAD_DIR
+
+
+@pytest.fixture
+async def db(upload_dir):
+    """重建表结构并提供一个异步会话"""
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+async def client(db):
+    from main import app
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as http_client:
+        yield http_client
+
+
+_password_hash = None
+
+
+@pytest.fixture
+def make_user(db):
+    """创建用户，返回(用户, 认证请求头)"""
+    from app.api.auth import create_access_token, get_password_hash
+
+    async def make(username: str = "alice", **values):
+        global _password_hash
+        # bcrypt较慢，所有测试用户共用同一个密码哈希
+        _password_hash = _password_hash or get_password_hash("secret")
+        user = User(username=username, email=f"{username}@example.com", hashed_password=_password_hash, **values)
+        db.add(user)
+        await db.commit()
+        headers = {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+        return user, headers
+    return make
+
+
+@pytest.fixture
+def db_connections():
+    """统计异步引擎当前借出的数据库连接数"""
+    counter = {"open": 0}
+
+    def checkout(*args):
+        counter["open"] += 1
+
+    def checkin(*args):
+        counter["open"] -= 1
+
+    event.listen(async_engine.sync_engine, "checkout", checkout)
+    event.listen(async_engine.sync_engine, "checkin", checkin)
+    yield counter
+    event.remove(async_engine.sync_engine, "checkout", checkout)
+    event.remove(async_engine.sync_engine, "checkin", checkin)
+
+
+class _Usage(dict):
+    def model_dump(self):
+        return dict(self)
+
+
+class _Namespace:
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+
+class FakeOpenAI:
+    """模拟openai.AsyncOpenAI的chat.completions.create，记录每次调用的prompt
+
+    reply根据prompt生成回复；设置gate后调用会等待gate被set，用于构造并发的相同请求。
+    """
+
+    def __init__(self):
+        self.prompts = []
+        self.reply = lambda prompt: f"1. 标题：{prompt[-8:]}\n描述：内容 话题标签：#测试"
+        self.gate = None
+        self.on_call = None
+        self.chat = _Namespace(completions=_Namespace(create=self.create))
+
+    async def create(self, model, messages, max_tokens, temperature, stream=False, extra_body=None):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        if self.on_call:
+            self.on_call(prompt)
+        if self.gate is not None:
+            await self.gate.wait()
+        text = self.reply(prompt)
+        usage = _Usage(prompt_tokens=10, completion_tokens=len(text), total_tokens=10 + len(text))
+        if not stream:
+            return _Namespace(choices=[_Namespace(message=_Namespace(content=text))], usage=usage)
+
+        async def chunks():
+            for i in range(0, len(text), 4):
+                yield _Namespace(choices=[_Namespace(delta=_Namespace(content=text[i:i + 4]))], usage=None)
+                await asyncio.sleep(0)
+            yield _Namespace(choices=[], usage=usage)
+        return chunks()
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """让AI接口使用新的AIService(空缓存)和模拟的OpenAI客户端"""
+    from app.api import ai
+    from app.services.ai_service import AIService
+
+    service = AIService()
+    service.openai_client = FakeOpenAI()
+    monkeypatch.setattr(ai, "ai_service", service)
+    return service.openai_client
@@ -0,0 +1,149 @@
+import asyncio
+import httpx
+import pytest
+from app.core import admission
+from app.core.admission import AdmissionControlMiddleware, SlidingWindowLimiter, client_ip
+from app.core.config import settings
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock(admission)
+
+
+def test_sliding_window_allows_up_to_limit(clock):
+    limiter = SlidingWindowLimiter(window=60)
+    assert [limiter._hit_local("user:a", 3) for _ in range(3)] == [0, 0, 0]
+    clock.advance(10)
+    assert limiter._hit_local("user:a", 3) == pytest.approx(50)
+
+
+def test_sliding_window_keys_are_independent(clock):
+    limiter = SlidingWindowLimiter(window=60)
+    assert limiter._hit_local("user:a", 1) == 0
+    assert limiter._hit_local("user:a", 1) > 0
+    assert limiter._hit_local("user:b", 1) == 0
+
+
+def test_sliding_window_slides(clock):
+    limiter = SlidingWindowLimiter(window=60)
+    limiter._hit_local("user:a", 2)
+    clock.advance(30)
+    limiter._hit_local("user:a", 2)
+    clock.advance(30)
+    # 第一条记录刚好滑出窗口
+    assert limiter._hit_local("user:a", 2) == 0
+    assert limiter._hit_local("user:a", 2) == pytest.approx(30)
+
+
+def test_sliding_window_rejections_are_not_counted(clock):
+    limiter = SlidingWindowLimiter(window=60)
+    limiter._hit_local("user:a", 1)
+    for _ in range(5):
+        clock.advance(10)
+        assert limiter._hit_local("user:a", 1) > 0
+    clock.advance(10)
+    assert limiter._hit_local("user:a", 1) == 0
+
+
+@pytest.fixture
+def trusted_proxies(monkeypatch):
+    def configure(proxies):
+        monkeypatch.setattr(settings, "ADMISSION_TRUSTED_PROXIES", proxies)
+        admission._trusted_networks.cache_clear()
+    yield configure
+    admission._trusted_networks.cache_clear()
+
+
+def make_scope(peer: str, headers: dict = None) -> dict:
+    return {
+        "type": "http",
+        "client": (peer, 50000),
+        "headers": [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+    }
+
+
+def test_client_ip_ignores_headers_from_untrusted_peer(trusted_proxies):
+    trusted_proxies(["127.0.0.1"])
+    scope = make_scope("203.0.113.7", {"X-Forwarded-For": "198.51.100.1", "X-Real-IP": "198.51.100.1"})
+    assert client_ip(scope) == "203.0.113.7"
+
+
+def test_client_ip_uses_right_most_untrusted_hop(trusted_proxies):
+    trusted_proxies(["127.0.0.1", "10.0.0.0/8"])
+    scope = make_scope("127.0.0.1", {"X-Forwarded-For": "1.2.3.4, 198.51.100.1, 10.0.0.5"})
+    assert client_ip(scope) == "198.51.100.1"
+
+
+def test_client_ip_falls_back_to_real_ip(trusted_proxies):
+    trusted_proxies(["172.16.0.0/12"])
+    assert client_ip(make_scope("172.18.0.3", {"X-Real-IP": "198.51.100.1"})) == "198.51.100.1"
+    assert client_ip(make_scope("172.18.0.3")) == "172.18.0.3"
+
+
+def test_client_key_uses_forwarded_ip_for_anonymous_requests(trusted_proxies):
+    trusted_proxies(["127.0.0.1"])
+    scope = make_scope("127.0.0.1", {"X-Forwarded-For": "198.51.100.1", "Authorization": "Bearer invalid"})
+    assert AdmissionControlMiddleware.client_key(scope) == "ip:198.51.100.1"
+
+
+@pytest.fixture
+def gated_app(monkeypatch):
+    """用准入中间件包装的最小应用；设置gate后请求在处理中等待，用于构造并发"""
+    monkeypatch.setattr(settings, "ADMISSION_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_DEFAULT", 2)
+    monkeypatch.setattr(settings, "RATE_LIMIT_AI", 100)
+    monkeypatch.setattr(settings, "ADMISSION_AI_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "ADMISSION_MAX_QUEUE", 1)
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TIMEOUT", 0.05)
+    state = {"gate": None, "entered": asyncio.Event()}
+
+    async def app(scope, receive, send):
+        state["entered"].set()
+        if state["gate"] is not None:
+            await state["gate"].wait()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    middleware = AdmissionControlMiddleware(app)
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://test")
+    return client, state
+
+
+def auth(username: str) -> dict:
+    from app.api.auth import create_access_token
+    return {"Authorization": f"Bearer {create_access_token({'sub': username})}"}
+
+
+async def test_quota_returns_429_with_retry_after(gated_app):
+    client, _ = gated_app
+    statuses = [(await client.get("/api/v1/videos/", headers=auth("alice"))).status_code for _ in range(2)]
+    assert statuses == [200, 200]
+    response = await client.get("/api/v1/videos/", headers=auth("alice"))
+    assert response.status_code == 429
+    assert 1 <= int(response.headers["Retry-After"]) <= settings.RATE_LIMIT_WINDOW
+    # 其他用户和API之外的路径不受影响
+    assert (await client.get("/api/v1/videos/", headers=auth("bob"))).status_code == 200
+    assert (await client.get("/health")).status_code == 200
+
+
+async def test_quota_shared_through_redis(gated_app, fake_redis):
+    client, _ = gated_app
+    for _ in range(2):
+        await client.get("/api/v1/videos/", headers=auth("alice"))
+    assert await fake_redis.zcard("quota:default:user:alice") == 2
+
+
+async def test_route_group_sheds_load_when_full(gated_app):
+    client, state = gated_app
+    state["gate"] = asyncio.Event()
+    first = asyncio.create_task(client.post("/api/v1/ai/generate/text", headers=auth("alice")))
+    await asyncio.wait_for(state["entered"].wait(), 1)
+    # 并发已满，排队超时后返回503
+    response = await client.post("/api/v1/ai/generate/text", headers=auth("bob"))
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    state["gate"].set()
+    assert (await first).status_code == 200
+    # 并发名额释放后可以继续处理
+    assert (await client.post("/api/v1/ai/generate/text", headers=auth("bob"))).status_code == 200
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import pytest
+from sqlalchemy import select
+from app.models.ai_generation import AIGeneration
+from app.models.video import Video
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+async def add_video(db, user, **values):
+    video = Video(user_id=user.id, **values)
+    db.add(video)
+    await db.commit()
+    return video
+
+
+async def test_batch_copy_streams_results_and_applies(client, db, make_user, fake_openai):
+    user, headers = await make_user()
+    other, _ = await make_user("bob")
+    video = await add_video(db, user, title="旧标题", description="猫咪视频")
+    foreign = await add_video(db, other, title="别人的视频", description="内容")
+    response = await client.post("/api/v1/ai/batch", headers=headers, json={
+        "items": [{"video_id": video.id}, {"video_id": foreign.id}, {"content": "独立内容"}],
+        "kinds": ["title"],
+        "apply": True
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = sorted(ndjson(response), key=lambda line: line["index"])
+    assert [line["success"] for line in lines] == [True, False, True]
+    assert lines[1]["error"] == "视频不存在"
+
+    assert (await db.get(Video, video.id, populate_existing=True)).title.startswith("标题")
+    assert (await db.get(Video, foreign.id, populate_existing=True)).title == "别人的视频"
+    generations = (await db.execute(select(AIGeneration))).scalars().all()
+    assert sorted(g.video_id or 0 for g in generations) == [0, video.id]
+
+
+async def test_batch_copy_releases_request_session(client, db, make_user, fake_openai, db_connections):
+    user, headers = await make_user()
+    video = await add_video(db, user, title="标题", description="内容")
+    seen = []
+    fake_openai.on_call = lambda prompt: seen.append(db_connections["open"])
+    response = await client.post("/api/v1/ai/batch", headers=headers, json={
+        "items": [{"video_id": video.id}], "kinds": ["title", "description"]
+    })
+    assert len(ndjson(response)) == 2
+    # 生成期间没有借出的数据库连接：请求会话已关闭，批量结果会话尚未写入
+    assert seen == [0, 0]
+
+
+async def test_batch_copy_requires_items(client, make_user, fake_openai):
+    _, headers = await make_user()
+    response = await client.post("/api/v1/ai/batch", headers=headers, json={"items": []})
+    assert response.status_code == 422
+
+
+def sse_events(response):
+    """解析SSE响应为(事件名, 数据)列表"""
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+async def test_text_stream_returns_deltas_and_saves_generation(client, db, make_user, fake_openai):
+    _, headers = await make_user()
+    response = await client.post("/api/v1/ai/text", params={"prompt": "写一段文案", "stream": "true"}, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = sse_events(response)
+    assert {name for name, _ in events[:-1]} == {"delta"}
+    name, done = events[-1]
+    assert name == "done" and done["cached"] is False
+    assert "".join(data["content"] for _, data in events[:-1]) == done["result"]
+    generation = (await db.execute(select(AIGeneration))).scalars().one()
+    assert generation.result == done["result"]
+    assert generation.cache_key == done["cache_key"]
+
+
+async def test_text_stream_holds_no_connection(client, make_user, fake_openai, db_connections):
+    _, headers = await make_user()
+    seen = []
+    fake_openai.on_call = lambda prompt: seen.append(db_connections["open"])
+    for stream in ("true", "false"):
+        response = await client.post("/api/v1/ai/title", params={"content": f"内容{stream}", "stream": stream}, headers=headers)
+        assert response.status_code == 200
+    assert seen == [0, 0]
+
+
+async def test_text_stream_collapses_concurrent_identical_requests(client, make_user, fake_openai):
+    _, headers = await make_user()
+    fake_openai.gate = asyncio.Event()
+    params = {"title": "标题", "content": "内容"}
+    streaming = asyncio.ensure_future(client.post("/api/v1/ai/description", params={**params, "stream": "true"}, headers=headers))
+    while not fake_openai.prompts:
+        await asyncio.sleep(0.01)
+    waiting = asyncio.ensure_future(client.post("/api/v1/ai/description", params=params, headers=headers))
+    await asyncio.sleep(0.05)
+    fake_openai.gate.set()
+    streamed, waited = await streaming, await waiting
+    assert len(fake_openai.prompts) == 1
+    assert sse_events(streamed)[-1][1]["result"] == waited.json()["result"]
+    assert waited.json()["cached"] is True
+
+
+async def test_text_stream_served_from_cache(client, make_user, fake_openai):
+    _, headers = await make_user()
+    params = {"prompt": "相同的提示", "stream": "true"}
+    first = await client.post("/api/v1/ai/text", params=params, headers=headers)
+    second = await client.post("/api/v1/ai/text", params=params, headers=headers)
+    assert len(fake_openai.prompts) == 1
+    assert [name for name, _ in sse_events(second)] == ["delta", "done"]
+    assert sse_events(second)[-1][1]["cached"] is True
+    assert sse_events(second)[-1][1]["result"] == sse_events(first)[-1][1]["result"]
+
+
+async def test_interrupted_stream_releases_waiters(fake_openai):
+    from app.api.ai import ai_service
+    stream = ai_service.stream_text("会被中断的请求")
+    assert (await stream.__anext__())["type"] == "delta"
+    waiter = asyncio.ensure_future(ai_service.generate_text("会被中断的请求"))
+    await asyncio.sleep(0.05)
+    await stream.aclose()
+    result = await waiter
+    assert result["success"] is False and result["busy"] is True
+    assert len(fake_openai.prompts) == 1
+    assert ai_service._inflight == {}
+
+
+async def test_text_without_api_key(client, make_user, fake_openai):
+    from app.api.ai import ai_service
+    ai_service.openai_client = None
+    _, headers = await make_user()
+    response = await client.post("/api/v1/ai/text", params={"prompt": "x"}, headers=headers)
+    assert response.status_code == 400
+    events = sse_events(await client.post("/api/v1/ai/text", params={"prompt": "x", "stream": "true"}, headers=headers))
+    assert events == [("error", {"success": False, "error": "OpenAI API密钥未配置"})]
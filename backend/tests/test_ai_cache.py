@@ -0,0 +1,71 @@
+import asyncio
+from sqlalchemy import select
+from app.models.ai_generation import AIGeneration
+from app.services.ai_service import AIService, make_cache_key
+
+
+async def generations(db):
+    result = await db.execute(select(AIGeneration).order_by(AIGeneration.id).execution_options(populate_existing=True))
+    return result.scalars().all()
+
+
+async def test_repeated_request_served_from_cache_and_recorded(client, db, make_user, fake_openai):
+    user, headers = await make_user()
+    first = await client.post("/api/v1/ai/title", params={"content": "猫咪"}, headers=headers)
+    second = await client.post("/api/v1/ai/title", params={"content": "猫咪"}, headers=headers)
+    assert (first.json()["cached"], second.json()["cached"]) == (False, True)
+    assert second.json()["result"] == first.json()["result"]
+    assert len(fake_openai.prompts) == 1
+    # 命中缓存也保存生成记录，用量标记为缓存结果
+    rows = await generations(db)
+    assert [row.generation_metadata["cached"] for row in rows] == [False, True]
+    assert {row.cache_key for row in rows} == {first.json()["cache_key"]}
+    assert all(row.user_id == user.id for row in rows)
+
+
+async def test_cache_key_depends_on_template_and_input(client, make_user, fake_openai):
+    _, headers = await make_user()
+    await client.post("/api/v1/ai/title", params={"content": "猫咪"}, headers=headers)
+    await client.post("/api/v1/ai/title", params={"content": "小狗"}, headers=headers)
+    await client.post("/api/v1/ai/description", params={"title": "猫咪", "content": "猫咪"}, headers=headers)
+    assert len(fake_openai.prompts) == 3
+    assert make_cache_key("a", "p", "m", 1, 0.7) != make_cache_key("b", "p", "m", 1, 0.7)
+    assert make_cache_key("a", "p", "m", 1, 0.7) != make_cache_key("a", "p", "m", 2, 0.7)
+
+
+async def test_concurrent_identical_requests_call_api_once(fake_openai):
+    from app.api import ai
+    fake_openai.gate = asyncio.Event()
+    calls = [asyncio.create_task(ai.ai_service.generate_text("同一个问题")) for _ in range(5)]
+    await asyncio.sleep(0.01)
+    fake_openai.gate.set()
+    results = await asyncio.gather(*calls)
+    assert len(fake_openai.prompts) == 1
+    assert len({result["result"] for result in results}) == 1
+    assert sorted(result["cached"] for result in results) == [False] + [True] * 4
+    assert ai.ai_service._inflight == {}
+
+
+async def test_failed_generation_not_cached(client, db, make_user, fake_openai):
+    _, headers = await make_user()
+
+    def fail_once(prompt):
+        fake_openai.reply = lambda prompt: "1. 标题"
+        raise RuntimeError("upstream error")
+    fake_openai.reply = fail_once
+    assert (await client.post("/api/v1/ai/text", params={"prompt": "p"}, headers=headers)).status_code == 400
+    assert await generations(db) == []
+    response = await client.post("/api/v1/ai/text", params={"prompt": "p"}, headers=headers)
+    assert response.status_code == 200 and response.json()["cached"] is False
+    assert len(fake_openai.prompts) == 2
+
+
+async def test_cache_shared_between_processes_through_redis(fake_openai):
+    from app.api import ai
+    first = await ai.ai_service.generate_text("共享")
+    # 另一个进程中的服务：进程内缓存为空，从Redis读取
+    other = AIService()
+    other.openai_client = fake_openai
+    second = await other.generate_text("共享")
+    assert second["cached"] is True and second["result"] == first["result"]
+    assert len(fake_openai.prompts) == 1
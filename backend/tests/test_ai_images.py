@@ -0,0 +1,94 @@
+import base64
+import io
+import os
+import httpx
+import pytest
+from PIL import Image
+from app.api import ai
+from app.core.config import settings
+from app.services import image_pipeline
+from app.services.ai_service import AIService
+from app.services.image_pipeline import process_image, shutdown_image_pool
+
+
+@pytest.fixture(autouse=True)
+def image_pool():
+    yield
+    shutdown_image_pool()
+
+
+def png_bytes(size=(800, 600), color=(200, 30, 30)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+async def test_process_image_writes_original_and_thumbnails(upload_dir):
+    image = await process_image(png_bytes())
+    assert os.path.dirname(image["file_path"]).endswith(image["content_hash"])
+    with Image.open(image["file_path"]) as original:
+        assert (original.format, original.size) == ("PNG", (800, 600))
+    for size in settings.AI_IMAGE_SIZES:
+        with Image.open(image["derivatives"][str(size)]) as thumbnail:
+            assert thumbnail.format == "WEBP"
+            assert max(thumbnail.size) == size
+
+
+async def test_processed_image_is_reused(upload_dir, monkeypatch):
+    data = png_bytes()
+    first = await process_image(data)
+
+    def fail(*args):
+        raise AssertionError("不应重新处理")
+    monkeypatch.setattr(image_pipeline, "_get_executor", fail)
+    assert await process_image(data) == first
+
+
+@pytest.fixture
+def stability(monkeypatch):
+    """让AI接口使用返回固定图片的Stability模拟接口"""
+    data = png_bytes()
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"artifacts": [{"base64": base64.b64encode(data).decode()}]})
+    service = AIService(http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    service.stability_api_key = "key"
+    monkeypatch.setattr(ai, "ai_service", service)
+    return requests
+
+
+async def test_generate_image_returns_signed_urls(client, db, make_user, stability, upload_dir):
+    user, headers = await make_user()
+    response = await client.post("/api/v1/ai/image", params={"prompt": "cat"}, headers=headers)
+    assert response.status_code == 200
+    body = response.json()
+    assert set(body["thumbnails"]) == {str(size) for size in settings.AI_IMAGE_SIZES}
+    assert stability[0].headers["Authorization"] == "Bearer key"
+    
+    original = await client.get(body["url"])
+    assert original.status_code == 200
+    assert original.headers["Cache-Control"] == "private, max-age=31536000, immutable"
+    with Image.open(io.BytesIO(original.content)) as image:
+        assert image.size == (800, 600)
+    thumbnail = await client.get(body["thumbnails"]["256"])
+    with Image.open(io.BytesIO(thumbnail.content)) as image:
+        assert max(image.size) == 256
+
+
+async def test_image_visible_only_to_users_who_generated_it(client, db, make_user, stability, upload_dir):
+    _, headers = await make_user("alice")
+    _, other_headers = await make_user("bob")
+    body = (await client.post("/api/v1/ai/image", params={"prompt": "cat"}, headers=headers)).json()
+    path = f"/api/v1/ai/images/{body['content_hash']}"
+    assert (await client.get(f"{path}/original", headers=headers)).status_code == 200
+    assert (await client.get(f"{path}/original", headers=other_headers)).status_code == 404
+    assert (await client.get(f"{path}/999", headers=headers)).status_code == 404
+    assert (await client.get("/api/v1/ai/images/not-a-hash/original", headers=headers)).status_code == 422
+    
+    # 生成过相同图片的其他用户也可以访问
+    other = await client.post("/api/v1/ai/image", params={"prompt": "cat"}, headers=other_headers)
+    assert other.json()["content_hash"] == body["content_hash"]
+    assert (await client.get(f"{path}/original", headers=other_headers)).status_code == 200
+    assert len(os.listdir(os.path.dirname(body["file_path"]))) == 1 + len(settings.AI_IMAGE_SIZES)
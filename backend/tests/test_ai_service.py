@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from app.api import ai
+from app.services.ai_service import AIServiceBusy, ProviderLimiter
+
+
+async def test_limiter_bounds_concurrency_and_queue():
+    limiter = ProviderLimiter("test", concurrency=2, max_queue=1)
+    release = asyncio.Event()
+    active = []
+
+    async def call():
+        async with limiter.slot():
+            active.append(1)
+            await release.wait()
+
+    running = [asyncio.create_task(call()) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert len(active) == 2 and limiter.waiting == 1
+    # 并发和排队都已满，新的请求立即被拒绝
+    with pytest.raises(AIServiceBusy):
+        async with limiter.slot():
+            pass
+    release.set()
+    await asyncio.gather(*running)
+    assert len(active) == 3 and limiter.waiting == 0
+
+
+async def test_limiter_releases_slot_on_error():
+    limiter = ProviderLimiter("test", concurrency=1, max_queue=0)
+    with pytest.raises(RuntimeError):
+        async with limiter.slot():
+            raise RuntimeError("boom")
+    async with limiter.slot():
+        pass
+
+
+@pytest.fixture
+def single_slot(fake_openai):
+    ai.ai_service.openai_limiter = ProviderLimiter("OpenAI", concurrency=1, max_queue=0)
+    fake_openai.gate = asyncio.Event()
+    return fake_openai
+
+
+async def test_busy_provider_returns_503(client, make_user, single_slot):
+    _, headers = await make_user()
+    first = asyncio.create_task(client.post("/api/v1/ai/text", params={"prompt": "first"}, headers=headers))
+    while not single_slot.prompts:
+        await asyncio.sleep(0.01)
+    response = await client.post("/api/v1/ai/text", params={"prompt": "second"}, headers=headers)
+    assert response.status_code == 503
+    single_slot.gate.set()
+    assert (await first).status_code == 200
+    assert single_slot.prompts == ["first"]
+
+
+async def test_calls_beyond_concurrency_wait_for_a_slot(fake_openai):
+    ai.ai_service.openai_limiter = ProviderLimiter("OpenAI", concurrency=2, max_queue=8)
+    create = fake_openai.create
+    active = {"now": 0, "max": 0}
+
+    async def tracked_create(**kwargs):
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        try:
+            await asyncio.sleep(0.01)
+            return await create(**kwargs)
+        finally:
+            active["now"] -= 1
+    fake_openai.chat.completions.create = tracked_create
+    results = await asyncio.gather(*(ai.ai_service.generate_text(f"prompt {i}") for i in range(5)))
+    assert all(result["success"] for result in results)
+    assert active["max"] == 2 and len(fake_openai.prompts) == 5
@@ -0,0 +1,30 @@
+import asyncio
+import inspect
+from fastapi.routing import APIRoute
+from app.core.database import get_db
+from app.models.video import Video
+
+
+def dependency_calls(dependant):
+    for sub in dependant.dependencies:
+        yield sub.call
+        yield from dependency_calls(sub)
+
+
+def test_api_handlers_are_async_and_use_async_sessions():
+    from main import app
+    routes = [route for route in app.routes if isinstance(route, APIRoute)]
+    assert routes
+    for route in routes:
+        # 同步处理函数会在线程池中运行，同步会话会在事件循环中阻塞
+        assert inspect.iscoroutinefunction(route.endpoint), route.path
+        assert get_db not in set(dependency_calls(route.dependant)), route.path
+
+
+async def test_concurrent_requests_share_the_event_loop(client, db, make_user):
+    user, headers = await make_user()
+    db.add_all(Video(user_id=user.id, title=f"v{i}") for i in range(3))
+    await db.commit()
+    responses = await asyncio.gather(*(client.get("/api/v1/videos/", headers=headers) for _ in range(20)))
+    assert {response.status_code for response in responses} == {200}
+    assert {len(response.json()) for response in responses} == {3}
@@ -0,0 +1,82 @@
+import httpx
+import pytest
+from sqlalchemy import event
+from app.core import http_client
+from app.core.config import settings
+from app.core.database import async_engine
+
+
+@pytest.fixture
+def user_queries():
+    """统计查询users表的SQL语句数"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM users" in statement:
+            statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+
+async def register(client, username="alice", email="alice@example.com", password="secret"):
+    return await client.post("/api/v1/auth/register", json={"username": username, "email": email, "password": password})
+
+
+async def login(client, username="alice", password="secret"):
+    return await client.post("/api/v1/auth/token", data={"username": username, "password": password})
+
+
+async def test_register_login_and_me(client):
+    response = await register(client)
+    assert response.status_code == 200
+    assert response.json()["username"] == "alice" and "hashed_password" not in response.json()
+    token = (await login(client)).json()["access_token"]
+    me = await client.get("/api/v1/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert me.json()["email"] == "alice@example.com"
+
+
+async def test_register_rejects_duplicates(client):
+    await register(client)
+    assert (await register(client, email="other@example.com")).json()["detail"] == "用户名已存在"
+    assert (await register(client, username="bob")).json()["detail"] == "邮箱已存在"
+
+
+async def test_login_rejects_wrong_password(client):
+    await register(client)
+    assert (await login(client, password="wrong")).status_code == 401
+    assert (await login(client, username="nobody")).status_code == 401
+
+
+async def test_authenticated_requests_use_cached_user(client, make_user, user_queries, fake_redis):
+    _, headers = await make_user(douyin_access_token="secret-token")
+    user_queries.clear()
+    for _ in range(3):
+        assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 200
+    # 只有第一次请求查询数据库
+    assert len(user_queries) == 1
+    # 缓存中不保存密码哈希和抖音令牌
+    cached = [await fake_redis.get(key) async for key in fake_redis.scan_iter("*alice*")]
+    assert cached and all("secret-token" not in value and "$2b$" not in value for value in cached)
+
+
+async def test_invalid_or_inactive_user_rejected(client, make_user):
+    assert (await client.get("/api/v1/auth/me", headers={"Authorization": "Bearer invalid"})).status_code == 401
+    _, headers = await make_user(is_active=False)
+    assert (await client.get("/api/v1/auth/me", headers=headers)).status_code == 401
+
+
+async def test_douyin_callback_invalidates_cached_user(client, make_user, monkeypatch):
+    _, headers = await make_user()
+    assert (await client.get("/api/v1/auth/me", headers=headers)).json()["douyin_user_id"] is None
+
+    def douyin(request):
+        if request.url.path == "/oauth/access_token/":
+            return httpx.Response(200, json={"data": {"access_token": "a", "refresh_token": "r", "expires_in": 7200}})
+        return httpx.Response(200, json={"data": {"open_id": "open-id"}})
+    monkeypatch.setattr(settings, "DOUYIN_API_BASE_URL", "https://douyin.test")
+    monkeypatch.setitem(http_client._clients, "douyin", httpx.AsyncClient(transport=httpx.MockTransport(douyin)))
+    response = await client.get("/api/v1/auth/douyin/callback", params={"code": "c"}, headers=headers)
+    assert response.status_code == 200
+    assert (await client.get("/api/v1/auth/me", headers=headers)).json()["douyin_user_id"] == "open-id"
@@ -0,0 +1,29 @@
+from app.services import celery as celery_tasks
+
+
+def test_poll_task_tolerates_expired_lock(monkeypatch, fake_redis):
+    polled = []
+
+    async def poll_due(self, db):
+        # 模拟耗时超过锁有效期：锁在轮询期间过期并被删除
+        celery_tasks.get_sync_redis().delete("lock:publish.poll_status")
+        polled.append(True)
+        return 0
+
+    monkeypatch.setattr(celery_tasks.PublishStatusPoller, "poll_due", poll_due)
+    celery_tasks.poll_publish_status_task.run()
+    assert polled == [True]
+
+
+def test_poll_task_skips_when_locked(monkeypatch, fake_redis):
+    polled = []
+
+    async def poll_due(self, db):
+        polled.append(True)
+
+    monkeypatch.setattr(celery_tasks.PublishStatusPoller, "poll_due", poll_due)
+    lock = celery_tasks.get_sync_redis().lock("lock:publish.poll_status", timeout=60)
+    assert lock.acquire(blocking=False)
+    celery_tasks.poll_publish_status_task.run()
+    assert polled == []
+    lock.release()
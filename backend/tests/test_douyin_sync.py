@@ -0,0 +1,165 @@
+import pytest
+from sqlalchemy import select
+from app.api import douyin
+from app.models.douyin_sync_state import DouyinSyncState
+from app.models.douyin_video import DouyinVideo
+from app.services import celery as celery_tasks
+from app.services.celery import sync_douyin_videos_task
+from app.services.douyin_sync import DouyinVideoSync
+
+
+def item(item_id, create_time=1700000000, **values):
+    return {"item_id": item_id, "title": item_id, "create_time": create_time, **values}
+
+
+class FakeDouyinService:
+    """按cursor返回预设的视频列表分页"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.cursors = []
+
+    async def ensure_valid_token(self, db, user):
+        return "access-token"
+
+    async def get_video_list(self, access_token, cursor=0, count=20):
+        self.cursors.append(cursor)
+        page = self.pages[len(self.cursors) - 1]
+        if isinstance(page, Exception):
+            raise page
+        return {"data": page}
+
+
+@pytest.fixture
+async def owner(make_user):
+    user, _ = await make_user(douyin_access_token="token", douyin_user_id="open-id")
+    return user
+
+
+async def mirrored(db):
+    result = await db.execute(select(DouyinVideo).order_by(DouyinVideo.douyin_video_id).execution_options(populate_existing=True))
+    return result.scalars().all()
+
+
+async def test_pinned_video_repeated_in_page(db, owner):
+    pinned = item("a", create_time=1700000000, is_top=1)
+    page = {"list": [pinned, item("c", create_time=1700000300), item("b", 1700000200), item("a", 1700000000)], "has_more": False}
+    count = await DouyinVideoSync(FakeDouyinService([page])).sync_user(db, owner.id)
+    assert count == 4
+    videos = await mirrored(db)
+    assert [video.douyin_video_id for video in videos] == ["a", "b", "c"]
+    assert videos[0].is_top is True
+
+
+async def test_repeated_video_already_mirrored(db, owner):
+    page = {"list": [item("a", is_top=1), item("b"), item("a")], "has_more": False}
+    await DouyinVideoSync(FakeDouyinService([page])).sync_user(db, owner.id)
+    await DouyinVideoSync(FakeDouyinService([page])).sync_user(db, owner.id, full=True)
+    videos = await mirrored(db)
+    assert [(video.douyin_video_id, video.is_top) for video in videos] == [("a", True), ("b", False)]
+
+
+async def sync_state(db, user_id):
+    return await db.get(DouyinSyncState, user_id, populate_existing=True)
+
+
+async def test_first_sync_walks_all_pages(db, owner):
+    pages = [
+        {"list": [item("c", 3), item("b", 2)], "has_more": True, "cursor": 100},
+        {"list": [item("a", 1)], "has_more": False}
+    ]
+    service = FakeDouyinService(pages)
+    assert await DouyinVideoSync(service).sync_user(db, owner.id) == 3
+    assert service.cursors == [0, 100]
+    state = await sync_state(db, owner.id)
+    assert state.status == "success" and state.last_full_sync_at == state.last_synced_at
+
+
+async def test_incremental_sync_stops_at_known_video(db, owner):
+    await DouyinVideoSync(FakeDouyinService([{"list": [item("a", 1)], "has_more": False}])).sync_user(db, owner.id)
+    pages = [
+        {"list": [item("top", 0, is_top=1), item("c", 3), item("a", 1)], "has_more": True, "cursor": 100},
+        {"list": [item("old", 0)], "has_more": False}
+    ]
+    service = FakeDouyinService(pages)
+    await DouyinVideoSync(service).sync_user(db, owner.id)
+    # 置顶视频不作为停止点，遇到已同步的a后不再翻页
+    assert service.cursors == [0]
+    assert [video.douyin_video_id for video in await mirrored(db)] == ["a", "c", "top"]
+
+
+async def test_pinned_known_video_is_not_a_stop_point(db, owner):
+    await DouyinVideoSync(FakeDouyinService([{"list": [item("top", 0)], "has_more": False}])).sync_user(db, owner.id)
+    pages = [
+        {"list": [item("top", 0, is_top=1), item("new", 5)], "has_more": True, "cursor": 100},
+        {"list": [item("older", 4)], "has_more": False}
+    ]
+    service = FakeDouyinService(pages)
+    await DouyinVideoSync(service).sync_user(db, owner.id)
+    assert service.cursors == [0, 100]
+
+
+async def test_full_sync_prunes_deleted_videos(db, owner):
+    await DouyinVideoSync(FakeDouyinService([{"list": [item("a"), item("b")], "has_more": False}])).sync_user(db, owner.id)
+    await DouyinVideoSync(FakeDouyinService([{"list": [item("a")], "has_more": False}])).sync_user(db, owner.id, full=True)
+    assert [video.douyin_video_id for video in await mirrored(db)] == ["a"]
+
+
+async def test_failed_sync_keeps_pages_and_forces_full_sync(db, owner):
+    pages = [{"list": [item("b", 2)], "has_more": True, "cursor": 100}, RuntimeError("upstream error")]
+    with pytest.raises(RuntimeError):
+        await DouyinVideoSync(FakeDouyinService(pages)).sync_user(db, owner.id)
+    state = await sync_state(db, owner.id)
+    assert (state.status, state.error_message) == ("failed", "upstream error")
+    assert [video.douyin_video_id for video in await mirrored(db)] == ["b"]
+    
+    # 上次失败，即使遇到已同步的视频也完整遍历
+    pages = [{"list": [item("b", 2)], "has_more": True, "cursor": 100}, {"list": [item("a", 1)], "has_more": False}]
+    service = FakeDouyinService(pages)
+    await DouyinVideoSync(service).sync_user(db, owner.id)
+    assert service.cursors == [0, 100]
+    assert (await sync_state(db, owner.id)).status == "success"
+
+
+async def test_video_list_api_reads_mirror_and_triggers_sync(client, db, make_user, monkeypatch):
+    user, headers = await make_user(douyin_access_token="token", douyin_user_id="open-id")
+    queued = []
+    monkeypatch.setattr(douyin.sync_douyin_videos_task, "delay", queued.append)
+    
+    response = await client.get("/api/v1/douyin/videos", headers=headers)
+    body = response.json()
+    assert (body["list"], body["stale"], body["syncing"]) == ([], True, True)
+    # 同一个同步间隔内只提交一次同步任务
+    assert (await client.get("/api/v1/douyin/videos", headers=headers)).json()["syncing"] is False
+    assert queued == [user.id]
+    
+    pages = [{"list": [item(f"v{i}", 1700000000 + i, is_top=int(i == 0)) for i in range(3)], "has_more": False}]
+    await DouyinVideoSync(FakeDouyinService(pages)).sync_user(db, user.id)
+    response = await client.get("/api/v1/douyin/videos", params={"limit": 2}, headers=headers)
+    body = response.json()
+    assert [video["douyin_video_id"] for video in body["list"]] == ["v0", "v2"]
+    assert (body["has_more"], body["stale"]) == (True, False)
+    body = (await client.get("/api/v1/douyin/videos", params={"limit": 2, "offset": 2}, headers=headers)).json()
+    assert [video["douyin_video_id"] for video in body["list"]] == ["v1"] and body["has_more"] is False
+
+
+async def test_video_list_requires_douyin_account(client, make_user):
+    _, headers = await make_user()
+    assert (await client.get("/api/v1/douyin/videos", headers=headers)).status_code == 400
+
+
+def test_sync_task_skips_user_already_syncing(monkeypatch):
+    calls = []
+
+    async def sync_user(self, session, user_id, full=None, on_page=None):
+        calls.append(user_id)
+        # 每拉取一页前延长锁的有效期
+        await on_page()
+    monkeypatch.setattr(DouyinVideoSync, "sync_user", sync_user)
+    sync_douyin_videos_task.run(1)
+    assert calls == [1]
+    lock = celery_tasks.get_sync_redis().lock("lock:douyin.sync_videos:1", timeout=60)
+    assert lock.acquire(blocking=False)
+    sync_douyin_videos_task.run(1)
+    assert calls == [1]
+    lock.release()
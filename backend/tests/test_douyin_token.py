@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime, timedelta
+import httpx
+import pytest
+from redis.exceptions import RedisError
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.user import User
+from app.services import douyin_service
+from app.services.douyin_service import DouyinService
+from app.services.user_cache import cache_user, get_cached_user
+
+
+class FakeTokenServer:
+    """模拟抖音的刷新令牌接口，每次刷新返回新的令牌"""
+
+    def __init__(self):
+        self.refreshed = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/oauth/refresh_token/"
+        refresh_token = httpx.QueryParams(request.read().decode())["refresh_token"]
+        self.refreshed.append(refresh_token)
+        await asyncio.sleep(0.02)
+        n = len(self.refreshed)
+        return httpx.Response(200, json={"data": {
+            "access_token": f"access-{n}", "refresh_token": f"refresh-{n}", "expires_in": 7200
+        }})
+
+
+@pytest.fixture
+def token_server(monkeypatch):
+    monkeypatch.setattr(settings, "DOUYIN_API_BASE_URL", "https://douyin.test")
+    server = FakeTokenServer()
+    return server, lambda: DouyinService(client=httpx.AsyncClient(transport=httpx.MockTransport(server)))
+
+
+async def add_user(make_user, username="alice", expires_in=-10):
+    user, _ = await make_user(
+        username,
+        douyin_access_token=f"{username}-old",
+        douyin_refresh_token=f"{username}-refresh",
+        douyin_token_expires_at=datetime.utcnow() + timedelta(seconds=expires_in)
+    )
+    return user
+
+
+async def test_valid_token_is_not_refreshed(db, make_user, token_server):
+    server, make_service = token_server
+    user = await add_user(make_user, expires_in=3600)
+    assert await make_service().ensure_valid_token(db, user) == "alice-old"
+    assert server.refreshed == []
+
+
+async def test_concurrent_refreshes_call_douyin_once(db, make_user, token_server):
+    server, make_service = token_server
+    user = await add_user(make_user)
+
+    async def ensure():
+        async with AsyncSessionLocal() as session:
+            return await make_service().ensure_valid_token(session, await session.get(User, user.id))
+    tokens = await asyncio.gather(*(ensure() for _ in range(5)))
+    assert tokens == ["access-1"] * 5
+    assert server.refreshed == ["alice-refresh"]
+    stored = await db.get(User, user.id, populate_existing=True)
+    assert (stored.douyin_access_token, stored.douyin_refresh_token) == ("access-1", "refresh-1")
+    assert stored.douyin_token_expires_at > datetime.utcnow() + timedelta(seconds=7000)
+
+
+async def test_refresh_without_redis_lock(db, make_user, token_server, monkeypatch):
+    server, make_service = token_server
+    user = await add_user(make_user)
+
+    class BrokenRedis:
+        def lock(self, *args, **kwargs):
+            return self
+
+        async def acquire(self):
+            raise RedisError("connection refused")
+    monkeypatch.setattr(douyin_service, "get_redis", lambda: BrokenRedis())
+    assert await make_service().ensure_valid_token(db, user) == "access-1"
+
+
+async def test_refresh_invalidates_cached_user(db, make_user, token_server):
+    _, make_service = token_server
+    user = await add_user(make_user)
+    await cache_user(user)
+    # 缓存的用户不含令牌，刷新时从数据库读取
+    cached = await get_cached_user("alice")
+    assert cached.douyin_access_token is None
+    assert await make_service().ensure_valid_token(db, cached) == "access-1"
+    assert await get_cached_user("alice") is None
+
+
+async def test_sweep_refreshes_only_expiring_tokens(db, make_user, token_server):
+    server, make_service = token_server
+    await add_user(make_user, "soon", expires_in=settings.DOUYIN_TOKEN_REFRESH_MARGIN - 60)
+    await add_user(make_user, "later", expires_in=settings.DOUYIN_TOKEN_REFRESH_MARGIN + 600)
+    assert await make_service().refresh_expiring_tokens(db) == 1
+    assert server.refreshed == ["soon-refresh"]
+    tokens = dict((await db.execute(
+        select(User.username, User.douyin_access_token).execution_options(populate_existing=True)
+    )).all())
+    assert tokens == {"soon": "access-1", "later": "later-old"}
@@ -0,0 +1,104 @@
+import asyncio
+import httpx
+import pytest
+from app.core.config import settings
+from app.services.douyin_service import DouyinService
+
+
+class FakeUploadServer:
+    """模拟抖音的分片上传接口，记录收到的分片和最大并发数"""
+
+    def __init__(self, fail_parts=()):
+        self.fail_parts = set(fail_parts)
+        self.parts = {}
+        self.created = 0
+        self.completed = []
+        self.active = 0
+        self.max_active = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path == "/video/upload/":
+            self.created += 1
+            return httpx.Response(200, json={"data": {"upload_id": f"upload-{self.created}"}})
+        if path == "/video/part/upload/":
+            part_number = int(request.url.params["part_number"])
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            await asyncio.sleep(0.01)
+            self.active -= 1
+            if part_number in self.fail_parts:
+                return httpx.Response(400, text="bad part")
+            self.parts[(request.url.params["upload_id"], part_number)] = request.read()
+            return httpx.Response(200, json={})
+        if path == "/video/complete/":
+            self.completed.append(dict(request.url.params) | dict(httpx.QueryParams(request.read().decode())))
+            return httpx.Response(200, json={"data": {"task_id": "task-1"}})
+        return httpx.Response(404)
+
+
+@pytest.fixture
+def upload_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DOUYIN_API_BASE_URL", "https://douyin.test")
+    monkeypatch.setattr(settings, "DOUYIN_UPLOAD_PART_SIZE", 10)
+    monkeypatch.setattr(settings, "DOUYIN_UPLOAD_CONCURRENCY", 2)
+    monkeypatch.setattr(settings, "DOUYIN_UPLOAD_PART_RETRIES", 0)
+
+
+@pytest.fixture
+def video_file(tmp_path):
+    path = tmp_path / "video.mp4"
+    # 每个分片的内容不同，便于按分片核对
+    path.write_bytes(b"".join(bytes([65 + i]) * 10 for i in range(4)) + b"tail")
+    return str(path)
+
+
+def service(server):
+    return DouyinService(client=httpx.AsyncClient(transport=httpx.MockTransport(server)))
+
+
+async def test_upload_splits_file_into_parts(upload_settings, video_file):
+    server = FakeUploadServer()
+    states = []
+
+    async def on_progress(state):
+        states.append(state)
+    result = await service(server).upload_video("token", video_file, "title", on_progress=on_progress)
+    
+    assert result["data"]["task_id"] == "task-1"
+    assert sorted(part for _, part in server.parts) == [1, 2, 3, 4, 5]
+    for part in range(1, 5):
+        assert bytes([64 + part]) * 10 in server.parts[("upload-1", part)]
+    assert b"tail" in server.parts[("upload-1", 5)]
+    assert server.max_active == 2
+    assert server.completed[0]["upload_id"] == "upload-1"
+    # 创建任务后和每个分片完成后都会报告进度
+    assert states[0]["completed_parts"] == [] and states[-1]["completed_parts"] == [1, 2, 3, 4, 5]
+    assert states[0]["total_parts"] == 5
+
+
+async def test_failed_parts_resume_without_reuploading(upload_settings, video_file):
+    server = FakeUploadServer(fail_parts={2, 4})
+    states = []
+
+    async def on_progress(state):
+        states.append(state)
+    with pytest.raises(Exception, match="2个分片上传失败"):
+        await service(server).upload_video("token", video_file, "title", on_progress=on_progress)
+    resume_state = states[-1]
+    assert resume_state["completed_parts"] == [1, 3, 5]
+    assert server.completed == []
+    
+    server.fail_parts.clear()
+    server.parts.clear()
+    await service(server).upload_video("token", video_file, "title", resume_state=resume_state)
+    assert sorted(server.parts) == [("upload-1", 2), ("upload-1", 4)]
+    assert server.created == 1
+
+
+async def test_changed_file_starts_new_upload(upload_settings, video_file):
+    server = FakeUploadServer()
+    resume_state = {"upload_id": "upload-old", "file_size": 1, "part_size": 10, "total_parts": 1, "completed_parts": [1]}
+    await service(server).upload_video("token", video_file, "title", resume_state=resume_state)
+    assert server.created == 1
+    assert {upload_id for upload_id, _ in server.parts} == {"upload-1"}
@@ -0,0 +1,50 @@
+import httpx
+import pytest
+from app.core import http_client
+from app.core.config import settings
+from app.core.http_client import close_http_clients, get_http_client, init_http_clients
+from app.services.ai_service import AIService
+from app.services.douyin_service import DouyinService
+
+
+@pytest.fixture(autouse=True)
+def clients(monkeypatch):
+    monkeypatch.setattr(http_client, "_clients", {})
+
+
+async def test_services_share_one_client_per_upstream():
+    init_http_clients()
+    douyin = get_http_client("douyin")
+    assert DouyinService().client is douyin and DouyinService().client is douyin
+    assert AIService().http_client is get_http_client("ai")
+    assert get_http_client("ai") is not douyin
+    await close_http_clients()
+
+
+async def test_client_uses_pool_limits_and_upstream_timeouts():
+    douyin = get_http_client("douyin")
+    ai = get_http_client("ai")
+    assert douyin.timeout.read == settings.DOUYIN_API_TIMEOUT
+    assert ai.timeout.read == settings.AI_HTTP_TIMEOUT
+    assert douyin.timeout.connect == settings.HTTP_CONNECT_TIMEOUT
+    pool = douyin._transport._pool
+    assert pool._max_connections == settings.HTTP_MAX_CONNECTIONS
+    assert pool._max_keepalive_connections == settings.HTTP_MAX_KEEPALIVE_CONNECTIONS
+    await close_http_clients()
+
+
+async def test_closed_client_is_recreated():
+    first = get_http_client("douyin")
+    await close_http_clients()
+    assert first.is_closed
+    second = get_http_client("douyin")
+    assert second is not first and not second.is_closed
+    await close_http_clients()
+
+
+async def test_injected_client_takes_precedence():
+    injected = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"data": {}})))
+    service = DouyinService(client=injected)
+    assert service.client is injected
+    await service.get_user_info("token")
+    assert http_client._clients == {}
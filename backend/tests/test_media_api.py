@@ -0,0 +1,101 @@
+import os
+from app.core.config import settings
+from app.models.ai_generation import AIGeneration
+from app.models.video import Video
+
+
+async def add_video_file(db, user, upload_dir, data=bytes(range(256)) * 4):
+    path = os.path.join(upload_dir, f"{user.username}.mp4")
+    with open(path, "wb") as f:
+        f.write(data)
+    video = Video(user_id=user.id, title="preview", file_path=path)
+    db.add(video)
+    await db.commit()
+    return video, data
+
+
+async def signed_url(client, headers, video_id):
+    response = await client.get(f"/api/v1/media/videos/{video_id}/url", headers=headers)
+    assert response.status_code == 200
+    return response.json()["url"]
+
+
+async def test_signed_url_serves_range(client, db, make_user, upload_dir):
+    user, headers = await make_user()
+    video, data = await add_video_file(db, user, upload_dir)
+    url = await signed_url(client, headers, video.id)
+    
+    response = await client.get(url, headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.content == data[100:200]
+    assert response.headers["Content-Range"] == f"bytes 100-199/{len(data)}"
+    
+    full = await client.get(url)
+    assert full.status_code == 200 and full.content == data
+    cached = await client.get(url, headers={"If-None-Match": full.headers["ETag"]})
+    assert cached.status_code == 304 and cached.content == b""
+
+
+async def test_bearer_token_serves_file(client, db, make_user, upload_dir):
+    user, headers = await make_user()
+    video, data = await add_video_file(db, user, upload_dir)
+    response = await client.get(f"/api/v1/media/videos/{video.id}", headers=headers)
+    assert response.content == data
+
+
+async def test_invalid_signatures_rejected(client, db, make_user, upload_dir):
+    user, headers = await make_user()
+    video, _ = await add_video_file(db, user, upload_dir)
+    url = await signed_url(client, headers, video.id)
+    
+    assert (await client.get(f"/api/v1/media/videos/{video.id}")).status_code == 401
+    assert (await client.get(url.replace("sig=", "sig=0"))).status_code == 401
+    # 签名绑定路径，不能用于其他视频
+    assert (await client.get(url.replace(f"/videos/{video.id}?", f"/videos/{video.id + 1}?"))).status_code == 401
+
+
+async def test_expired_signature_rejected(client, db, make_user, upload_dir, monkeypatch):
+    user, headers = await make_user()
+    video, _ = await add_video_file(db, user, upload_dir)
+    monkeypatch.setattr(settings, "MEDIA_URL_TTL", -1)
+    url = await signed_url(client, headers, video.id)
+    assert (await client.get(url)).status_code == 401
+
+
+async def test_other_users_media_not_found(client, db, make_user, upload_dir):
+    alice, _ = await make_user("alice")
+    _, bob_headers = await make_user("bob")
+    video, _ = await add_video_file(db, alice, upload_dir)
+    assert (await client.get(f"/api/v1/media/videos/{video.id}/url", headers=bob_headers)).status_code == 404
+    assert (await client.get(f"/api/v1/media/videos/{video.id}", headers=bob_headers)).status_code == 404
+
+
+async def test_file_outside_upload_dir_not_served(client, db, make_user, tmp_path):
+    user, headers = await make_user()
+    outside = tmp_path / "secret.txt"
+    outside.write_text("secret")
+    video = Video(user_id=user.id, title="escape", file_path=str(outside))
+    db.add(video)
+    await db.commit()
+    assert (await client.get(f"/api/v1/media/videos/{video.id}", headers=headers)).status_code == 404
+
+
+async def test_generation_file(client, db, make_user, upload_dir):
+    user, headers = await make_user()
+    path = os.path.join(upload_dir, "image.png")
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG image")
+    generation = AIGeneration(user_id=user.id, generation_type="image", file_path=path, status="success")
+    db.add(generation)
+    await db.commit()
+    response = await client.get(f"/api/v1/media/generations/{generation.id}/url", headers=headers)
+    assert (await client.get(response.json()["url"])).content == b"\x89PNG image"
+
+
+async def test_accel_redirect(client, db, make_user, upload_dir, monkeypatch):
+    user, headers = await make_user()
+    video, _ = await add_video_file(db, user, upload_dir)
+    monkeypatch.setattr(settings, "MEDIA_ACCEL_REDIRECT_PREFIX", "/protected/")
+    response = await client.get(f"/api/v1/media/videos/{video.id}", headers=headers)
+    assert response.headers["X-Accel-Redirect"] == "/protected/alice.mp4"
+    assert response.content == b""
@@ -0,0 +1,63 @@
+import pytest
+from app.services.media_probe import MediaProbeError, douyin_rejection, metadata_columns, probe_mp4
+
+
+@pytest.fixture
+def write_file(tmp_path):
+    def write(data: bytes, name: str = "video.mp4") -> str:
+        path = tmp_path / name
+        path.write_bytes(data)
+        return str(path)
+    return write
+
+
+def test_probe_mp4_reads_moov(write_file, make_mp4):
+    data = make_mp4(duration=10.0, width=720, height=1280, payload=bytes(4096))
+    metadata = probe_mp4(write_file(data))
+    assert metadata["duration"] == pytest.approx(10.0)
+    assert (metadata["width"], metadata["height"]) == (720, 1280)
+    assert metadata["video_codec"] == "h264"
+    assert metadata["audio_codec"] is None
+    assert metadata["file_size"] == len(data)
+    assert metadata["bitrate"] == int(len(data) * 8 / 10)
+    assert douyin_rejection(metadata) is None
+
+
+def test_probe_mp4_reads_audio_track(write_file, make_mp4):
+    metadata = probe_mp4(write_file(make_mp4(video_codec=b"hvc1", audio_codec=b"mp4a")))
+    assert (metadata["video_codec"], metadata["audio_codec"]) == ("hevc", "aac")
+    assert douyin_rejection(metadata) is None
+
+
+@pytest.mark.parametrize("values, reason", [
+    ({"duration": 0.5}, "少于"),
+    ({"duration": 3600}, "超过"),
+    ({"video_codec": b"vp09"}, "不支持的视频编码"),
+    ({"video_codec": None, "audio_codec": b"mp4a"}, "没有视频轨道"),
+])
+def test_douyin_rejection(write_file, make_mp4, values, reason):
+    metadata = probe_mp4(write_file(make_mp4(**values)))
+    assert reason in douyin_rejection(metadata)
+
+
+def test_metadata_columns(write_file, make_mp4):
+    columns = metadata_columns(probe_mp4(write_file(make_mp4(duration=12.6))))
+    assert columns["duration"] in (12, 13)
+    assert (columns["width"], columns["height"], columns["video_codec"]) == (720, 1280, "h264")
+
+
+def test_probe_mp4_without_moov(write_file, make_mp4):
+    data = make_mp4().replace(b"moov", b"free")
+    with pytest.raises(MediaProbeError):
+        probe_mp4(write_file(data))
+
+
+def test_probe_mp4_truncated(write_file, make_mp4):
+    data = make_mp4()
+    with pytest.raises(MediaProbeError):
+        probe_mp4(write_file(data[:data.index(b"trak") + 16]))
+
+
+def test_probe_mp4_too_small(write_file):
+    with pytest.raises(MediaProbeError):
+        probe_mp4(write_file(b"\x00" * 4))
@@ -0,0 +1,133 @@
+import os
+from email.utils import formatdate
+import pytest
+from app.core.media import MediaFileResponse, parse_range
+
+FILE_SIZE = 1000
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=900-5000", (900, 999)),
+    (" bytes=0-0 ", (0, 0)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, FILE_SIZE) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=-", "bytes=0-1,5-9", "items=0-1", "bytes=a-b"])
+def test_parse_range_unsupported(header):
+    assert parse_range(header, FILE_SIZE) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=500-100", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    with pytest.raises(ValueError):
+        parse_range(header, FILE_SIZE)
+
+
+@pytest.fixture
+def media_file(tmp_path):
+    path = tmp_path / "video.mp4"
+    path.write_bytes(bytes(range(256)) * 4)
+    return str(path)
+
+
+async def fetch(path: str, headers: dict = None, method: str = "GET", response_headers: dict = None):
+    """以ASGI方式调用响应，返回状态码、响应头和响应体"""
+    scope = {
+        "type": "http",
+        "method": method,
+        "headers": [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()],
+        "extensions": {}
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    await MediaFileResponse(path, headers=response_headers)(scope, receive, send)
+    start = messages[0]
+    body = b"".join(message.get("body", b"") for message in messages[1:])
+    return start["status"], {key.decode(): value.decode() for key, value in start["headers"]}, body
+
+
+async def test_full_response(media_file):
+    status, headers, body = await fetch(media_file, response_headers={"cache-control": "private, max-age=60"})
+    assert status == 200
+    assert body == open(media_file, "rb").read()
+    assert headers["content-length"] == "1024"
+    assert headers["accept-ranges"] == "bytes"
+    assert headers["content-type"] == "video/mp4"
+    assert "etag" in headers and "last-modified" in headers
+
+
+async def test_range_response(media_file):
+    status, headers, body = await fetch(media_file, {"Range": "bytes=10-19"})
+    assert status == 206
+    assert body == bytes(range(10, 20))
+    assert headers["content-range"] == "bytes 10-19/1024"
+    assert headers["content-length"] == "10"
+
+
+async def test_unsatisfiable_range(media_file):
+    status, headers, body = await fetch(media_file, {"Range": "bytes=2048-"})
+    assert status == 416
+    assert headers["content-range"] == "bytes */1024"
+    assert body == b""
+
+
+async def test_head_sends_no_body(media_file):
+    status, headers, body = await fetch(media_file, method="HEAD")
+    assert status == 200
+    assert headers["content-length"] == "1024"
+    assert body == b""
+
+
+async def test_if_range_matching_etag(media_file):
+    _, headers, _ = await fetch(media_file)
+    status, _, body = await fetch(media_file, {"Range": "bytes=0-3", "If-Range": headers["etag"]})
+    assert status == 206
+    assert body == bytes(range(4))
+
+
+async def test_if_range_matching_last_modified(media_file):
+    _, headers, _ = await fetch(media_file)
+    status, _, _ = await fetch(media_file, {"Range": "bytes=0-3", "If-Range": headers["last-modified"]})
+    assert status == 206
+
+
+async def test_if_range_stale_returns_full_file(media_file):
+    status, headers, body = await fetch(media_file, {"Range": "bytes=0-3", "If-Range": '"stale"'})
+    assert status == 200
+    assert len(body) == 1024
+    assert "content-range" not in headers
+
+
+async def test_if_none_match_returns_304(media_file):
+    _, headers, _ = await fetch(media_file)
+    for value in (headers["etag"], f'W/{headers["etag"]}', f'"other", {headers["etag"]}', "*"):
+        status, _, body = await fetch(media_file, {"If-None-Match": value})
+        assert status == 304
+        assert body == b""
+
+
+async def test_if_none_match_mismatch(media_file):
+    status, _, _ = await fetch(media_file, {"If-None-Match": '"other"'})
+    assert status == 200
+
+
+async def test_if_modified_since(media_file):
+    mtime = os.stat(media_file).st_mtime
+    status, _, _ = await fetch(media_file, {"If-Modified-Since": formatdate(mtime + 60, usegmt=True)})
+    assert status == 304
+    status, _, _ = await fetch(media_file, {"If-Modified-Since": formatdate(mtime - 60, usegmt=True)})
+    assert status == 200
+    status, _, _ = await fetch(media_file, {"If-Modified-Since": "not a date"})
+    assert status == 200
@@ -0,0 +1,56 @@
+import os
+from sqlalchemy import select
+from app.core.database import AsyncSessionLocal
+from app.models.media_blob import MediaBlob
+from app.services import media_storage
+from app.services.media_storage import acquire_blob, release_blobs
+
+
+def temp_file(upload_dir, name, data=b"content"):
+    path = os.path.join(upload_dir, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+async def test_acquire_blob_references_concurrent_insert(db, upload_dir, monkeypatch):
+    # 另一个请求在本次查询之后插入了相同内容
+    async with AsyncSessionLocal() as other:
+        winner, created = await acquire_blob(other, temp_file(upload_dir, "a"), "ab" * 32, 7, ".mp4")
+        await other.commit()
+    assert created
+
+    real_find_blob = media_storage.find_blob
+    calls = []
+
+    async def find_blob_after_race(session, sha256):
+        calls.append(sha256)
+        return None if len(calls) == 1 else await real_find_blob(session, sha256)
+    monkeypatch.setattr(media_storage, "find_blob", find_blob_after_race)
+
+    tmp_path = temp_file(upload_dir, "b")
+    blob, created = await acquire_blob(db, tmp_path, "ab" * 32, 7, ".mp4")
+    await db.commit()
+    assert (blob.id, created) == (winner.id, False)
+    assert not os.path.exists(tmp_path)
+    row = await db.scalar(select(MediaBlob).execution_options(populate_existing=True))
+    assert row.ref_count == 2
+
+
+async def test_new_blob_rolls_back_with_caller(db, upload_dir):
+    blob, created = await acquire_blob(db, temp_file(upload_dir, "a"), "cd" * 32, 7)
+    assert created and os.path.exists(blob.file_path)
+    await db.rollback()
+    async with AsyncSessionLocal() as other:
+        assert await other.scalar(select(MediaBlob)) is None
+
+
+async def test_release_blobs_counts_duplicates(db, upload_dir):
+    blob, _ = await acquire_blob(db, temp_file(upload_dir, "a"), "ef" * 32, 7)
+    for name in ("b", "c"):
+        await acquire_blob(db, temp_file(upload_dir, name), "ef" * 32, 7)
+    await db.commit()
+    assert await release_blobs(db, [blob.id, blob.id, None]) == []
+    assert await release_blobs(db, [blob.id]) == [blob.file_path]
+    await db.commit()
+    assert await db.scalar(select(MediaBlob)) is None
@@ -0,0 +1,68 @@
+import fakeredis
+import httpx
+from prometheus_client import CollectorRegistry, REGISTRY
+from app.core.metrics import AppStateCollector, MetricsMiddleware, track_outbound
+from app.models.publish_task import PublishTask
+
+
+def sample(name, labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_registering_collector_does_no_io(monkeypatch):
+    def fail():
+        raise AssertionError("注册时不应采集数据")
+
+    collector = AppStateCollector()
+    monkeypatch.setattr(collector, "_refresh", fail)
+    # 与默认REGISTRY一致：采集器没有describe时注册会调用collect
+    CollectorRegistry(auto_describe=True).register(collector)
+
+
+async def test_collector_reports_tasks_and_queue_depth(db, monkeypatch):
+    db.add_all([PublishTask(status="processing"), PublishTask(status="processing"), PublishTask(status="success")])
+    await db.commit()
+    broker = fakeredis.FakeRedis()
+    broker.rpush("celery", "job-1", "job-2")
+    collector = AppStateCollector()
+    collector._broker = broker
+    registry = CollectorRegistry()
+    registry.register(collector)
+    assert registry.get_sample_value("publish_tasks", {"status": "processing"}) == 2
+    assert registry.get_sample_value("publish_tasks", {"status": "success"}) == 1
+    assert registry.get_sample_value("job_queue_depth") == 2
+
+
+async def test_collector_skips_queue_depth_when_broker_unavailable(db, monkeypatch):
+    collector = AppStateCollector()
+    monkeypatch.setattr(collector, "_broker_queue_depth", lambda: (_ for _ in ()).throw(ConnectionError("down")))
+    names = [family.name for family in collector.collect()]
+    assert "publish_tasks" in names and "job_queue_depth" not in names
+
+
+async def test_middleware_labels_requests_by_route_template(client):
+    from main import app
+    labels = {"method": "GET", "route": "/api/v1/videos/{video_id}", "status": "401"}
+    before = sample("http_request_duration_seconds_count", labels)
+    unmatched = {"method": "GET", "route": "unmatched", "status": "404"}
+    before_unmatched = sample("http_request_duration_seconds_count", unmatched)
+    transport = httpx.ASGITransport(app=MetricsMiddleware(app))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as metered:
+        assert (await metered.get("/api/v1/videos/1")).status_code == 401
+        assert (await metered.get("/api/v1/videos/2")).status_code == 401
+        assert (await metered.get("/no/such/path")).status_code == 404
+    assert sample("http_request_duration_seconds_count", labels) == before + 2
+    assert sample("http_request_duration_seconds_count", unmatched) == before_unmatched + 1
+
+
+async def test_track_outbound_counts_failed_results():
+    @track_outbound("test", "op")
+    async def call(result):
+        return result
+
+    errors = {"upstream": "test", "operation": "op", "error": "busy"}
+    before = sample("outbound_errors_total", errors)
+    await call({"success": True})
+    await call({"success": False, "busy": True})
+    assert sample("outbound_errors_total", errors) == before + 1
+    assert sample("outbound_request_duration_seconds_count", {"upstream": "test", "operation": "op", "outcome": "error"}) >= 1
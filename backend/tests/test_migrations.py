@@ -0,0 +1,40 @@
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.migration import MigrationContext
+from sqlalchemy import inspect, text
+from app.core.database import BACKEND_DIR, Base, create_tables, engine
+import os
+
+
+def reset_database():
+    with engine.begin() as connection:
+        Base.metadata.drop_all(connection)
+        connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+
+
+def schema_diff():
+    with engine.connect() as connection:
+        return compare_metadata(MigrationContext.configure(connection), Base.metadata)
+
+
+def test_migrations_match_models(upload_dir):
+    reset_database()
+    create_tables()
+    assert schema_diff() == []
+    # 再次执行不做任何改动
+    create_tables()
+    assert schema_diff() == []
+
+
+def test_legacy_database_is_stamped_then_upgraded(upload_dir):
+    # 引入迁移前的数据库：有初始版本的表，但没有alembic_version
+    reset_database()
+    config = Config(os.path.join(BACKEND_DIR, "alembic.ini"))
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "0001")
+        connection.execute(text("DROP TABLE alembic_version"))
+    create_tables()
+    assert schema_diff() == []
+    assert "idempotency_key" in {column["name"] for column in inspect(engine).get_columns("publish_tasks")}
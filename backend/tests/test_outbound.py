@@ -0,0 +1,169 @@
+import httpx
+import pytest
+from redis.exceptions import RedisError
+from app.core import outbound
+from app.core.outbound import CircuitBreaker, TokenBucket, Upstream, UpstreamRateLimited, UpstreamUnavailable
+
+
+@pytest.fixture
+def clock(fake_clock):
+    return fake_clock(outbound)
+
+
+@pytest.fixture
+def redis_down(monkeypatch):
+    class BrokenRedis:
+        def register_script(self, script):
+            async def run(keys, args):
+                raise RedisError("connection refused")
+            return run
+    monkeypatch.setattr(outbound, "get_redis", lambda: BrokenRedis())
+
+
+def test_token_bucket_burst_then_refill(clock):
+    bucket = TokenBucket("test", rate=2, burst=3)
+    assert [bucket._take_local() for _ in range(3)] == [0, 0, 0]
+    assert bucket._take_local() == pytest.approx(0.5)
+    clock.advance(0.5)
+    assert bucket._take_local() == 0
+    assert bucket._take_local() == pytest.approx(0.5)
+
+
+def test_token_bucket_caps_at_burst(clock):
+    bucket = TokenBucket("test", rate=10, burst=2)
+    clock.advance(60)
+    assert [bucket._take_local() for _ in range(2)] == [0, 0]
+    assert bucket._take_local() > 0
+
+
+async def test_token_bucket_falls_back_without_redis(clock, redis_down):
+    bucket = TokenBucket("test", rate=1, burst=1)
+    await bucket.acquire(deadline=clock.now + 5)
+    with pytest.raises(UpstreamRateLimited):
+        await bucket.acquire(deadline=clock.now + 0.5)
+
+
+def test_circuit_opens_after_threshold(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.before_call() is False
+    breaker.record_failure()
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before_call()
+
+
+def test_circuit_success_resets_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.before_call() is False
+
+
+def test_circuit_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.advance(30)
+    assert breaker.before_call() is True
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.before_call() is False
+
+
+def test_circuit_failed_probe_reopens(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.advance(30)
+    probe = breaker.before_call()
+    breaker.record_failure()
+    breaker.end_call(probe)
+    clock.advance(29)
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before_call()
+    clock.advance(1)
+    assert breaker.before_call() is True
+
+
+def test_circuit_cancelled_probe_allows_next(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.advance(30)
+    breaker.end_call(breaker.before_call())
+    assert breaker.before_call() is True
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    monkeypatch.setattr(outbound.settings, "OUTBOUND_RETRY_BACKOFF", 0)
+    monkeypatch.setattr(outbound.settings, "CIRCUIT_FAILURE_THRESHOLD", 3)
+    return Upstream("test", rate=100, burst=100, timeout=5, deadline=5)
+
+
+def scripted_client(*statuses):
+    """按顺序返回给定状态码的客户端，记录收到的请求方法"""
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        status = statuses[min(len(calls), len(statuses)) - 1]
+        if isinstance(status, Exception):
+            raise status
+        return httpx.Response(status)
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), calls
+
+
+async def test_idempotent_request_retries_server_errors(upstream):
+    client, calls = scripted_client(503, 502, 200)
+    response = await upstream.request(client, "GET", "https://upstream/item")
+    assert response.status_code == 200
+    assert calls == ["GET"] * 3
+
+
+async def test_post_not_retried_on_server_error(upstream):
+    client, calls = scripted_client(500, 200)
+    response = await upstream.request(client, "POST", "https://upstream/publish")
+    assert response.status_code == 500
+    assert calls == ["POST"]
+
+
+async def test_post_retried_when_rate_limited_or_not_sent(upstream):
+    client, calls = scripted_client(429, httpx.ConnectError("refused"), 200)
+    response = await upstream.request(client, "POST", "https://upstream/publish")
+    assert response.status_code == 200
+    assert len(calls) == 3
+
+
+async def test_post_not_retried_after_read_timeout(upstream):
+    client, calls = scripted_client(httpx.ReadTimeout("timeout"), 200)
+    with pytest.raises(httpx.ReadTimeout):
+        await upstream.request(client, "POST", "https://upstream/publish")
+    assert len(calls) == 1
+
+
+async def test_retries_stop_at_max_retries(upstream):
+    client, calls = scripted_client(503)
+    response = await upstream.request(client, "GET", "https://upstream/item", max_retries=1)
+    assert response.status_code == 503
+    assert len(calls) == 2
+
+
+async def test_circuit_opens_and_fails_fast(upstream):
+    client, calls = scripted_client(503)
+    await upstream.request(client, "GET", "https://upstream/item", max_retries=2)
+    with pytest.raises(UpstreamUnavailable):
+        await upstream.request(client, "GET", "https://upstream/item")
+    assert len(calls) == 3
+
+
+async def test_shared_bucket_limits_across_instances(fake_redis):
+    # 两个进程中的同一上游共享Redis中的令牌桶
+    first = Upstream("shared", rate=0.01, burst=2, timeout=5, deadline=0.5)
+    second = Upstream("shared", rate=0.01, burst=2, timeout=5, deadline=0.5)
+    client, calls = scripted_client(200)
+    await first.request(client, "GET", "https://upstream/item")
+    await second.request(client, "GET", "https://upstream/item")
+    with pytest.raises(UpstreamRateLimited):
+        await first.request(client, "GET", "https://upstream/item")
+    assert len(calls) == 2
@@ -0,0 +1,74 @@
+import os
+import pstats
+import httpx
+import pytest
+from pathlib import Path
+from app.core.config import settings
+from app.core.profiling import ProfilingMiddleware
+
+
+@pytest.fixture
+def profiling(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", "admin-token")
+    monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path / "profiles"))
+    return settings.PROFILING_DIR
+
+
+@pytest.fixture
+def profiled_client(profiling):
+    async def app(scope, receive, send):
+        sum(i * i for i in range(1000))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    transport = httpx.ASGITransport(app=ProfilingMiddleware(app))
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+PROFILE_HEADERS = {"X-Profile": "1", "X-Profile-Token": "admin-token"}
+
+
+async def test_requested_profile_saved_with_matching_id(profiled_client, profiling):
+    response = await profiled_client.get("/api/v1/videos/42", headers=PROFILE_HEADERS)
+    name = response.headers["X-Profile-Id"]
+    assert name.endswith("_GET_api_v1_videos_42.prof")
+    assert os.listdir(profiling) == [name]
+    stats = pstats.Stats(os.path.join(profiling, name))
+    assert stats.total_calls > 0
+
+
+@pytest.mark.parametrize("headers", [{}, {"X-Profile": "1"}, {"X-Profile": "1", "X-Profile-Token": "wrong"}])
+async def test_not_profiled_without_valid_token(profiled_client, profiling, headers):
+    response = await profiled_client.get("/", headers=headers)
+    assert "X-Profile-Id" not in response.headers
+    assert not os.path.exists(profiling)
+
+
+async def test_sampled_requests_profiled(profiled_client, profiling, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_SAMPLE_RATE", 1.0)
+    assert "X-Profile-Id" in (await profiled_client.get("/")).headers
+
+
+async def test_old_profiles_pruned(profiled_client, profiling, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_MAX_FILES", 2)
+    names = [(await profiled_client.get(f"/{i}", headers=PROFILE_HEADERS)).headers["X-Profile-Id"] for i in range(3)]
+    assert sorted(os.listdir(profiling)) == sorted(names[1:])
+
+
+async def test_profiles_api(client, profiled_client, profiling):
+    name = (await profiled_client.get("/", headers=PROFILE_HEADERS)).headers["X-Profile-Id"]
+    token = {"X-Profile-Token": "admin-token"}
+    assert (await client.get("/api/v1/admin/profiles/", headers={"X-Profile-Token": "wrong"})).status_code == 403
+    listing = await client.get("/api/v1/admin/profiles/", headers=token)
+    assert [profile["name"] for profile in listing.json()] == [name]
+    download = await client.get(f"/api/v1/admin/profiles/{name}", headers=token)
+    assert download.status_code == 200 and download.content == Path(profiling, name).read_bytes()
+    assert (await client.get("/api/v1/admin/profiles/..%2Fsecret.prof", headers=token)).status_code == 404
+    assert (await client.get("/api/v1/admin/profiles/missing.prof", headers=token)).status_code == 404
+
+
+async def test_profiles_api_hidden_when_disabled(client, monkeypatch):
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", "admin-token")
+    response = await client.get("/api/v1/admin/profiles/", headers={"X-Profile-Token": "admin-token"})
+    assert response.status_code == 404
@@ -0,0 +1,134 @@
+import pytest
+from sqlalchemy import event, insert, select
+from app.api import douyin
+from app.core.database import async_engine, engine
+from app.models.publish_task import PublishTask
+from app.models.video import Video
+
+
+@pytest.fixture
+def queued(monkeypatch):
+    """记录提交到Celery的发布任务ID"""
+    task_ids = []
+    monkeypatch.setattr(douyin.publish_video_task, "delay", task_ids.append)
+    return task_ids
+
+
+@pytest.fixture
+async def publisher(db, make_user):
+    user, headers = await make_user(douyin_user_id="open-id", douyin_access_token="token")
+    video = Video(user_id=user.id, title="video", file_path="/tmp/video.mp4", status="draft")
+    db.add(video)
+    await db.commit()
+    return user, headers, video.id
+
+
+async def publish(client, headers, video_id, key=None):
+    if key:
+        headers = {**headers, "Idempotency-Key": key}
+    return await client.post(f"/api/v1/douyin/publish/{video_id}", headers=headers)
+
+
+async def tasks_of(db, video_id):
+    result = await db.execute(select(PublishTask).where(PublishTask.video_id == video_id).execution_options(populate_existing=True))
+    return result.scalars().all()
+
+
+async def test_publish_queues_task(client, db, publisher, queued):
+    _, headers, video_id = publisher
+    response = await publish(client, headers, video_id)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["message"], body["status"]) == ("发布任务已提交", "queued")
+    assert queued == [body["id"]]
+    video = await db.get(Video, video_id, populate_existing=True)
+    assert video.publish_status == "processing"
+
+
+async def test_same_idempotency_key_returns_existing_task(client, db, publisher, queued):
+    _, headers, video_id = publisher
+    first = await publish(client, headers, video_id, key="k1")
+    # 任务已完成后用同一个键重试也不会再次发布
+    await db.execute(PublishTask.__table__.update().values(status="success"))
+    await db.commit()
+    second = await publish(client, headers, video_id, key="k1")
+    assert second.json()["message"] == "发布任务已存在"
+    assert second.json()["id"] == first.json()["id"]
+    assert len(queued) == 1 and len(await tasks_of(db, video_id)) == 1
+
+
+async def test_idempotency_keys_are_scoped_per_user(client, db, publisher, make_user, queued):
+    _, headers, video_id = publisher
+    other, other_headers = await make_user("bob", douyin_user_id="open-id-2")
+    other_video = Video(user_id=other.id, title="video")
+    db.add(other_video)
+    await db.commit()
+    first = await publish(client, headers, video_id, key="same")
+    second = await publish(client, other_headers, other_video.id, key="same")
+    assert first.json()["id"] != second.json()["id"]
+    assert len(queued) == 2
+
+
+async def test_active_task_not_submitted_twice(client, db, publisher, queued):
+    _, headers, video_id = publisher
+    first = await publish(client, headers, video_id)
+    second = await publish(client, headers, video_id)
+    assert second.json()["message"] == "发布任务已存在"
+    assert second.json()["id"] == first.json()["id"]
+    assert len(queued) == 1
+
+
+async def test_interrupted_upload_reuses_task(client, db, publisher, queued):
+    user, headers, video_id = publisher
+    task = PublishTask(user_id=user.id, video_id=video_id, status="failed", task_metadata={"uploaded_parts": 3})
+    db.add(task)
+    await db.commit()
+    response = await publish(client, headers, video_id)
+    assert response.json()["id"] == task.id
+    assert [t.status for t in await tasks_of(db, video_id)] == ["queued"]
+
+
+async def test_concurrent_same_key_returns_winner(client, db, publisher, queued):
+    user, headers, video_id = publisher
+    winner = {}
+
+    def insert_competing_task(conn, cursor, statement, parameters, context, executemany):
+        # 模拟并发请求在本请求检查幂等键之后、提交之前插入了同一个键；在本请求的第一条写语句开始事务前插入
+        if statement.startswith(("INSERT", "UPDATE")) and not winner:
+            with engine.begin() as other:
+                winner["id"] = other.execute(insert(PublishTask).values(
+                    user_id=user.id, video_id=video_id, status="queued", idempotency_key=f"{user.id}:race"
+                )).inserted_primary_key[0]
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", insert_competing_task)
+    try:
+        response = await publish(client, headers, video_id, key="race")
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", insert_competing_task)
+    assert response.status_code == 200
+    assert response.json()["message"] == "发布任务已存在"
+    assert response.json()["id"] == winner["id"]
+    assert queued == []
+
+
+async def test_queue_unavailable(client, db, publisher, monkeypatch):
+    _, headers, video_id = publisher
+
+    def broken(task_id):
+        raise ConnectionError("broker down")
+    monkeypatch.setattr(douyin.publish_video_task, "delay", broken)
+    response = await publish(client, headers, video_id)
+    assert response.status_code == 503
+    assert [t.status for t in await tasks_of(db, video_id)] == ["failed"]
+    assert (await db.get(Video, video_id, populate_existing=True)).publish_status == "failed"
+
+
+async def test_publish_requires_own_video_and_douyin_account(client, db, publisher, make_user, queued):
+    _, _, video_id = publisher
+    other, other_headers = await make_user("bob")
+    assert (await publish(client, other_headers, video_id)).status_code == 404
+    other_video = Video(user_id=other.id, title="video")
+    db.add(other_video)
+    await db.commit()
+    assert (await publish(client, other_headers, other_video.id)).status_code == 400
+    assert queued == []
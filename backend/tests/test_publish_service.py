@@ -0,0 +1,94 @@
+import os
+import pytest
+from app.models.publish_task import PublishTask
+from app.models.video import Video
+from app.services.publish_service import PublishService
+
+
+class FakeDouyinService:
+    """模拟分片上传：先报告一次进度，可设置为上传失败"""
+
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.resume_states = []
+
+    async def ensure_valid_token(self, db, user):
+        return "access-token"
+
+    async def upload_video(self, access_token, file_path, title, description, resume_state=None, on_progress=None):
+        self.resume_states.append(resume_state)
+        await on_progress({"upload_id": "u1", "total_parts": 2, "completed_parts": [1]})
+        if self.error:
+            raise self.error
+        return {"data": {"task_id": "douyin-task"}}
+
+
+@pytest.fixture
+async def publish_task(db, make_user, upload_dir, make_mp4):
+    user, _ = await make_user(douyin_access_token="token", douyin_user_id="open-id")
+    path = os.path.join(upload_dir, "video.mp4")
+    with open(path, "wb") as f:
+        f.write(make_mp4())
+    video = Video(user_id=user.id, title="标题", file_path=path, publish_status="publishing")
+    db.add(video)
+    await db.flush()
+    task = PublishTask(user_id=user.id, video_id=video.id, status="queued")
+    db.add(task)
+    await db.commit()
+    return task
+
+
+async def reload(db, model, row_id):
+    return await db.get(model, row_id, populate_existing=True)
+
+
+async def test_run_uploads_and_hands_over_to_poller(db, publish_task):
+    await PublishService(FakeDouyinService()).run(db, publish_task.id)
+    task = await reload(db, PublishTask, publish_task.id)
+    assert (task.task_id, task.status, task.progress) == ("douyin-task", "processing", 100)
+    assert task.next_poll_at is not None
+    # 上传前重新解析了视频并补全元数据
+    video = await reload(db, Video, task.video_id)
+    assert (video.duration, video.width, video.height, video.video_codec) == (10, 720, 1280, "h264")
+
+
+async def test_run_is_idempotent_after_upload(db, publish_task):
+    service = FakeDouyinService()
+    await PublishService(service).run(db, publish_task.id)
+    await PublishService(service).run(db, publish_task.id)
+    assert len(service.resume_states) == 1
+
+
+async def test_retryable_failure_keeps_resume_state(db, publish_task):
+    service = FakeDouyinService(error=RuntimeError("network"))
+    with pytest.raises(RuntimeError):
+        await PublishService(service).run(db, publish_task.id, final_attempt=False)
+    task = await reload(db, PublishTask, publish_task.id)
+    assert (task.status, task.error_message, task.progress) == ("queued", "network", 45)
+    assert task.task_metadata["completed_parts"] == [1]
+
+    # 重试时从保存的分片状态继续上传
+    service.error = None
+    await PublishService(service).run(db, publish_task.id)
+    assert service.resume_states[1]["upload_id"] == "u1"
+    assert (await reload(db, PublishTask, publish_task.id)).status == "processing"
+
+
+async def test_final_failure_marks_video_failed(db, publish_task):
+    with pytest.raises(RuntimeError):
+        await PublishService(FakeDouyinService(error=RuntimeError("network"))).run(db, publish_task.id)
+    task = await reload(db, PublishTask, publish_task.id)
+    assert task.status == "failed"
+    assert (await reload(db, Video, task.video_id)).publish_status == "failed"
+
+
+async def test_invalid_video_fails_without_upload(db, publish_task, make_mp4):
+    video = await db.get(Video, publish_task.video_id)
+    with open(video.file_path, "wb") as f:
+        f.write(make_mp4(video_codec=b"vp09"))
+    service = FakeDouyinService()
+    await PublishService(service).run(db, publish_task.id)
+    task = await reload(db, PublishTask, publish_task.id)
+    assert task.status == "failed"
+    assert "vp9" in task.error_message
+    assert service.resume_states == []
@@ -0,0 +1,79 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.core.config import settings
+from app.core.database import _configure_sqlite, _engine_options, get_async_database_url
+
+
+@pytest.fixture
+def production(monkeypatch):
+    monkeypatch.setattr(settings, "DATABASE_PROFILE", "production")
+
+
+def make_engine(tmp_path, read_only=False):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    _configure_sqlite(engine, read_only=read_only)
+    return engine
+
+
+def pragmas(engine, *names):
+    with engine.connect() as connection:
+        return [connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names]
+
+
+def test_production_pragmas(tmp_path, production):
+    engine = make_engine(tmp_path)
+    journal_mode, synchronous, busy_timeout, cache_size, temp_store = pragmas(
+        engine, "journal_mode", "synchronous", "busy_timeout", "cache_size", "temp_store"
+    )
+    assert journal_mode == "wal"
+    assert synchronous == 1  # NORMAL
+    assert busy_timeout == settings.SQLITE_BUSY_TIMEOUT_MS
+    assert cache_size == -settings.SQLITE_CACHE_SIZE_KB
+    assert temp_store == 2  # MEMORY
+    engine.dispose()
+
+
+def test_development_only_sets_busy_timeout(tmp_path):
+    engine = make_engine(tmp_path)
+    assert pragmas(engine, "journal_mode", "busy_timeout") == ["delete", settings.SQLITE_BUSY_TIMEOUT_MS]
+    engine.dispose()
+
+
+def test_read_engine_rejects_writes(tmp_path, production):
+    writer = make_engine(tmp_path)
+    with writer.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY)"))
+        connection.execute(text("INSERT INTO items VALUES (1)"))
+    reader = make_engine(tmp_path, read_only=True)
+    with reader.connect() as connection:
+        assert connection.execute(text("SELECT count(*) FROM items")).scalar() == 1
+        with pytest.raises(OperationalError):
+            connection.execute(text("INSERT INTO items VALUES (2)"))
+    reader.dispose()
+    writer.dispose()
+
+
+def test_production_pool_options(production):
+    url = get_async_database_url("sqlite:////data/app.db")
+    assert url.startswith("sqlite+aiosqlite://")
+    options = _engine_options(url, async_driver=True)
+    assert options["poolclass"] is AsyncAdaptedQueuePool
+    assert (options["pool_size"], options["max_overflow"]) == (settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
+    assert _engine_options("sqlite:////data/app.db", async_driver=False)["poolclass"] is QueuePool
+    # 内存数据库每个连接都是独立的库，不使用连接池配置
+    assert "poolclass" not in _engine_options("sqlite:///:memory:", async_driver=False)
+
+
+def test_development_uses_default_pool():
+    assert "poolclass" not in _engine_options("sqlite+aiosqlite:////data/app.db", async_driver=True)
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("postgres://u@h/db", "postgresql+asyncpg://u@h/db"),
+    ("postgresql+psycopg2://u@h/db", "postgresql+asyncpg://u@h/db"),
+    ("mysql://u@h/db", "mysql://u@h/db"),
+])
+def test_async_database_url(url, expected):
+    assert get_async_database_url(url) == expected
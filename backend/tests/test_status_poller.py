@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select
+from app.models.publish_task import PublishTask
+from app.models.video import Video
+from app.services.status_poller import PublishStatusPoller
+
+
+class FakeDouyinService:
+    """按任务ID返回预设的发布状态，None表示查询失败"""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.checked = []
+
+    async def ensure_valid_token(self, db, user):
+        return "access-token"
+
+    async def check_publish_status(self, access_token, task_id):
+        self.checked.append(task_id)
+        status = self.statuses[task_id]
+        if status is None:
+            raise RuntimeError("upstream error")
+        return {"data": {"status": status, "item_id": f"item-{task_id}", "share_url": f"https://douyin/{task_id}"}}
+
+
+@pytest.fixture
+async def owner(make_user):
+    user, _ = await make_user(douyin_access_token="token", douyin_user_id="open-id")
+    return user
+
+
+async def add_task(db, user, task_id, video=True, **values):
+    video_id = None
+    if video:
+        row = Video(user_id=user.id, title=task_id, publish_status="processing")
+        db.add(row)
+        await db.flush()
+        video_id = row.id
+    task = PublishTask(user_id=user.id, video_id=video_id, task_id=task_id, status="processing", **values)
+    db.add(task)
+    await db.commit()
+    return task
+
+
+async def reload(db, model, row_id):
+    return await db.get(model, row_id, populate_existing=True)
+
+
+async def test_poll_updates_task_and_video(db, owner):
+    task = await add_task(db, owner, "t1")
+    changed = await PublishStatusPoller(FakeDouyinService({"t1": "success"})).poll_due(db)
+    assert changed == 1
+    task = await reload(db, PublishTask, task.id)
+    assert task.status == "success"
+    assert task.douyin_video_id == "item-t1"
+    video = await reload(db, Video, task.video_id)
+    assert (video.status, video.publish_status, video.douyin_url) == ("published", "success", "https://douyin/t1")
+
+
+async def test_poll_task_whose_video_was_deleted(db, owner):
+    orphan = await add_task(db, owner, "orphan", video=False)
+    task = await add_task(db, owner, "t1")
+    changed = await PublishStatusPoller(FakeDouyinService({"orphan": "failed", "t1": "success"})).poll_due(db)
+    assert changed == 2
+    assert (await reload(db, PublishTask, orphan.id)).status == "failed"
+    assert (await reload(db, PublishTask, task.id)).status == "success"
+    assert (await reload(db, Video, task.video_id)).status == "published"
+
+
+async def test_poll_failed_status_marks_video_failed(db, owner):
+    task = await add_task(db, owner, "t1")
+    await PublishStatusPoller(FakeDouyinService({"t1": "fail"})).poll_due(db)
+    video = await reload(db, Video, task.video_id)
+    assert (video.status, video.publish_status) == ("failed", "failed")
+
+
+async def test_poll_pending_and_errors_stay_processing(db, owner):
+    pending = await add_task(db, owner, "pending")
+    broken = await add_task(db, owner, "broken")
+    changed = await PublishStatusPoller(FakeDouyinService({"pending": "uploading", "broken": None})).poll_due(db)
+    assert changed == 0
+    now = datetime.utcnow()
+    for task_id in (pending.id, broken.id):
+        task = await reload(db, PublishTask, task_id)
+        assert task.status == "processing"
+        # 下次轮询时间后移，未到期前不会被再次查询
+        assert task.next_poll_at > now
+
+
+async def test_poll_skips_tasks_not_due(db, owner):
+    await add_task(db, owner, "later", next_poll_at=datetime.utcnow() + timedelta(minutes=5))
+    await add_task(db, owner, "done", video=False)
+    db.add(PublishTask(user_id=owner.id, task_id="finished", status="success"))
+    await db.commit()
+    service = FakeDouyinService({"done": "success"})
+    await PublishStatusPoller(service).poll_due(db)
+    assert service.checked == ["done"]
+
+
+async def test_poll_publishes_status_events(db, owner, fake_redis):
+    await add_task(db, owner, "t1")
+    pubsub = fake_redis.pubsub()
+    await pubsub.subscribe(f"publish_status:{owner.id}")
+    await pubsub.get_message(timeout=1)
+    await PublishStatusPoller(FakeDouyinService({"t1": "success"})).poll_due(db)
+    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1)
+    assert '"status": "success"' in message["data"]
+    await pubsub.aclose()
+    assert (await db.execute(select(PublishTask))).scalars().one().status == "success"
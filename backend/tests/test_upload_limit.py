@@ -0,0 +1,71 @@
+import hashlib
+import io
+import os
+import httpx
+import pytest
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import select
+from app.core.config import settings
+from app.core.upload_limit import MULTIPART_OVERHEAD, UploadSizeLimitMiddleware
+from app.models.video import Video
+from app.services.media_storage import TMP_DIR, save_upload_to_temp
+
+
+async def test_save_upload_to_temp_hashes_in_chunks(upload_dir, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 7)
+    data = os.urandom(100)
+    tmp_path, sha256, file_size = await save_upload_to_temp(UploadFile(io.BytesIO(data), filename="a.mp4"))
+    assert (sha256, file_size) == (hashlib.sha256(data).hexdigest(), 100)
+    with open(tmp_path, "rb") as f:
+        assert f.read() == data
+
+
+async def test_save_upload_to_temp_aborts_over_limit(upload_dir, monkeypatch):
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 50)
+    monkeypatch.setattr(settings, "UPLOAD_CHUNK_SIZE", 16)
+    with pytest.raises(HTTPException) as exc_info:
+        await save_upload_to_temp(UploadFile(io.BytesIO(bytes(51)), filename="a.mp4"))
+    assert exc_info.value.status_code == 413
+    assert os.listdir(TMP_DIR) == []
+
+
+async def test_oversized_upload_rejected_while_streaming(client, db, make_user, make_mp4, monkeypatch):
+    # Content-Length在中间件允许的范围内，文件本身超限时在写入过程中中止
+    _, headers = await make_user()
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 1000)
+    response = await client.post(
+        "/api/v1/videos/upload",
+        data={"title": "big"},
+        files={"file": ("big.mp4", make_mp4(payload=bytes(2000)), "video/mp4")},
+        headers=headers
+    )
+    assert response.status_code == 413
+    assert os.listdir(TMP_DIR) == []
+    assert (await db.execute(select(Video))).first() is None
+
+
+@pytest.fixture
+def limited_app():
+    calls = []
+
+    async def app(scope, receive, send):
+        calls.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    transport = httpx.ASGITransport(app=UploadSizeLimitMiddleware(app))
+    return httpx.AsyncClient(transport=transport, base_url="http://test"), calls
+
+
+async def test_content_length_checked_before_reading_body(limited_app, monkeypatch):
+    client, calls = limited_app
+    monkeypatch.setattr(settings, "MAX_FILE_SIZE", 10)
+    too_large = str(10 + MULTIPART_OVERHEAD + 1)
+    response = await client.post("/api/v1/videos/upload", headers={"Content-Length": too_large}, content=b"")
+    assert response.status_code == 413
+    response = await client.post("/api/v1/videos/upload", headers={"Content-Length": "abc"}, content=b"")
+    assert response.status_code == 400
+    assert calls == []
+    # 其他路径不检查
+    await client.post("/api/v1/ai/generate/text", headers={"Content-Length": too_large}, content=b"")
+    assert calls == ["/api/v1/ai/generate/text"]
@@ -0,0 +1,95 @@
+from sqlalchemy import event, select
+from app.core.config import settings
+from app.core.database import async_engine
+from app.models.ai_generation import AIGeneration
+from app.models.publish_task import PublishTask
+from app.models.video import Video
+
+
+async def add_videos(db, user, count):
+    videos = [Video(user_id=user.id, title=f"v{i}", status="draft") for i in range(count)]
+    db.add_all(videos)
+    await db.commit()
+    return [video.id for video in videos]
+
+
+async def bulk(client, headers, **body):
+    return await client.post("/api/v1/videos/bulk", json=body, headers=headers)
+
+
+async def reload_videos(db):
+    result = await db.execute(select(Video).order_by(Video.id).execution_options(populate_existing=True))
+    return result.scalars().all()
+
+
+async def test_bulk_update_only_owned_videos(client, db, make_user):
+    alice, headers = await make_user("alice")
+    bob, _ = await make_user("bob")
+    own = await add_videos(db, alice, 2)
+    other = await add_videos(db, bob, 1)
+    response = await bulk(client, headers, ids=own + other + [9999], action="update", patch={"status": "published", "title": "new"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "action": "update",
+        "affected": 2,
+        "results": [
+            {"id": own[0], "result": "updated"},
+            {"id": own[1], "result": "updated"},
+            {"id": other[0], "result": "not_found"},
+            {"id": 9999, "result": "not_found"}
+        ]
+    }
+    videos = {video.id: video for video in await reload_videos(db)}
+    assert [(videos[i].title, videos[i].status) for i in own] == [("new", "published")] * 2
+    assert (videos[other[0]].title, videos[other[0]].status) == ("v0", "draft")
+
+
+async def test_bulk_update_uses_single_statement(client, db, make_user):
+    user, headers = await make_user()
+    ids = await add_videos(db, user, 5)
+    updates = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE videos"):
+            updates.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        await bulk(client, headers, ids=ids, action="update", patch={"description": "d"})
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert len(updates) == 1
+
+
+async def test_bulk_delete_keeps_history_rows(client, db, make_user):
+    alice, headers = await make_user("alice")
+    bob, _ = await make_user("bob")
+    own = await add_videos(db, alice, 2)
+    other = await add_videos(db, bob, 1)
+    db.add_all([
+        PublishTask(user_id=alice.id, video_id=own[0], status="success"),
+        AIGeneration(user_id=alice.id, video_id=own[1], generation_type="text", status="success")
+    ])
+    await db.commit()
+    response = await bulk(client, headers, ids=[own[0], own[0], own[1], other[0]], action="delete")
+    # 重复的ID只处理一次
+    assert [item["result"] for item in response.json()["results"]] == ["deleted", "deleted", "not_found"]
+    assert [video.id for video in await reload_videos(db)] == other
+    task = (await db.execute(select(PublishTask).execution_options(populate_existing=True))).scalar_one()
+    generation = (await db.execute(select(AIGeneration).execution_options(populate_existing=True))).scalar_one()
+    assert task.video_id is None and generation.video_id is None
+
+
+async def test_bulk_validation(client, make_user):
+    _, headers = await make_user()
+    assert (await bulk(client, headers, ids=[1], action="update")).status_code == 400
+    assert (await bulk(client, headers, ids=[1], action="update", patch={})).status_code == 400
+    assert (await bulk(client, headers, ids=[], action="delete")).status_code == 422
+    assert (await bulk(client, headers, ids=[1], action="archive")).status_code == 422
+    assert (await bulk(client, headers, ids=[1], action="update", patch={"status": "deleted"})).status_code == 422
+    too_many = list(range(1, settings.VIDEO_BULK_MAX_IDS + 2))
+    assert (await bulk(client, headers, ids=too_many, action="delete")).status_code == 422
+
+
+async def test_bulk_requires_auth(client, db):
+    assert (await client.post("/api/v1/videos/bulk", json={"ids": [1], "action": "delete"})).status_code == 401
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from app.models.video import Video
+
+
+async def add_videos(db, user, count, created_at=None, **values):
+    base = datetime(2024, 1, 1)
+    videos = [
+        Video(user_id=user.id, title=f"v{i}", created_at=created_at or base + timedelta(minutes=i), **values)
+        for i in range(count)
+    ]
+    db.add_all(videos)
+    await db.commit()
+    return [video.id for video in videos]
+
+
+async def fetch_all(client, headers, limit, **params):
+    """跟随X-Next-Cursor取完所有页"""
+    pages, cursor = [], None
+    while True:
+        query = {"limit": limit, **params}
+        if cursor:
+            query["cursor"] = cursor
+        response = await client.get("/api/v1/videos/", params=query, headers=headers)
+        assert response.status_code == 200
+        pages.append([video["id"] for video in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+async def test_list_pages_newest_first(client, db, make_user):
+    user, headers = await make_user()
+    ids = await add_videos(db, user, 5)
+    pages = await fetch_all(client, headers, limit=2)
+    assert pages == [ids[:2:-1], ids[2:0:-1], ids[:1]]
+
+
+async def test_list_pages_stable_with_equal_created_at(client, db, make_user):
+    user, headers = await make_user()
+    ids = await add_videos(db, user, 5, created_at=datetime(2024, 1, 1))
+    pages = await fetch_all(client, headers, limit=2)
+    assert sum(pages, []) == sorted(ids, reverse=True)
+
+
+async def test_list_only_own_videos_and_columns(client, db, make_user):
+    alice, headers = await make_user("alice")
+    bob, _ = await make_user("bob")
+    own = await add_videos(db, alice, 1, file_path="/secret/path.mp4")
+    await add_videos(db, bob, 2)
+    response = await client.get("/api/v1/videos/", headers=headers)
+    videos = response.json()
+    assert [video["id"] for video in videos] == own
+    assert "file_path" not in videos[0] and "user_id" not in videos[0]
+    assert "X-Next-Cursor" not in response.headers
+
+
+async def test_list_filters_duration(client, db, make_user):
+    user, headers = await make_user()
+    short = await add_videos(db, user, 1, duration=5)
+    long = await add_videos(db, user, 1, duration=120)
+    response = await client.get("/api/v1/videos/", params={"min_duration": 10}, headers=headers)
+    assert [video["id"] for video in response.json()] == long
+    response = await client.get("/api/v1/videos/", params={"max_duration": 10}, headers=headers)
+    assert [video["id"] for video in response.json()] == short
+
+
+async def test_list_rejects_invalid_cursor(client, make_user):
+    _, headers = await make_user()
+    response = await client.get("/api/v1/videos/", params={"cursor": "!!"}, headers=headers)
+    assert response.status_code == 400
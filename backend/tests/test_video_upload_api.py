@@ -0,0 +1,115 @@
+import os
+import pytest
+from sqlalchemy import select
+from app.api import videos
+from app.models.media_blob import MediaBlob
+from app.models.video import Video
+from app.services.media_storage import BLOB_DIR, TMP_DIR
+
+
+async def upload(client, headers, data, title="video"):
+    return await client.post(
+        "/api/v1/videos/upload",
+        data={"title": title},
+        files={"file": ("clip.MP4", data, "video/mp4")},
+        headers=headers
+    )
+
+
+def files_in(directory):
+    return [os.path.join(root, name) for root, _, names in os.walk(directory) for name in names]
+
+
+async def blobs(db):
+    return (await db.execute(select(MediaBlob).execution_options(populate_existing=True))).scalars().all()
+
+
+async def test_upload_stores_probed_video(client, db, make_user, make_mp4):
+    _, headers = await make_user()
+    response = await upload(client, headers, make_mp4(duration=12.0, width=1080, height=1920))
+    assert response.status_code == 200
+    video = await db.get(Video, response.json()["id"])
+    assert (video.duration, video.width, video.height, video.video_codec) == (12, 1080, 1920, "h264")
+    assert video.file_path.startswith(BLOB_DIR) and video.file_path.endswith(".mp4")
+    assert files_in(BLOB_DIR) == [video.file_path]
+    assert files_in(TMP_DIR) == []
+
+
+async def test_same_content_shares_one_blob(client, db, make_user, make_mp4):
+    _, alice = await make_user("alice")
+    _, bob = await make_user("bob")
+    data = make_mp4()
+    first = (await upload(client, alice, data)).json()
+    second = (await upload(client, bob, data)).json()
+    assert first["file_path"] == second["file_path"]
+    [blob] = await blobs(db)
+    assert blob.ref_count == 2
+    assert len(files_in(BLOB_DIR)) == 1
+
+
+async def test_delete_releases_blob_after_last_reference(client, db, make_user, make_mp4):
+    _, headers = await make_user()
+    data = make_mp4()
+    first = (await upload(client, headers, data)).json()
+    second = (await upload(client, headers, data)).json()
+    
+    assert (await client.delete(f"/api/v1/videos/{first['id']}", headers=headers)).status_code == 200
+    assert [blob.ref_count for blob in await blobs(db)] == [1]
+    assert os.path.exists(second["file_path"])
+    
+    await client.delete(f"/api/v1/videos/{second['id']}", headers=headers)
+    assert await blobs(db) == []
+    assert files_in(BLOB_DIR) == []
+
+
+async def test_bulk_delete_releases_blobs(client, db, make_user, make_mp4):
+    _, headers = await make_user()
+    data = make_mp4()
+    ids = [(await upload(client, headers, data)).json()["id"] for _ in range(2)]
+    other = (await upload(client, headers, make_mp4(payload=b"other"))).json()
+    response = await client.post("/api/v1/videos/bulk", json={"ids": ids, "action": "delete"}, headers=headers)
+    assert response.json()["affected"] == 2
+    assert [blob.file_path for blob in await blobs(db)] == [other["file_path"]]
+    assert files_in(BLOB_DIR) == [other["file_path"]]
+
+
+async def test_reupload_after_release_gets_new_file(client, db, make_user, make_mp4):
+    _, headers = await make_user()
+    data = make_mp4()
+    first = (await upload(client, headers, data)).json()
+    await client.delete(f"/api/v1/videos/{first['id']}", headers=headers)
+    second = (await upload(client, headers, data)).json()
+    assert os.path.exists(second["file_path"])
+    assert [blob.ref_count for blob in await blobs(db)] == [1]
+
+
+@pytest.mark.parametrize("data", [b"not a video" * 10, None])
+async def test_rejected_upload_leaves_no_files(client, db, make_user, make_mp4, data):
+    _, headers = await make_user()
+    response = await upload(client, headers, data or make_mp4(duration=0.5))
+    assert response.status_code == 400
+    assert files_in(TMP_DIR) == [] and files_in(BLOB_DIR) == []
+    assert await blobs(db) == []
+
+
+async def test_unexpected_probe_error_removes_temp_file(client, db, make_user, make_mp4, monkeypatch):
+    _, headers = await make_user()
+
+    async def broken(path):
+        raise RuntimeError("probe crashed")
+    monkeypatch.setattr(videos, "probe_video", broken)
+    with pytest.raises(RuntimeError):
+        await upload(client, headers, make_mp4())
+    assert files_in(TMP_DIR) == []
+
+
+async def test_failed_commit_removes_new_blob_file(client, db, make_user, make_mp4, monkeypatch):
+    _, headers = await make_user()
+
+    def broken_columns(metadata):
+        raise RuntimeError("bad metadata")
+    monkeypatch.setattr(videos, "metadata_columns", broken_columns)
+    with pytest.raises(RuntimeError):
+        await upload(client, headers, make_mp4())
+    assert files_in(TMP_DIR) == [] and files_in(BLOB_DIR) == []
+    assert await blobs(db) == []
@@ -1,5 +1,66 @@
 import api from './index';
 
-export const getDouyinVideos = () => api.get('/douyin/videos');
+export const getDouyinVideos = (params) => api.get('/douyin/videos', { params });
 export const publishVideoToDouyin = (videoId) => api.post(`/douyin/publish/${videoId}`);
-export const getPublishStatus = (taskId) => api.get(`/douyin/publish/status/${taskId}`); 
\ No newline at end of file
+export const getPublishTask = (publishTaskId) => api.get(`/douyin/publish/tasks/${publishTaskId}`);
+export const getPublishStatus = (taskId) => api.get(`/douyin/publish/status/${taskId}`);
+
+// 订阅发布状态推送(SSE)，断开后按指数退避自动重连，返回取消订阅的函数
+// 重连成功时调用onReconnect，调用方可借此补查断开期间错过的状态变化
+export const subscribePublishEvents = (onEvent, onReconnect) => {
+  const controller = new AbortController();
+  let retryDelay = 1000;
+  let connected = false;
+
+  const readStream = async (response) => {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      const messages = buffer.split('\n\n');
+      buffer = messages.pop();
+      for (const message of messages) {
+        const data = message.split('\n').find(line => line.startsWith('data: '));
+        if (data) onEvent(JSON.parse(data.slice(6)));
+      }
+    }
+  };
+
+  const connect = async () => {
+    while (!controller.signal.aborted) {
+      try {
+        const token = localStorage.getItem('token');
+        const response = await fetch(`${api.defaults.baseURL}/douyin/publish/events`, {
+          headers: token ? { Authorization: `Bearer ${token}` } : {},
+          signal: controller.signal,
+        });
+        if (response.status === 401 || response.status === 403) {
+          console.error('发布状态推送认证失败，停止重连');
+          return;
+        }
+        if (!response.ok) {
+          // 限流或过载时按服务端给出的Retry-After等待
+          const retryAfter = Number(response.headers.get('Retry-After'));
+          if (retryAfter > 0) retryDelay = Math.max(retryDelay, retryAfter * 1000);
+          throw new Error(`HTTP ${response.status}`);
+        }
+        if (connected && onReconnect) onReconnect();
+        connected = true;
+        retryDelay = 1000;
+        await readStream(response);
+      } catch (error) {
+        if (error.name === 'AbortError') return;
+        console.error('发布状态推送连接失败:', error);
+      }
+      if (controller.signal.aborted) return;
+      await new Promise(resolve => setTimeout(resolve, retryDelay));
+      retryDelay = Math.min(retryDelay * 2, 30000);
+    }
+  };
+
+  connect();
+  return () => controller.abort();
+};
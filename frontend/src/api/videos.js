@@ -4,4 +4,11 @@ export const listVideos = (params) => api.get('/videos', { params });
 export const uploadVideo = (formData) => api.post('/videos/upload', formData, { headers: { 'Content-Type': 'multipart/form-data' } });
 export const getVideo = (id) => api.get(`/videos/${id}`);
 export const updateVideo = (id, data) => api.put(`/videos/${id}`, data);
-export const deleteVideo = (id) => api.delete(`/videos/${id}`); 
\ No newline at end of file
+export const deleteVideo = (id) => api.delete(`/videos/${id}`); 
+export const bulkVideos = (ids, action, patch = null) => api.post('/videos/bulk', { ids, action, patch });
+
+// <video>无法携带Authorization头，先获取短期签名链接，避免登录令牌出现在访问日志中
+export const getVideoFileUrl = async (id) => {
+  const { data } = await api.get(`/media/videos/${id}/url`);
+  return new URL(data.url, api.defaults.baseURL).href;
+};